@@ -33,11 +33,17 @@ class Config:
             "max_retries": int(os.getenv("max_retries", "3")),
             "page_load_timeout": int(os.getenv("page_load_timeout", "30")),
             "implicit_wait": int(os.getenv("implicit_wait", "10")),
+            # 详情页流水线：并发浏览器数量、解析线程数量、已提交但未写库的影片上限（超过时提交阻塞）
+            "fetch_workers": int(os.getenv("CRAWLER_FETCH_WORKERS", "1")),
+            "parse_workers": int(os.getenv("CRAWLER_PARSE_WORKERS", "2")),
+            "max_pending": int(os.getenv("CRAWLER_MAX_PENDING", "20")),
             
             # MongoDB配置
             "mongo_uri": os.getenv("MONGO_URI", "mongodb://localhost:27017/"),
             "mongo_db": os.getenv("MONGO_DB", "sehuatang_crawler"),
             "collection_name":os.getenv("collection_name","thread_details"),
+            # 每个进程的连接池上限，应不小于 gunicorn 每个 worker 的线程数
+            "mongo_max_pool_size": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
             
             # 日志配置
             "log_config": {
@@ -47,6 +53,87 @@ class Config:
                 "backup_count": int(os.getenv("LOG_BACKUP_COUNT", "5"))
             },
             
+            # 本地影片库配置
+            "library_config": {
+                "root": os.getenv("LIBRARY_ROOT", "/data"),
+                "rescan_interval": int(os.getenv("LIBRARY_RESCAN_INTERVAL", "300"))  # 5分钟
+            },
+            
+            # 影片列表配置
+            "listing_config": {
+                # 总数统计模式: exact 精确计数（带缓存）/ estimated 估算计数
+                "count_mode": os.getenv("LISTING_COUNT_MODE", "exact"),
+                "count_cache_ttl": int(os.getenv("LISTING_COUNT_CACHE_TTL", "300")),  # 5分钟
+                # estimated 模式下带筛选条件时最多统计的文档数
+                "count_cap": int(os.getenv("LISTING_COUNT_CAP", "10000"))
+            },
+            
+            # 会话配置
+            "session_config": {
+                # 进程内会话缓存秒数（退出登录后其它 worker 最多在该时间内仍认为会话有效）
+                "cache_ttl": int(os.getenv("SESSION_CACHE_TTL", "60")),
+                # last_accessed 最短写入间隔秒数
+                "touch_interval": int(os.getenv("SESSION_TOUCH_INTERVAL", "300"))
+            },
+            
+            # Jellyfin 数据同步配置
+            "jellyfin_sync_config": {
+                "library_db": os.getenv("JELLYFIN_LIBRARY_DB", "/server/backup_sehuatang/JellfinData/library.db"),
+                "top_parent_id": os.getenv("JELLYFIN_TOP_PARENT_ID", "5824037d54700c4dcff7f1255022573b"),
+                "batch_size": int(os.getenv("JELLYFIN_SYNC_BATCH_SIZE", "1000"))
+            },
+            
+            # 封面图片后台下载队列配置
+            "image_download_config": {
+                "workers": int(os.getenv("IMAGE_DOWNLOAD_WORKERS", "4")),
+                "max_retries": int(os.getenv("IMAGE_DOWNLOAD_RETRIES", "3")),
+                "queue_size": int(os.getenv("IMAGE_DOWNLOAD_QUEUE_SIZE", "1000")),
+                "timeout": int(os.getenv("IMAGE_DOWNLOAD_TIMEOUT", "30")),
+                # 爬取结束/进程退出时等待队列排空的最长秒数，超时后剩余图片记录为失败
+                "shutdown_timeout": int(os.getenv("IMAGE_DOWNLOAD_SHUTDOWN_TIMEOUT", "60"))
+            },
+            
+            # 爬虫页面缓存配置（TTL 单位：秒，0 表示该类页面不缓存）
+            "page_cache_config": {
+                "enabled": os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true",
+                "root": os.getenv("PAGE_CACHE_DIR", "page_cache"),
+                # 离线模式：忽略 TTL，只要有缓存就直接使用（解析器修改后重新处理）
+                "offline": os.getenv("PAGE_CACHE_OFFLINE", "false").lower() == "true",
+                # 自动清理过期缓存的间隔，0 表示只手动清理
+                "prune_interval": int(os.getenv("PAGE_CACHE_PRUNE_INTERVAL", str(24 * 3600))),
+                "ttls": {
+                    "detail": int(os.getenv("PAGE_CACHE_TTL_DETAIL", str(30 * 24 * 3600))),
+                    # 磁力链接列表会随时间增加，且接口不支持条件请求，默认不缓存
+                    "magnet": int(os.getenv("PAGE_CACHE_TTL_MAGNET", "0")),
+                    "list": int(os.getenv("PAGE_CACHE_TTL_LIST", "3600")),
+                    "other": int(os.getenv("PAGE_CACHE_TTL_OTHER", "0"))
+                }
+            },
+            
+            # 图片代理磁盘缓存配置
+            "image_proxy_config": {
+                "cache_dir": os.getenv("IMAGE_PROXY_CACHE_DIR", "image_cache"),
+                "max_cache_mb": int(os.getenv("IMAGE_PROXY_CACHE_MAX_MB", "2048")),
+                "max_image_mb": int(os.getenv("IMAGE_PROXY_MAX_IMAGE_MB", "20")),
+                "timeout": int(os.getenv("IMAGE_PROXY_TIMEOUT", "10")),
+                "max_age": int(os.getenv("IMAGE_PROXY_MAX_AGE", "86400"))
+            },
+            
+            # 封面缩略图配置（宽度按列表卡片的 1x / 2x 显示尺寸）
+            "cover_thumbnail_config": {
+                "widths": [int(width) for width in os.getenv("COVER_THUMB_WIDTHS", "320,640").split(",") if width.strip()],
+                "jpeg_quality": int(os.getenv("COVER_THUMB_JPEG_QUALITY", "82")),
+                "webp": os.getenv("COVER_THUMB_WEBP", "true").lower() == "true",
+                "webp_quality": int(os.getenv("COVER_THUMB_WEBP_QUALITY", "80"))
+            },
+            
+            # 静态文件发送方式：flask / sendfile / x-accel / x-sendfile
+            "file_offload_config": {
+                "mode": os.getenv("FILE_OFFLOAD_MODE", "flask").lower(),
+                # x-accel 模式下 nginx 中指向 web/static 的 internal location
+                "accel_prefix": os.getenv("FILE_OFFLOAD_ACCEL_PREFIX", "/_protected_static")
+            },
+            
             # 邮件配置
             "email_config": {
                 "smtp_server": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
@@ -71,6 +158,42 @@ class Config:
         """获取日志配置"""
         return self.config["log_config"]
     
+    def get_library_config(self) -> Dict[str, Any]:
+        """获取本地影片库配置"""
+        return self.config["library_config"]
+    
+    def get_listing_config(self) -> Dict[str, Any]:
+        """获取影片列表配置"""
+        return self.config["listing_config"]
+    
+    def get_session_config(self) -> Dict[str, Any]:
+        """获取会话配置"""
+        return self.config["session_config"]
+    
+    def get_jellyfin_sync_config(self) -> Dict[str, Any]:
+        """获取 Jellyfin 数据同步配置"""
+        return self.config["jellyfin_sync_config"]
+    
+    def get_image_download_config(self) -> Dict[str, Any]:
+        """获取封面图片下载队列配置"""
+        return self.config["image_download_config"]
+    
+    def get_page_cache_config(self) -> Dict[str, Any]:
+        """获取爬虫页面缓存配置"""
+        return self.config["page_cache_config"]
+    
+    def get_image_proxy_config(self) -> Dict[str, Any]:
+        """获取图片代理缓存配置"""
+        return self.config["image_proxy_config"]
+    
+    def get_cover_thumbnail_config(self) -> Dict[str, Any]:
+        """获取封面缩略图配置"""
+        return self.config["cover_thumbnail_config"]
+    
+    def get_file_offload_config(self) -> Dict[str, Any]:
+        """获取静态文件发送方式配置"""
+        return self.config["file_offload_config"]
+    
     def get_email_config(self) -> Dict[str, Any]:
         """获取邮件配置"""
         return self.config["email_config"]
@@ -80,7 +203,8 @@ class Config:
         return {
             "uri": self.config["mongo_uri"],
             "db_name": self.config["mongo_db"],
-            "collection_name":self.config["collection_name"]
+            "collection_name":self.config["collection_name"],
+            "max_pool_size": self.config["mongo_max_pool_size"]
         }
     
     def get_crawler_config(self) -> Dict[str, Any]:
@@ -92,6 +216,9 @@ class Config:
             "max_retries":self.config["max_retries"],
             "page_load_timeout":self.config["page_load_timeout"],
             "implicit_wait":self.config["implicit_wait"],
+            "fetch_workers":self.config["fetch_workers"],
+            "parse_workers":self.config["parse_workers"],
+            "max_pending":self.config["max_pending"],
         }
     
     def get_yun115_config(self) -> Dict[str, str]:
@@ -42,6 +42,11 @@ class JellyfinConfig:
             # 搜索配置
             "search_limit": int(os.getenv("JELLYFIN_SEARCH_LIMIT", "50")),
             "timeout": int(os.getenv("JELLYFIN_TIMEOUT", "30")),
+            
+            # 本地影片库镜像配置
+            "mirror_refresh_interval": int(os.getenv("JELLYFIN_MIRROR_REFRESH_INTERVAL", "600")),  # 10分钟
+            "mirror_page_size": int(os.getenv("JELLYFIN_MIRROR_PAGE_SIZE", "500")),
+            "mirror_retry_interval": int(os.getenv("JELLYFIN_MIRROR_RETRY_INTERVAL", "60")),  # 加载失败后的重试间隔（秒）
         }
     
     def get(self, key: str, default: Any = None) -> Any:
@@ -19,13 +19,22 @@ import argparse
 import hashlib
 import uuid
 import os
+import threading
+import time
 from typing import Dict, List, Optional, Any
 from urllib.parse import quote
 from jellyfin_config import config
 import app_logger
+from http_session import ProcessLocalSession
+from movie_code import extract_movie_code, normalize_movie_code
 
 
 class JellyfinMovieChecker:
+    # 电影库列表缓存秒数
+    LIBRARIES_CACHE_TTL = 600
+    # 请求超时秒数，避免 Jellyfin 无响应时一直占住 worker 线程
+    REQUEST_TIMEOUT = 30
+
     def __init__(self, server_url: Optional[str] = None, username: Optional[str] = None, 
                  password: Optional[str] = None, client_name: Optional[str] = None, 
                  client_version: Optional[str] = None):
@@ -62,7 +71,53 @@ class JellyfinMovieChecker:
         
         self.access_token = None
         self.user_id = None
-        self.session = requests.Session()
+        # 复用连接池，多线程并发检查时不必反复建立连接；fork 出的 worker 进程各自建立连接池
+        self.session = ProcessLocalSession(pool_connections=4, pool_maxsize=16)
+        self._auth_lock = threading.Lock()
+        # 电影库列表缓存
+        self._libraries = None
+        self._libraries_expire_at = 0
+        # 本地影片库镜像：标准化编号 -> 电影信息列表
+        self.mirror_refresh_interval = config.get("mirror_refresh_interval", 600)
+        self.mirror_page_size = config.get("mirror_page_size", 500)
+        self.mirror_retry_interval = config.get("mirror_retry_interval", 60)
+        self._mirror = None
+        self._mirror_loaded_at = 0
+        # 首次加载失败后在该时间之前不再同步重试，调用方直接改为逐个查询
+        self._mirror_retry_at = 0
+        self._mirror_lock = threading.Lock()
+        self._mirror_refreshing = False
+
+    def ensure_authenticated(self) -> bool:
+        """
+        确保已认证：令牌一直复用，只有尚未认证或令牌失效(401)后才重新登录
+        
+        Returns:
+            bool: 是否持有有效令牌
+        """
+        if self.access_token:
+            return True
+        with self._auth_lock:
+            if self.access_token:
+                return True
+            return self.authenticate()
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """
+        发送带认证信息的 GET 请求，令牌过期(401)时重新认证并重试一次
+        """
+        kwargs.setdefault("timeout", self.REQUEST_TIMEOUT)
+        token = self.access_token
+        response = self.session.get(url, headers=self._get_auth_headers(), **kwargs)
+        if response.status_code == 401:
+            with self._auth_lock:
+                # 其它线程可能已经刷新过令牌
+                if self.access_token == token:
+                    self.access_token = None
+                    self.authenticate()
+            response = self.session.get(url, headers=self._get_auth_headers(), **kwargs)
+        response.raise_for_status()
+        return response
 
     def authenticate(self) -> bool:
         """
@@ -86,7 +141,7 @@ class JellyfinMovieChecker:
         }
         
         try:
-            response = self.session.post(auth_url, headers=headers, json=auth_data)
+            response = self.session.post(auth_url, headers=headers, json=auth_data, timeout=self.REQUEST_TIMEOUT)
             response.raise_for_status()
             
             auth_result = response.json()
@@ -121,40 +176,17 @@ class JellyfinMovieChecker:
     
     def get_movie_libraries(self) -> List[Dict[str, Any]]:
         """
-        获取所有电影库
+        获取所有电影库（结果缓存 LIBRARIES_CACHE_TTL 秒）
         
         Returns:
-            List[Dict[str, Any]]: 电影库列表
+            List[Dict[str, Any]]: 电影库列表，请求失败时为空列表
         """
         if not self.access_token:
             print("❌ 请先进行认证")
             return []
         
-        views_url = f"{self.server_url}/Users/{self.user_id}/Views"
-        headers = self._get_auth_headers()
-        
         try:
-            response = self.session.get(views_url, headers=headers)
-            response.raise_for_status()
-            
-            views_data = response.json()
-            movie_libraries = []
-            
-            for item in views_data.get("Items", []):
-                # 查找电影类型的库
-                if item.get("CollectionType") == "movies":
-                    movie_libraries.append({
-                        "id": item.get("Id"),
-                        "name": item.get("Name"),
-                        "type": item.get("CollectionType")
-                    })
-            
-            print(f"📚 找到 {len(movie_libraries)} 个电影库")
-            for lib in movie_libraries:
-                print(f"  - {lib['name']} (ID: {lib['id']})")
-            
-            return movie_libraries
-            
+            return self._fetch_movie_libraries()
         except requests.exceptions.RequestException as e:
             print(f"❌ 获取库信息失败: {e}")
             return []
@@ -162,6 +194,39 @@ class JellyfinMovieChecker:
             print(f"❌ 库信息响应解析失败: {e}")
             return []
     
+    def _fetch_movie_libraries(self) -> List[Dict[str, Any]]:
+        """
+        获取所有电影库（结果缓存 LIBRARIES_CACHE_TTL 秒），请求或解析失败时抛出异常
+        
+        Returns:
+            List[Dict[str, Any]]: 电影库列表
+        """
+        if self._libraries and self._libraries_expire_at > time.time():
+            return self._libraries
+        
+        views_url = f"{self.server_url}/Users/{self.user_id}/Views"
+        response = self._get(views_url)
+        
+        views_data = response.json()
+        movie_libraries = []
+        
+        for item in views_data.get("Items", []):
+            # 查找电影类型的库
+            if item.get("CollectionType") == "movies":
+                movie_libraries.append({
+                    "id": item.get("Id"),
+                    "name": item.get("Name"),
+                    "type": item.get("CollectionType")
+                })
+        
+        print(f"📚 找到 {len(movie_libraries)} 个电影库")
+        for lib in movie_libraries:
+            print(f"  - {lib['name']} (ID: {lib['id']})")
+        
+        self._libraries = movie_libraries
+        self._libraries_expire_at = time.time() + self.LIBRARIES_CACHE_TTL
+        return movie_libraries
+    
     def search_movies(self, movie_name: str, limit: int = 50) -> List[Dict[str, Any]]:
         """
         搜索电影
@@ -193,7 +258,6 @@ class JellyfinMovieChecker:
             
             # 搜索API端点
             search_url = f"{self.server_url}/Users/{self.user_id}/Items"
-            headers = self._get_auth_headers()
             
             # 搜索参数
             params = {
@@ -206,28 +270,14 @@ class JellyfinMovieChecker:
             }
             
             try:
-                response = self.session.get(search_url, headers=headers, params=params)
-                response.raise_for_status()
+                response = self._get(search_url, params=params)
                 
                 search_data = response.json()
                 items = search_data.get("Items", [])
                 
                 for item in items:
                     print(item)
-                    movie_info = {
-                        "id": item.get("Id"),
-                        "name": item.get("Name"),
-                        "year": item.get("ProductionYear"),
-                        "overview": item.get("Overview", "")[:200] + "..." if item.get("Overview") and len(item.get("Overview", "")) > 200 else item.get("Overview", ""),
-                        "genres": item.get("Genres", []),
-                        "rating": item.get("CommunityRating"),
-                        "official_rating": item.get("OfficialRating"),
-                        "path": item.get("Path"),
-                        "library": library_name,
-                        "library_id": library_id,
-                        "server_url": self.server_url
-                    }
-                    all_results.append(movie_info)
+                    all_results.append(self._build_movie_info(item, library))
                 
                 print(f"  📁 在 '{library_name}' 中找到 {len(items)} 个结果")
                 
@@ -238,6 +288,133 @@ class JellyfinMovieChecker:
         
         return all_results
     
+    def _build_movie_info(self, item: Dict[str, Any], library: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        把 Items 接口返回的条目转换为电影信息
+        """
+        return {
+            "id": item.get("Id"),
+            "name": item.get("Name"),
+            "year": item.get("ProductionYear"),
+            "overview": item.get("Overview", "")[:200] + "..." if item.get("Overview") and len(item.get("Overview", "")) > 200 else item.get("Overview", ""),
+            "genres": item.get("Genres", []),
+            "rating": item.get("CommunityRating"),
+            "official_rating": item.get("OfficialRating"),
+            "path": item.get("Path"),
+            "library": library["name"],
+            "library_id": library["id"],
+            "server_url": self.server_url
+        }
+    
+    def refresh_mirror(self) -> bool:
+        """
+        分页拉取所有电影库的全部影片，重建本地镜像（按名称和文件路径提取电影编号）
+        
+        Returns:
+            bool: 是否刷新成功
+        """
+        if not self.ensure_authenticated():
+            return False
+        
+        mirror = {}
+        items_url = f"{self.server_url}/Users/{self.user_id}/Items"
+        try:
+            # 获取电影库失败时抛出异常，保留旧镜像并进入重试退避，而不是换成空镜像
+            for library in self._fetch_movie_libraries():
+                start_index = 0
+                while True:
+                    params = {
+                        "ParentId": library["id"],
+                        "IncludeItemTypes": "Movie",
+                        "Recursive": "true",
+                        "StartIndex": start_index,
+                        "Limit": self.mirror_page_size,
+                        "Fields": "Genres,ProductionYear,CommunityRating,OfficialRating,Path",
+                        "EnableImages": "false"
+                    }
+                    data = self._get(items_url, params=params).json()
+                    items = data.get("Items", [])
+                    for item in items:
+                        movie_info = self._build_movie_info(item, library)
+                        codes = {
+                            normalize_movie_code(extract_movie_code(item.get("Name"))),
+                            normalize_movie_code(extract_movie_code(os.path.basename(item.get("Path") or "")))
+                        }
+                        for code in codes:
+                            if code:
+                                mirror.setdefault(code, []).append(movie_info)
+                    start_index += len(items)
+                    if not items or start_index >= data.get("TotalRecordCount", 0):
+                        break
+        except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
+            app_logger.error(f"刷新Jellyfin影片库镜像失败: {e}")
+            return False
+        
+        # 整体替换，读取方无需加锁
+        self._mirror = mirror
+        self._mirror_loaded_at = time.time()
+        app_logger.info(f"Jellyfin影片库镜像已刷新，共 {len(mirror)} 个编号")
+        return True
+    
+    def _refresh_mirror_in_background(self):
+        """后台刷新镜像，刷新期间及刷新失败后继续使用旧数据（mirror_retry_interval 秒后再重试）"""
+        try:
+            if not self.refresh_mirror():
+                self._mirror_loaded_at = time.time() - self.mirror_refresh_interval + self.mirror_retry_interval
+        finally:
+            self._mirror_refreshing = False
+    
+    def _ensure_mirror(self) -> bool:
+        """
+        确保镜像可用：首次同步加载，过期后在后台线程刷新；
+        加载失败后 mirror_retry_interval 秒内直接返回不可用，避免每次请求都同步等待 Jellyfin 超时
+        
+        Returns:
+            bool: 镜像是否可用
+        """
+        if self._mirror is None:
+            if time.time() < self._mirror_retry_at:
+                return False
+            with self._mirror_lock:
+                if self._mirror is None and time.time() >= self._mirror_retry_at:
+                    if not self.refresh_mirror():
+                        self._mirror_retry_at = time.time() + self.mirror_retry_interval
+            return self._mirror is not None
+        
+        if time.time() - self._mirror_loaded_at >= self.mirror_refresh_interval:
+            with self._mirror_lock:
+                if not self._mirror_refreshing:
+                    self._mirror_refreshing = True
+                    threading.Thread(target=self._refresh_mirror_in_background, daemon=True).start()
+        return True
+    
+    def find_many(self, codes: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        批量从本地镜像查找电影
+        
+        Args:
+            codes: 电影编号列表
+            
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: 编号 -> 匹配的电影信息列表（未找到为空列表）
+        """
+        if not self._ensure_mirror():
+            raise RuntimeError("Jellyfin影片库镜像不可用")
+        mirror = self._mirror
+        return {code: mirror.get(normalize_movie_code(code), []) for code in codes}
+    
+    def check_many(self, codes: List[str]) -> Dict[str, bool]:
+        """
+        批量检查电影是否存在（从本地镜像内存查询）
+        
+        Args:
+            codes: 电影编号列表
+            
+        Returns:
+            Dict[str, bool]: 编号 -> 是否存在
+        """
+        return {code: bool(movies) for code, movies in self.find_many(codes).items()}
+    
     def check_movie_exists(self, movie_name: str) -> Dict[str, Any]:
         """
         检查电影是否存在
@@ -251,8 +428,8 @@ class JellyfinMovieChecker:
         app_logger.info(f"🎬 正在检查电影: '{movie_name}'")
         print("=" * 50)
         
-        # 认证
-        if not self.authenticate():
+        # 认证（复用已缓存的令牌）
+        if not self.ensure_authenticated():
             return {
                 "exists": False,
                 "error": "认证失败",
@@ -6,6 +6,9 @@ cd /server/backup_sehuatang/web
 # 创建日志目录
 mkdir -p /server/backup_sehuatang/logs
 
+# 生成静态资源清单和预压缩文件
+python static_version.py
+
 # 启动 gunicorn
 gunicorn -c gunicorn_config.py app:app --daemon --pid /var/run/gunicorn.pid
 
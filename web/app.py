@@ -16,11 +16,15 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # 导入模块
 from database import db_manager
+from library_index import library_index
 from routes import register_routes
 from subscription import start_scheduler
 from jellyfin_movie_checker import JellyfinMovieChecker
 from crawler.javbus_crawler import JavBusCrawler
 from crawler.selenium_crawler import ForumSeleniumCrawler
+from cover_thumbnails import cover_srcset
+from static_version import version_manager, versioned_url
+from file_offload import file_offload
   
 # 创建Flask应用
 app = Flask(__name__, 
@@ -31,6 +35,20 @@ app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
 
 # 静态文件缓存配置
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = timedelta(days=365)  # 静态文件缓存1年
+# x-sendfile 模式下由前端代理读取文件，Flask 只返回 X-Sendfile 头
+app.config['USE_X_SENDFILE'] = file_offload.mode == 'x-sendfile'
+
+# 列表页封面缩略图（模板中使用）
+app.add_template_global(cover_srcset)
+app.add_template_global(versioned_url)
+
+@app.url_defaults
+def add_static_version(endpoint, values):
+    """url_for('static') 自动带上构建清单中的内容哈希，文件更新后浏览器会重新请求"""
+    if endpoint == 'static' and 'v' not in values:
+        entry = version_manager.versions.get(values.get('filename'))
+        if entry:
+            values['v'] = entry['hash']
 
 # 配置CORS - 允许所有来源访问
 CORS(app, resources={
@@ -91,6 +109,9 @@ def init_components():
     # 初始化MongoDB
     db_manager.init_mongodb()
     
+    # 扫描本地影片库并启动增量重扫
+    library_index.start()
+    
     # 初始化Jellyfin检查器
     try:
         jellyfin_checker = JellyfinMovieChecker()
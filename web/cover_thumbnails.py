@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+封面缩略图模块 - 为 static/images/covers 下的原图生成卡片尺寸的缩略图和 WebP 版本
+
+原图：covers/<code>/<code>_cover.jpg
+派生：covers/<code>/<code>_cover_w<宽度>.jpg 和 covers/<code>/<code>_cover_w<宽度>.webp
+
+封面下载完成后立即生成；已有封面用本模块的命令行批量补齐（进程池并行）。
+列表页模板通过 cover_srcset 取得 srcset，派生文件不存在时仍使用原图。
+依赖 Pillow，未安装时不生成派生文件。
+
+使用方法：
+python cover_thumbnails.py
+python cover_thumbnails.py --workers 8 --force
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+import app_logger
+
+# 添加父目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import config as app_config
+
+COVERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'images', 'covers')
+COVER_SUFFIX = '_cover.jpg'
+
+cover_thumbnail_config = app_config.get_cover_thumbnail_config()
+
+
+def derivative_path(cover_path, width, ext):
+    """原图路径 -> 指定宽度和格式的派生文件路径"""
+    return f"{cover_path[:-len('.jpg')]}_w{width}.{ext}"
+
+
+def _is_fresh(path, source_mtime):
+    try:
+        return os.path.getmtime(path) >= source_mtime
+    except OSError:
+        return False
+
+
+def _save_atomic(image, path, **save_options):
+    """先写临时文件再改名，避免页面读到写了一半的图片"""
+    temp_path = f"{path}.{os.getpid()}.part"
+    image.save(temp_path, **save_options)
+    os.replace(temp_path, path)
+
+
+def generate_derivatives(cover_path, widths=None, force=False):
+    """为一张封面生成各宽度的 JPEG 缩略图和 WebP 版本，返回新生成的文件数；失败返回 -1"""
+    if Image is None:
+        return 0
+    widths = widths or cover_thumbnail_config['widths']
+    try:
+        source_mtime = os.path.getmtime(cover_path)
+        formats = ['jpg', 'webp'] if cover_thumbnail_config['webp'] else ['jpg']
+        pending = [(width, ext) for width in widths for ext in formats
+                   if force or not _is_fresh(derivative_path(cover_path, width, ext), source_mtime)]
+        if not pending:
+            return 0
+
+        with Image.open(cover_path) as source:
+            source = source.convert('RGB')
+            generated = 0
+            for width in sorted({width for width, _ in pending}):
+                # 不放大：原图比目标宽度还窄时按原尺寸输出
+                if source.width > width:
+                    height = round(source.height * width / source.width)
+                    resized = source.resize((width, height), Image.LANCZOS)
+                else:
+                    resized = source
+                for target_width, ext in pending:
+                    if target_width != width:
+                        continue
+                    path = derivative_path(cover_path, width, ext)
+                    if ext == 'webp':
+                        _save_atomic(resized, path, format='WEBP', quality=cover_thumbnail_config['webp_quality'], method=4)
+                    else:
+                        _save_atomic(resized, path, format='JPEG', quality=cover_thumbnail_config['jpeg_quality'],
+                                     optimize=True, progressive=True)
+                    generated += 1
+        return generated
+    except Exception as e:
+        app_logger.warning(f"生成封面缩略图失败 {cover_path}: {e}")
+        return -1
+
+
+def cover_srcset(code, widths=None):
+    """返回列表页卡片使用的 srcset：{'jpg': ..., 'webp': ...}，派生文件不全时返回 None"""
+    if not code:
+        return None
+    widths = widths or cover_thumbnail_config['widths']
+    cover_path = os.path.join(COVERS_DIR, code, f"{code}{COVER_SUFFIX}")
+    formats = ['jpg', 'webp'] if cover_thumbnail_config['webp'] else ['jpg']
+    srcset = {}
+    for ext in formats:
+        entries = []
+        for width in widths:
+            if not os.path.exists(derivative_path(cover_path, width, ext)):
+                return None
+            entries.append(f"/static/images/covers/{code}/{code}_cover_w{width}.{ext} {width}w")
+        srcset[ext] = ', '.join(entries)
+    return srcset
+
+
+def find_covers(covers_dir=COVERS_DIR):
+    """列出封面目录下的全部原图"""
+    covers = []
+    for dir_path, _, file_names in os.walk(covers_dir):
+        for file_name in file_names:
+            if file_name.endswith(COVER_SUFFIX):
+                covers.append(os.path.join(dir_path, file_name))
+    return covers
+
+
+def backfill(covers_dir=COVERS_DIR, workers=None, force=False):
+    """用进程池为已有封面补齐派生文件，返回 (处理封面数, 生成文件数, 失败数)"""
+    if Image is None:
+        app_logger.warning("未安装 Pillow，无法生成封面缩略图")
+        return 0, 0, 0
+    covers = find_covers(covers_dir)
+    generated = 0
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        results = executor.map(generate_derivatives, covers, [None] * len(covers), [force] * len(covers), chunksize=32)
+        for result in results:
+            if result < 0:
+                failed += 1
+            else:
+                generated += result
+    return len(covers), generated, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为已有封面批量生成缩略图和 WebP 版本")
+    parser.add_argument("--dir", default=COVERS_DIR, help="封面目录")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认为 CPU 核数")
+    parser.add_argument("--force", action="store_true", help="重新生成已存在的派生文件")
+    args = parser.parse_args()
+
+    start = time.time()
+    total, generated, failed = backfill(args.dir, args.workers, args.force)
+    print(f"✅ 处理封面 {total} 张，生成 {generated} 个文件，失败 {failed} 张，耗时 {time.time() - start:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫解析器离线基准测试 - 基于 corpus/ 中保存的页面，不访问任何网站
+
+对每个解析器报告：页面数/秒、单页耗时 p50/p99、单页内存分配峰值（tracemalloc）。
+语料页面及其类型登记在 corpus/manifest.json 中。
+
+使用方法：
+python bench_parsers.py
+python bench_parsers.py --parser pageparser --repeat 50
+python bench_parsers.py --json result.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+CRAWLER_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(CRAWLER_DIR, 'corpus')
+
+# web、crawler、crawler/javbus 目录都要能被导入
+for path in (os.path.dirname(CRAWLER_DIR), CRAWLER_DIR, os.path.join(CRAWLER_DIR, 'javbus')):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from percentiles import percentile
+
+
+def _javbus_detail():
+    # parser_content 还会请求磁力链接 AJAX 并提交封面下载，这里只测纯解析部分
+    import pageparser
+    return pageparser.parse_detail_page
+
+
+def _javbus_magnet():
+    import pageparser
+    return pageparser._parser_magnet
+
+
+def _javbus_movie_items():
+    from javbus_crawler import JavBusCrawler
+    return JavBusCrawler().parse_movie_items
+
+
+def _javbus_pagination():
+    from javbus_crawler import JavBusCrawler
+    return JavBusCrawler().parse_pagination
+
+
+def _actress_movies():
+    import listparser
+    return listparser.parse_actress_movies
+
+
+def _forum_crawler():
+    from selenium_crawler import ForumSeleniumCrawler
+    # 不调用 __init__，避免启动浏览器；解析方法不依赖 WebDriver
+    return ForumSeleniumCrawler.__new__(ForumSeleniumCrawler)
+
+
+def _forum_thread_links():
+    return _forum_crawler().parse_thread_links
+
+
+def _forum_title_and_magnet():
+    return _forum_crawler().extract_title_and_magnet
+
+
+# 解析器名称 -> (适用的页面类型, 返回解析函数的工厂)
+PARSERS = {
+    'pageparser.parse_detail_page': ('javbus_detail', _javbus_detail),
+    'pageparser._parser_magnet': ('javbus_magnet', _javbus_magnet),
+    'JavBusCrawler.parse_movie_items': ('javbus_list', _javbus_movie_items),
+    'JavBusCrawler.parse_pagination': ('javbus_list', _javbus_pagination),
+    'listparser.parse_actress_movies': ('javbus_list', _actress_movies),
+    'ForumSeleniumCrawler.parse_thread_links': ('forum_list', _forum_thread_links),
+    'ForumSeleniumCrawler.extract_title_and_magnet': ('forum_thread', _forum_title_and_magnet),
+}
+
+
+def load_corpus(corpus_dir):
+    """读取 manifest.json 登记的页面，返回 {页面类型: [(文件名, html)]}"""
+    with open(os.path.join(corpus_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    corpus = {}
+    for page in manifest['pages']:
+        file_path = os.path.normpath(os.path.join(corpus_dir, page['file']))
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            corpus.setdefault(page['kind'], []).append((os.path.basename(file_path), f.read()))
+    return corpus
+
+
+def bench_parser(parse_func, pages, repeat):
+    """计时与内存分配分开测量，避免 tracemalloc 拖慢计时"""
+    for _, html in pages:
+        parse_func(html)
+
+    timings = []
+    for _ in range(repeat):
+        for _, html in pages:
+            start = time.perf_counter()
+            parse_func(html)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _, html in pages:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            parse_func(html)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    total = sum(timings)
+    return {
+        'pages': len(pages),
+        'calls': len(timings),
+        'pages_per_sec': round(len(timings) / total, 1) if total else 0.0,
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'alloc_peak_kb_avg': round(sum(peaks) / len(peaks) / 1024, 1),
+        'alloc_peak_kb_max': round(max(peaks) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="爬虫解析器离线基准测试")
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="语料目录（包含 manifest.json）")
+    parser.add_argument("--parser", default='', help="只运行名称包含该字符串的解析器")
+    parser.add_argument("--repeat", type=int, default=20, help="每个页面重复解析次数")
+    parser.add_argument("--json", dest="json_path", help="把结果写入 JSON 文件，便于前后对比")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    results = {}
+    for name, (kind, factory) in PARSERS.items():
+        if args.parser not in name:
+            continue
+        pages = corpus.get(kind)
+        if not pages:
+            print(f"⚠️ {name}: 语料中没有 {kind} 类型的页面")
+            continue
+        try:
+            parse_func = factory()
+        except ImportError as e:
+            print(f"⚠️ {name}: 无法导入 ({e})")
+            continue
+        results[name] = bench_parser(parse_func, pages, args.repeat)
+
+    print(f"{'解析器':<46}{'页数':>5}{'页/秒':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'峰值KB':>9}{'最大KB':>9}")
+    for name, result in results.items():
+        print(f"{name:<48}{result['pages']:>5}{result['pages_per_sec']:>10}{result['p50_ms']:>10}"
+              f"{result['p99_ms']:>10}{result['alloc_peak_kb_avg']:>9}{result['alloc_peak_kb_max']:>9}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已写入 {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
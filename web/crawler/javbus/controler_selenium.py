@@ -18,13 +18,18 @@ import re
 from bs4 import BeautifulSoup
 import app_logger
 import pageparser
+# 列表页解析函数（纯 HTML 解析，可离线基准测试）
+from listparser import parse_actress_info, parse_actress_movies, get_next_page_url_actress
 
 # 添加父目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import db_manager
+from config import config as app_config
+from pipeline import DetailPipeline, DriverPool, HostRateLimiter
 # 导入 MongoDB 操作模块
  # 在文件开头添加
 from selenium_base import BaseSeleniumController
+from page_cache import page_cache
 
 
 # 加载环境变量
@@ -40,8 +45,12 @@ jav_base_url = 'https://www.javbus.com'
 
 class JavBusSeleniumController(BaseSeleniumController):
      
-    def get_page_content(self, url, max_retries=None):
-        """使用Selenium获取页面内容，支持重试机制"""
+    def get_page_content(self, url, max_retries=None, use_cache=True):
+        """使用Selenium获取页面内容，支持重试机制（use_cache 为 True 时优先读取未过期的页面缓存）"""
+        if use_cache:
+            cached = page_cache.get(url)
+            if cached:
+                return cached
         if not self.driver:
             app_logger.error("WebDriver未初始化")
             return None
@@ -82,7 +91,11 @@ class JavBusSeleniumController(BaseSeleniumController):
                 while(self.simulate_human_behavior()):
                     # 添加延时
                     time.sleep(self.delay) 
-                return self.driver.page_source
+                page_source = self.driver.page_source
+                # 验证页面不写入缓存
+                if not self.is_verification_page(page_source):
+                    page_cache.put(url, page_source)
+                return page_source
                 
             except TimeoutException:
                 app_logger.error(f"页面加载超时: {url} (尝试{attempt + 1}/{max_retries})")
@@ -105,6 +118,11 @@ class JavBusSeleniumController(BaseSeleniumController):
     
     
     
+    def is_verification_page(self, page_source):
+        """判断是否为安全验证/年龄验证页面"""
+        return ('验证您是否是真人' in page_source or 'security check' in page_source.lower()
+                or 'Age Verification JavBus' in page_source)
+
     def call_llm_for_driving_test(self, questions_html):
         """使用大模型分析驾驶证考试题并返回答案"""
         try:
@@ -622,175 +640,6 @@ def parse_html_with_selenium(url, parser_func, headless=True, delay=3):
 
 
 
-def parse_actress_info(html_content, base_url=None):
-    """解析演员个人信息"""
-    try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # 查找演员信息区域
-        avatar_box = soup.find('div', class_='avatar-box')
-        if not avatar_box:
-            app_logger.info("未找到演员信息区域")
-            return None
-            
-        actress_info = {}
-        
-        # 获取演员头像
-        photo_frame = avatar_box.find('div', class_='photo-frame')
-        if photo_frame:
-            img = photo_frame.find('img')
-            if img:
-                img_src = img.get('src', '')
-                # 构建完整的图片URL
-                if base_url and img_src:
-                    actress_info['image_url'] = urljoin(base_url, img_src)
-                else:
-                    actress_info['image_url'] = img_src
-                actress_info['name'] = img.get('title', '')
-        
-        # 获取演员详细信息
-        photo_info = avatar_box.find('div', class_='photo-info')
-        if photo_info:
-            # 获取演员名称（如果头像中没有获取到）
-            if not actress_info.get('name'):
-                name_span = photo_info.find('span', class_='pb10')
-                if name_span:
-                    actress_info['name'] = name_span.get_text(strip=True)
-            
-            # 获取身体数据
-            info_paragraphs = photo_info.find_all('p')
-            for p in info_paragraphs:
-                text = p.get_text(strip=True)
-                if '身高:' in text:
-                    actress_info['height'] = text.replace('身高:', '').strip()
-                elif '罩杯:' in text:
-                    actress_info['cup_size'] = text.replace('罩杯:', '').strip()
-                elif '胸圍:' in text:
-                    actress_info['bust'] = text.replace('胸圍:', '').strip()
-                elif '腰圍:' in text:
-                    actress_info['waist'] = text.replace('腰圍:', '').strip()
-                elif '臀圍:' in text:
-                    actress_info['hip'] = text.replace('臀圍:', '').strip()
-                elif '愛好:' in text:
-                    actress_info['hobby'] = text.replace('愛好:', '').strip()
-        
-        return actress_info
-        
-    except Exception as e:
-        app_logger.info("解析演员信息时出错: {e}")
-        return None
-
-def parse_actress_movies(html_content):
-    """解析演员的影片列表"""
-    try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        movies = []
-        
-        # 查找所有影片项目
-        movie_items = soup.find_all('div', class_='item')
-        
-        for item in movie_items:
-            # 跳过演员信息区域
-            if item.find('div', class_='avatar-box'):
-                continue
-                
-            movie_box = item.find('a', class_='movie-box')
-            if not movie_box:
-                continue
-                
-            movie_info = {}
-            
-            # 获取影片链接
-            movie_info['url'] = movie_box.get('href', '')
-            
-            # 获取封面图片
-            photo_frame = movie_box.find('div', class_='photo-frame')
-            if photo_frame:
-                img = photo_frame.find('img')
-                if img:
-                    movie_info['cover_url'] = img.get('src', '')
-                    movie_info['title'] = img.get('title', '')
-            
-            # 获取影片详细信息
-            photo_info = movie_box.find('div', class_='photo-info')
-            if photo_info:
-                # 获取标题（如果封面中没有获取到）
-                if not movie_info.get('title'):
-                    span = photo_info.find('span')
-                    if span:
-                        title_text = span.get_text(strip=True)
-                        # 移除标签信息，只保留标题
-                        if '<br' in str(span):
-                            title_text = title_text.split('\n')[0] if '\n' in title_text else title_text
-                        movie_info['title'] = title_text
-                
-                # 获取标签信息
-                item_tags = photo_info.find('div', class_='item-tag')
-                tags = []
-                if item_tags:
-                    buttons = item_tags.find_all('button')
-                    for button in buttons:
-                        tag_text = button.get_text(strip=True)
-                        if tag_text:
-                            tags.append(tag_text)
-                movie_info['tags'] = tags
-                
-                # 获取识别码和发行日期
-                date_elements = photo_info.find_all('date')
-                if len(date_elements) >= 2:
-                    movie_info['code'] = date_elements[0].get_text(strip=True)
-                    movie_info['release_date'] = date_elements[1].get_text(strip=True)
-                elif len(date_elements) == 1:
-                    # 尝试从文本中分离识别码和日期
-                    date_text = date_elements[0].get_text(strip=True)
-                    if '/' in date_text:
-                        parts = date_text.split('/')
-                        movie_info['code'] = parts[0].strip()
-                        if len(parts) > 1:
-                            movie_info['release_date'] = parts[1].strip()
-                    else:
-                        movie_info['code'] = date_text
-            
-            if movie_info.get('url'):  # 确保有有效的URL
-                movies.append(movie_info)
-        
-        return movies
-        
-    except Exception as e:
-        app_logger.info("解析演员影片列表时出错: {e}")
-        return []
-
-def get_next_page_url_actress(current_url, html_content):
-    """获取演员页面的下一页URL"""
-    try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # 查找下一页链接
-        next_link = soup.find('a', id='next')
-        if next_link and next_link.get('href'):
-            next_href = next_link.get('href')
-            
-            # 构建完整的URL
-            from urllib.parse import urljoin, urlparse
-            parsed_current = urlparse(current_url)
-            
-            # 如果是相对路径，构建完整URL
-            if next_href.startswith('/'):
-                next_url = f"{parsed_current.scheme}://{parsed_current.netloc}{next_href}"
-            elif next_href.startswith('http'):
-                next_url = next_href
-            else:
-                # 相对路径处理
-                next_url = urljoin(current_url, next_href)
-            
-            return next_url
-        
-        return None
-        
-    except Exception as e:
-        app_logger.info("获取下一页URL时出错: {e}")
-        return None
-
 def update_actress_data(actress_info,code):
     """更新演员数据到数据库"""
     try:
@@ -815,8 +664,24 @@ def update_actress_data(actress_info,code):
         app_logger.info("更新演员数据时出错: {e}")
         return False
 
+def create_detail_pipeline():
+    """创建影片详情页流水线：首个浏览器复用模块级 controller，其余按需创建"""
+    page_cache.prune_if_due()
+    crawler_config = app_config.get_crawler_config()
+    driver_pool = DriverPool(
+        lambda: JavBusSeleniumController(headless=crawler_config['headless'], delay=crawler_config['delay']),
+        size=crawler_config['fetch_workers'],
+        rate_limiter=HostRateLimiter(crawler_config['delay']),
+        initial=controller,
+    )
+    return DetailPipeline(driver_pool, parse_workers=crawler_config['parse_workers'],
+                          max_pending=crawler_config['max_pending'])
+
 def process_home_page(max_pages = 100):
+    # 详情页交给流水线并发抓取、解析和批量写入，列表页与详情页共用同一浏览器池和限速器
+    pipeline = None
     try:
+        pipeline = create_detail_pipeline()
         current_url = jav_base_url
         app_logger.info(f"开始处理页面: {jav_base_url}")
         page_count = 0
@@ -826,7 +691,7 @@ def process_home_page(max_pages = 100):
             app_logger.info(f"正在处理第 {page_count + 1} 页: {current_url}")
             
             # 获取页面内容
-            html_content = controller.get_page_content(current_url)
+            html_content = pipeline.driver_pool.get_page_content(current_url)
             if not html_content:
                 app_logger.info(f"无法获取页面内容: {current_url}")
                 break
@@ -838,26 +703,8 @@ def process_home_page(max_pages = 100):
             total_moviesCount += len(movies)
             for movie in movies: 
                 code = movie['code'] 
-                if code:
-                    try:
-                        # 获取影片详细页面
-                        movie_html =  controller.get_page_content(movie['url']) 
-                        if movie_html:
-                            # 使用pageparser解析影片详细信息
-                            movie_detail = pageparser.parser_content(movie_html)
-                            #app_logger.info(f'解析影片详细页面: {movie_detail}')
-                            if movie_detail:
-                                # 写入数据库
-                                db_manager.write_jav_movie(movie_detail)
-                            else:
-                                app_logger.error(f"✗ 无法解析影片详情: {movie['url']}")
-                                db_manager.add_retry_url(movie['url'], 'parse_error', '无法解析影片详情',code)
-                        else:
-                            app_logger.error(f"✗ 无法获取影片页面: {movie['url']}")
-                            db_manager.add_retry_url(movie['url'], 'fetch_error', '无法获取影片页面',code)
-                    except Exception as e:
-                        app_logger.error(f"✗ 处理影片时出错 {movie['url']}: {e}")
-                        db_manager.add_retry_url(movie['url'], 'process_error', str(e),code)
+                if code and not pipeline.is_submitted(code):
+                    pipeline.submit(movie)
                 else:
                     app_logger.info(f"没有对应的电影code {code}")
             
@@ -867,24 +714,29 @@ def process_home_page(max_pages = 100):
                 app_logger.info(f"找到下一页: {next_url}")
                 current_url = next_url
                 page_count += 1
-                
-                # 添加延迟避免请求过快
-                import time
-                time.sleep(2)
             else:
                 app_logger.info("没有更多页面")
                 break
         
+        pipeline.close()
         app_logger.info(f"演员页面处理完成，共处理 {page_count + 1} 页，{total_moviesCount} 部影片")
         
         
         
     except Exception as e:
         app_logger.info(f"处理演员页面时出错: {e}")
+        if pipeline is not None:
+            pipeline.close()
+    finally:
+        if pipeline is not None:
+            pipeline.driver_pool.close()
 
 def process_actress_page(code, max_pages=None):
     """处理演员页面，获取演员信息和所有影片"""
+    # 详情页交给流水线并发抓取、解析和批量写入，列表页与详情页共用同一浏览器池和限速器
+    pipeline = None
     try:
+        pipeline = create_detail_pipeline()
         app_logger.info(f"开始处理演员页面: {code}")
         current_url = (f'{jav_base_url}/star/{code}')
          
@@ -896,7 +748,7 @@ def process_actress_page(code, max_pages=None):
             app_logger.info(f"正在处理第 {page_count + 1} 页: {current_url}")
             
             # 获取页面内容
-            html_content = controller.get_page_content(current_url)
+            html_content = pipeline.driver_pool.get_page_content(current_url)
             if not html_content:
                 app_logger.info(f"无法获取页面内容: {current_url}")
                 break
@@ -918,27 +770,8 @@ def process_actress_page(code, max_pages=None):
              
             for movie in movies: 
                 code = movie['code'] 
-                if code and db_manager.is_movie_crawed(code) == False:
-                    try:
-                        # 获取影片详细页面
-                        movie_html =  controller.get_page_content(movie['url']) 
-                        if movie_html:
-                            # 使用pageparser解析影片详细信息
-                            movie_detail = pageparser.parser_content(movie_html)
-                            #app_logger.info(f'解析影片详细页面: {movie_detail}')
-                            if movie_detail:
-                                # 写入数据库
-                                db_manager.write_jav_movie(movie_detail)
-                                #app_logger.info(f"✓ 已保存影片: {movie_detail.get('識別碼', 'Unknown')}")
-                            else:
-                                app_logger.error(f"✗ 无法解析影片详情: {movie['url']}")
-                                db_manager.add_retry_url(movie['url'], 'parse_error', '无法解析影片详情',code)
-                        else:
-                            app_logger.error(f"✗ 无法获取影片页面: {movie['url']}")
-                            db_manager.add_retry_url(movie['url'], 'fetch_error', '无法获取影片页面',code)
-                    except Exception as e:
-                        app_logger.error(f"✗ 处理影片时出错 {movie['url']}: {e}")
-                        db_manager.add_retry_url(movie['url'], 'process_error', str(e),code)
+                if code and not pipeline.is_submitted(code) and db_manager.is_movie_crawed(code) == False:
+                    pipeline.submit(movie)
                 else:
                     app_logger.info(f"跳过已处理的影片: {movie['url']}")
             total_movies.extend(movies)
@@ -949,14 +782,11 @@ def process_actress_page(code, max_pages=None):
                 app_logger.info(f"找到下一页: {next_url}")
                 current_url = next_url
                 page_count += 1
-                
-                # 添加延迟避免请求过快
-                import time
-                time.sleep(2)
             else:
                 app_logger.info("没有更多页面")
                 break
         
+        pipeline.close()
         app_logger.info(f"演员页面处理完成，共处理 {page_count + 1} 页，{len(total_movies)} 部影片")
         
         return {
@@ -968,7 +798,12 @@ def process_actress_page(code, max_pages=None):
         
     except Exception as e:
         app_logger.info(f"处理演员页面时出错: {e}")
+        if pipeline is not None:
+            pipeline.close()
         return None
+    finally:
+        if pipeline is not None:
+            pipeline.driver_pool.close()
 
 # 使用示例
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+#-*-coding:utf-8-*-
+"""
+JavBus 列表页解析 - 演员信息、影片列表、下一页链接
+
+只做 HTML 解析、不依赖浏览器和数据库，controler_selenium 与离线基准测试共用。
+"""
+
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+import app_logger
+
+
+def parse_actress_info(html_content, base_url=None):
+    """解析演员个人信息"""
+    try:
+        soup = BeautifulSoup(html_content, 'html.parser')
+        
+        # 查找演员信息区域
+        avatar_box = soup.find('div', class_='avatar-box')
+        if not avatar_box:
+            app_logger.info("未找到演员信息区域")
+            return None
+            
+        actress_info = {}
+        
+        # 获取演员头像
+        photo_frame = avatar_box.find('div', class_='photo-frame')
+        if photo_frame:
+            img = photo_frame.find('img')
+            if img:
+                img_src = img.get('src', '')
+                # 构建完整的图片URL
+                if base_url and img_src:
+                    actress_info['image_url'] = urljoin(base_url, img_src)
+                else:
+                    actress_info['image_url'] = img_src
+                actress_info['name'] = img.get('title', '')
+        
+        # 获取演员详细信息
+        photo_info = avatar_box.find('div', class_='photo-info')
+        if photo_info:
+            # 获取演员名称（如果头像中没有获取到）
+            if not actress_info.get('name'):
+                name_span = photo_info.find('span', class_='pb10')
+                if name_span:
+                    actress_info['name'] = name_span.get_text(strip=True)
+            
+            # 获取身体数据
+            info_paragraphs = photo_info.find_all('p')
+            for p in info_paragraphs:
+                text = p.get_text(strip=True)
+                if '身高:' in text:
+                    actress_info['height'] = text.replace('身高:', '').strip()
+                elif '罩杯:' in text:
+                    actress_info['cup_size'] = text.replace('罩杯:', '').strip()
+                elif '胸圍:' in text:
+                    actress_info['bust'] = text.replace('胸圍:', '').strip()
+                elif '腰圍:' in text:
+                    actress_info['waist'] = text.replace('腰圍:', '').strip()
+                elif '臀圍:' in text:
+                    actress_info['hip'] = text.replace('臀圍:', '').strip()
+                elif '愛好:' in text:
+                    actress_info['hobby'] = text.replace('愛好:', '').strip()
+        
+        return actress_info
+        
+    except Exception as e:
+        app_logger.info("解析演员信息时出错: {e}")
+        return None
+
+def parse_actress_movies(html_content):
+    """解析演员的影片列表"""
+    try:
+        soup = BeautifulSoup(html_content, 'html.parser')
+        movies = []
+        
+        # 查找所有影片项目
+        movie_items = soup.find_all('div', class_='item')
+        
+        for item in movie_items:
+            # 跳过演员信息区域
+            if item.find('div', class_='avatar-box'):
+                continue
+                
+            movie_box = item.find('a', class_='movie-box')
+            if not movie_box:
+                continue
+                
+            movie_info = {}
+            
+            # 获取影片链接
+            movie_info['url'] = movie_box.get('href', '')
+            
+            # 获取封面图片
+            photo_frame = movie_box.find('div', class_='photo-frame')
+            if photo_frame:
+                img = photo_frame.find('img')
+                if img:
+                    movie_info['cover_url'] = img.get('src', '')
+                    movie_info['title'] = img.get('title', '')
+            
+            # 获取影片详细信息
+            photo_info = movie_box.find('div', class_='photo-info')
+            if photo_info:
+                # 获取标题（如果封面中没有获取到）
+                if not movie_info.get('title'):
+                    span = photo_info.find('span')
+                    if span:
+                        title_text = span.get_text(strip=True)
+                        # 移除标签信息，只保留标题
+                        if '<br' in str(span):
+                            title_text = title_text.split('\n')[0] if '\n' in title_text else title_text
+                        movie_info['title'] = title_text
+                
+                # 获取标签信息
+                item_tags = photo_info.find('div', class_='item-tag')
+                tags = []
+                if item_tags:
+                    buttons = item_tags.find_all('button')
+                    for button in buttons:
+                        tag_text = button.get_text(strip=True)
+                        if tag_text:
+                            tags.append(tag_text)
+                movie_info['tags'] = tags
+                
+                # 获取识别码和发行日期
+                date_elements = photo_info.find_all('date')
+                if len(date_elements) >= 2:
+                    movie_info['code'] = date_elements[0].get_text(strip=True)
+                    movie_info['release_date'] = date_elements[1].get_text(strip=True)
+                elif len(date_elements) == 1:
+                    # 尝试从文本中分离识别码和日期
+                    date_text = date_elements[0].get_text(strip=True)
+                    if '/' in date_text:
+                        parts = date_text.split('/')
+                        movie_info['code'] = parts[0].strip()
+                        if len(parts) > 1:
+                            movie_info['release_date'] = parts[1].strip()
+                    else:
+                        movie_info['code'] = date_text
+            
+            if movie_info.get('url'):  # 确保有有效的URL
+                movies.append(movie_info)
+        
+        return movies
+        
+    except Exception as e:
+        app_logger.info("解析演员影片列表时出错: {e}")
+        return []
+
+def get_next_page_url_actress(current_url, html_content):
+    """获取演员页面的下一页URL"""
+    try:
+        soup = BeautifulSoup(html_content, 'html.parser')
+        
+        # 查找下一页链接
+        next_link = soup.find('a', id='next')
+        if next_link and next_link.get('href'):
+            next_href = next_link.get('href')
+            
+            # 构建完整的URL
+            from urllib.parse import urljoin, urlparse
+            parsed_current = urlparse(current_url)
+            
+            # 如果是相对路径，构建完整URL
+            if next_href.startswith('/'):
+                next_url = f"{parsed_current.scheme}://{parsed_current.netloc}{next_href}"
+            elif next_href.startswith('http'):
+                next_url = next_href
+            else:
+                # 相对路径处理
+                next_url = urljoin(current_url, next_href)
+            
+            return next_url
+        
+        return None
+        
+    except Exception as e:
+        app_logger.info("获取下一页URL时出错: {e}")
+        return None
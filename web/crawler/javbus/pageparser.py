@@ -8,17 +8,32 @@ import os
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
+import sys
 from database import db_manager
+from image_download_queue import image_download_queue
+from cover_thumbnails import COVER_SUFFIX, generate_derivatives
 import app_logger
-import app
+
+# 添加上级目录到路径以导入页面缓存模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from page_cache import page_cache
+
+# 封面保存目录（web/static/images/covers），与 Flask 的 static 目录一致
+COVERS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'static', 'images', 'covers')
 
 headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Referer': 'https://www.javbus.com/'
         }
 
-def _get_cili_url(soup):
-    """get_cili(soup).get the ajax url and Referer url of request"""
+# 详情页内联脚本中的磁力链接 AJAX 参数
+_CILI_IMG_PATTERN = re.compile(r"var img = '(.*?)'")
+_CILI_UC_PATTERN = re.compile(r"var uc = (.*?);")
+_CILI_GID_PATTERN = re.compile(r"var gid = (.*?);")
+
+
+def _get_cili_url(html):
+    """_get_cili_url(html).get the ajax url of magnet request from the raw page html"""
 
     # ajax_get_cili_url = 'https://www.javbus5.com/ajax/uncledatoolsbyajax.php?lang=zh'
     ajax_get_cili_url = 'https://www.javbus.com/ajax/uncledatoolsbyajax.php?lang=zh'
@@ -31,58 +46,39 @@ def _get_cili_url(soup):
     2:
     "\r\n\tvar img = '/pics/cover/apwc_b.jpg'"
     '''
-    
-    # ajax_data = soup.select('script')[9].text
-    # for l in ajax_data.split(';')[:-1]:
-    #     ajax_get_cili_url += '&%s' % l[7:].replace("'","").replace(' ','')
-
-    html = soup.prettify()
-    '''获取img'''
-    img_pattern = re.compile(r"var img = '.*?'")
-    match = img_pattern.findall(html)
-    img=match[0].replace("var img = '","").replace("'","")
-
-    '''获取uc'''
-    uc_pattern = re.compile(r"var uc = .*?;")
-    match = uc_pattern.findall(html)
-    uc = match[0].replace("var uc = ", "").replace(";","")
-
-    '''获取gid'''
-    gid_pattern = re.compile(r"var gid = .*?;")
-    match = gid_pattern.findall(html)
-    gid = match[0].replace("var gid = ", "").replace(";","")
+
+    # 直接在原始 HTML 上匹配，无需构建 soup 再 prettify
+    img = _CILI_IMG_PATTERN.search(html).group(1)
+    uc = _CILI_UC_PATTERN.search(html).group(1).strip()
+    gid = _CILI_GID_PATTERN.search(html).group(1).strip()
 
     ajax_get_cili_url = ajax_get_cili_url + '&gid=' + gid + '&img=' + img + '&uc=' + uc
     return ajax_get_cili_url
 
 
+def _clean_magnet_text(text):
+    return text.replace(" ", "").replace("\t", "").replace("\r\n","").replace("\n","")
+
+
 def _parser_magnet(html):
-    """parser_magnet(html),get all magnets from a html and return the str of magnet"""
+    """parser_magnet(html),get all magnets from a html and return the list of magnet dicts"""
 
-    #存放磁力的字符串
-    magnet = ''
+    #存放磁力的列表
+    magnets = []
+    # AJAX 返回的只是几行表格，soup 构建成本很低
     soup = BeautifulSoup(html,"html.parser")
-    # for td in soup.select('td[width="70%"]'):
-        # magnet += td.a['href'] + '\n'
-    
-    avdist={'title':'','magnet':'','size':'','date':''}
+
+    # 每行依次为 标题、大小、日期 三列，每列都是指向磁力链接的 <a>
     for tr in soup.find_all('tr'):
-        i=0
-        for td in tr:
-            if(td.string):
-                continue
-            i=i+1
-            avdist['magnet']=td.a['href']
-            if (i%3 == 1):
-                avdist['title'] = td.a.text.replace(" ", "").replace("\t", "").replace("\r\n","").replace("\n","")
-            if (i%3 == 2):
-                avdist['size'] = td.a.text.replace(" ", "").replace("\t", "").replace("\r\n","").replace("\n","")
-            if (i%3 == 0):
-                avdist['date'] = td.a.text.replace(" ", "").replace("\t", "").replace("\r\n","").replace("\n","")
-        # print(avdist)
-        magnet += '%s\n' % avdist
-
-    return magnet
+        links = [td.a for td in tr.find_all('td') if td.a is not None]
+        if not links:
+            continue
+        avdist = {'title':'','magnet':links[-1].get('href', ''),'size':'','date':''}
+        for key, link in zip(('title', 'size', 'date'), links):
+            avdist[key] = _clean_magnet_text(link.get_text())
+        magnets.append(avdist)
+
+    return magnets
 
 def get_next_page_url(entrance, html):
     """get_next_page_url(entrance, html),return the url of next page if exist"""
@@ -133,6 +129,8 @@ def download_image(image_url, save_path, filename,code_name,remove=False):
         
         with open(file_path, 'wb') as f:
             f.write(response.content)
+        if file_path.endswith(COVER_SUFFIX):
+            generate_derivatives(file_path)
         
         print(f"图片已保存: {file_path}")
         return file_path
@@ -149,193 +147,178 @@ def get_file_extension(url):
         return path.split('.')[-1].lower()
     return 'jpg'  # 默认扩展名
 
-def parser_content(html):
-    """parser_content(html),parser page's content of every url and yield the dict of content"""
+# 详情页信息栏：<span class="header">标签:</span> 后面跟 <span>/<a> 包裹的值或纯文本
+# 一次扫描取出全部标签，替代每个字段、每种语言各自全文搜索一遍
+_HEADER_PATTERN = re.compile(
+    r'<span class="header">([^<]+?):</span>\s*(?:<(span|a)\b([^>]*)>([^<]+)</(?:span|a)>|([^<]+))'
+)
+_HREF_PATTERN = re.compile(r'href="([^"]*)"')
+_DATE_VALUE_PATTERN = re.compile(r'[0-9-]+')
+
+# 各语言标签 -> (字段名, 值的形式)：span 为 <span> 包裹，link 为 <a> 链接，text 为纯文本
+_HEADER_FIELDS = {
+    '識別碼': ('識別碼', 'span'), '品番': ('識別碼', 'span'),
+    '發行日期': ('發行日期', 'text'), '発売日': ('發行日期', 'text'), 'Release Date': ('發行日期', 'text'),
+    '長度': ('長度', 'text'), '収録時間': ('長度', 'text'), 'Runtime': ('長度', 'text'),
+    '導演': ('導演', 'link'), '監督': ('導演', 'link'), 'Director': ('導演', 'link'),
+    '製作商': ('製作商', 'link'), 'メーカー': ('製作商', 'link'), 'Studio': ('製作商', 'link'),
+    '發行商': ('發行商', 'link'), 'レーベル': ('發行商', 'link'), 'Label': ('發行商', 'link'),
+    '系列': ('系列', 'link'), 'シリーズ': ('系列', 'link'), 'Series': ('系列', 'link'),
+}
+_HEADER_TAGS = {'span': 'span', 'link': 'a'}
+
+
+def _scan_header_fields(html):
+    """单次扫描信息栏，返回 {字段名: (值, 链接)}，同一字段取第一次出现的值"""
+    fields = {}
+    for match in _HEADER_PATTERN.finditer(html):
+        field_info = _HEADER_FIELDS.get(match.group(1).strip())
+        if not field_info or field_info[0] in fields:
+            continue
+        field, kind = field_info
+        tag, attrs, tagged_value, text_value = match.group(2, 3, 4, 5)
+        if kind == 'text':
+            if text_value is None:
+                continue
+            value = text_value.strip()
+            if field == '發行日期':
+                date_match = _DATE_VALUE_PATTERN.match(value)
+                value = date_match.group(0) if date_match else ''
+        else:
+            if tag != _HEADER_TAGS[kind]:
+                continue
+            value = tagged_value.strip()
+        href_match = _HREF_PATTERN.search(attrs) if attrs else None
+        fields[field] = (value, href_match.group(1) if href_match else '')
+    return fields
+
+
+# 類別、演員、网址、封面、標題等通用字段正则
+_GENRE_PATTERN = re.compile(r'<span class="genre"><label><input[^>]*><a[^>]*>([^<]+)</a></label></span>')
+# 匹配带有onmouseover属性的span标签中的链接文本
+_ACTOR_PATTERN = re.compile(r'<span[^>]*onmouseover[^>]*>\s*<a[^>]*>([^<]+)</a>\s*</span>')
+_URL_PATTERN = re.compile(r'<link rel="canonical" href="([^"]+)"')
+_COVER_PATTERN = re.compile(r'<a[^>]*class="bigImage"[^>]*><img[^>]*src="([^"]+)"')
+_TITLE_PATTERN = re.compile(r'<title>([^<]+)</title>')
+
+
+def parse_detail_page(html):
+    """parse_detail_page(html),只解析详情页本身的字段，不发起任何网络请求；没有識別碼时返回 None"""
 
-    soup = BeautifulSoup(html, "html.parser")
- 
     categories = {}
 
-    # 使用正则表达式解析識別碼 - 通用模式，不依赖语言
-    code_patterns = [
-        r'<span class="header">識別碼:</span>\s*<span[^>]*style="color:#CC0000;">([^<]+)</span>',
-        r'<span class="header">品番:</span>\s*<span[^>]*style="color:#CC0000;">([^<]+)</span>',
-        r'<span class="header">識別碼:</span>\s*<span[^>]*>([^<]+)</span>'
-    ]
-    code_name = ''
-    for pattern in code_patterns:
-        code_match = re.search(pattern, html)
-        if code_match:
-            code_name = code_match.group(1).strip()
-            break
-    
+    # 解析信息栏字段 - 支持中文/日文/英文页面
+    header_fields = _scan_header_fields(html)
+
+    code_name = header_fields.get('識別碼', ('', ''))[0]
     categories['識別碼'] = code_name
     if code_name == '':
-        return
+        return None
+
+    for field in ('發行日期', '長度', '導演'):
+        categories[field] = header_fields.get(field, ('', ''))[0]
 
-    # 使用正则表达式解析發行日期 - 支持多种语言
-    date_patterns = [
-        r'<span class="header">發行日期:</span>\s*([0-9-]+)',
-        r'<span class="header">発売日:</span>\s*([0-9-]+)',
-        r'<span class="header">Release Date:</span>\s*([0-9-]+)'
-    ]
-    date_issue = ''
-    for pattern in date_patterns:
-        date_match = re.search(pattern, html)
-        if date_match:
-            date_issue = date_match.group(1).strip()
-            break
-    categories['發行日期'] = date_issue
-
-    # 使用正则表达式解析長度 - 支持多种语言
-    duration_patterns = [
-        r'<span class="header">長度:</span>\s*([^<]+)',
-        r'<span class="header">収録時間:</span>\s*([^<]+)',
-        r'<span class="header">Runtime:</span>\s*([^<]+)'
-    ]
-    duration = ''
-    for pattern in duration_patterns:
-        duration_match = re.search(pattern, html)
-        if duration_match:
-            duration = duration_match.group(1).strip()
-            break
-    categories['長度'] = duration
-
-    # 使用正则表达式解析導演 - 支持多种语言
-    director_patterns = [
-        r'<span class="header">導演:</span>\s*<a[^>]*>([^<]+)</a>',
-        r'<span class="header">監督:</span>\s*<a[^>]*>([^<]+)</a>',
-        r'<span class="header">Director:</span>\s*<a[^>]*>([^<]+)</a>'
-    ]
-    director = ''
-    for pattern in director_patterns:
-        director_match = re.search(pattern, html)
-        if director_match:
-            director = director_match.group(1).strip()
-            break
-    categories['導演'] = director
-
-    # 使用正则表达式解析製作商 - 支持多种语言
-    manufacturer_patterns = [
-        r'<span class="header">製作商:</span>\s*<a[^>]*href="([^"]*)">([^<]+)</a>',
-        r'<span class="header">メーカー:</span>\s*<a[^>]*href="([^"]*)">([^<]+)</a>',
-        r'<span class="header">Studio:</span>\s*<a[^>]*href="([^"]*)">([^<]+)</a>'
-    ]
-    manufacturer = ''
-    is_uncensored = 0
-    for pattern in manufacturer_patterns:
-        manufacturer_match = re.search(pattern, html)
-        if manufacturer_match:
-            manufacturer_href = manufacturer_match.group(1)
-            manufacturer = manufacturer_match.group(2).strip()
-            is_uncensored = 1 if 'uncensored' in manufacturer_href else 0
-            break
+    # 製作商链接中带 uncensored 的为无码
+    manufacturer, manufacturer_href = header_fields.get('製作商', ('', ''))
     categories['製作商'] = manufacturer
-    categories['無碼'] = is_uncensored
-
-    # 使用正则表达式解析發行商 - 支持多种语言
-    publisher_patterns = [
-        r'<span class="header">發行商:</span>\s*<a[^>]*>([^<]+)</a>',
-        r'<span class="header">レーベル:</span>\s*<a[^>]*>([^<]+)</a>',
-        r'<span class="header">Label:</span>\s*<a[^>]*>([^<]+)</a>'
-    ]
-    publisher = ''
-    for pattern in publisher_patterns:
-        publisher_match = re.search(pattern, html)
-        if publisher_match:
-            publisher = publisher_match.group(1).strip()
-            break
-    categories['發行商'] = publisher
-
-    # 使用正则表达式解析系列 - 支持多种语言
-    series_patterns = [
-        r'<span class="header">系列:</span>\s*<a[^>]*>([^<]+)</a>',
-        r'<span class="header">シリーズ:</span>\s*<a[^>]*>([^<]+)</a>',
-        r'<span class="header">Series:</span>\s*<a[^>]*>([^<]+)</a>'
-    ]
-    series = ''
-    for pattern in series_patterns:
-        series_match = re.search(pattern, html)
-        if series_match:
-            series = series_match.group(1).strip()
-            break
-    categories['系列'] = series
-
-    # 使用正则表达式解析類別 - 通用模式
-    genre_pattern = r'<span class="genre"><label><input[^>]*><a[^>]*>([^<]+)</a></label></span>'
-    genre_matches = re.findall(genre_pattern, html)
-    genre_text = '\n'.join(genre.strip() for genre in genre_matches)
-    categories['類別'] = genre_text
-
-    # 使用正则表达式解析演員 - 通用模式
-    # 匹配带有onmouseover属性的span标签中的链接文本
-    actor_pattern = r'<span[^>]*onmouseover[^>]*>\s*<a[^>]*>([^<]+)</a>\s*</span>'
-    actor_matches = re.findall(actor_pattern, html)
-    actor_text = '\n'.join(actor.strip() for actor in actor_matches)
-    categories['演員'] = actor_text
-    
-    # 使用正则表达式解析网址 - 通用模式
-    url_pattern = r'<link rel="canonical" href="([^"]+)"'
-    url_match = re.search(url_pattern, html)
+    categories['無碼'] = 1 if 'uncensored' in manufacturer_href else 0
+
+    for field in ('發行商', '系列'):
+        categories[field] = header_fields.get(field, ('', ''))[0]
+
+    # 解析類別、演員 - 通用模式
+    categories['類別'] = [genre.strip() for genre in _GENRE_PATTERN.findall(html)]
+    categories['演員'] = [actor.strip() for actor in _ACTOR_PATTERN.findall(html)]
+
+    # 解析网址 - 通用模式
+    url_match = _URL_PATTERN.search(html)
     url = url_match.group(1) if url_match else ''
     categories['URL'] = url
 
-    # 将磁力链接加入字典
-    is_subtitle = False
-    try:
-        magnet_html = get_html(_get_cili_url(soup), Referer_url=url)
-        magnet = _parser_magnet(magnet_html)
-        categories['磁力链接'] = magnet
-        is_subtitle = magnet.find('字幕') != -1
-    except:
-        categories['磁力链接'] = ''
-
-    # 使用正则表达式解析封面链接 - 通用模式
-    cover_pattern = r'<a[^>]*class="bigImage"[^>]*><img[^>]*src="([^"]+)"'
-    cover_match = re.search(cover_pattern, html)
+    # 解析封面链接 - 通用模式
+    cover_match = _COVER_PATTERN.search(html)
     if cover_match:
         bigimage_url = cover_match.group(1)
         if bigimage_url.startswith('/'):
             parsed = urlparse(url)
             bigimage_url = parsed.scheme + '://' + parsed.netloc + bigimage_url
         categories['封面'] = bigimage_url
-        
-        # 下载封面图片
-        if bigimage_url and categories.get('識別碼'):
-            code_name = categories['識別碼']
-            save_dir = os.path.join(app.app.static_folder,'images', 'covers', code_name)
-            cover_filename = f"{code_name}_cover.jpg"
-            try:
-                download_image(bigimage_url, save_dir, cover_filename, code_name)
-            except:
-                pass
-    
-    # 使用正则表达式解析標題 - 通用模式
-    title_pattern = r'<title>([^<]+)</title>'
-    title_match = re.search(title_pattern, html)
+
+    # 解析標題 - 通用模式
+    title_match = _TITLE_PATTERN.search(html)
     if title_match:
-        title = title_match.group(1).strip().replace(" - JavBus", "")
-        categories['標題'] = title
-    is_single = len(actor_matches) == 1 
-    categories['is_single'] = is_single
-    categories['is_subtitle'] = is_subtitle 
+        categories['標題'] = title_match.group(1).strip().replace(" - JavBus", "")
+    categories['is_single'] = len(categories['演員']) == 1
+    return categories
+
+
+def parser_content(html, rate_limiter=None):
+    """parser_content(html),parser page's content of every url and return the dict of content
+
+    rate_limiter: 磁力链接 AJAX 请求与详情页共用的按域名限速器（HostRateLimiter），为空时不限速
+    """
+
+    categories = parse_detail_page(html)
+    if not categories:
+        return
+
+    # 将磁力链接加入字典
+    is_subtitle = False
+    try:
+        magnet_html = get_html(_get_cili_url(html), Referer_url=categories['URL'], rate_limiter=rate_limiter)
+        magnet = _parser_magnet(magnet_html)
+        categories['磁力链接'] = magnet
+        is_subtitle = any('字幕' in item['title'] for item in magnet)
+    except:
+        categories['磁力链接'] = []
+    categories['is_subtitle'] = is_subtitle
+
+    # 封面图片交给后台下载队列，解析不等待下载完成
+    bigimage_url = categories.get('封面')
+    if bigimage_url:
+        code_name = categories['識別碼']
+        save_dir = os.path.join(COVERS_DIR, code_name)
+        cover_filename = f"{code_name}_cover.jpg"
+        try:
+            image_download_queue.submit(bigimage_url, save_dir, cover_filename, code_name,
+                                        headers={**headers, 'Referer': categories['URL']})
+        except Exception as e:
+            app_logger.error(f"封面加入下载队列失败 {bigimage_url}: {e}")
     return categories
 
 
-def get_html(url, Referer_url=None, max_retries=5):
+def get_html(url, Referer_url=None, max_retries=5, rate_limiter=None):
     '''get_html(url),download and return html'''
     if Referer_url==None:
         Referer_url = url
 
+    # 每次调用单独构造请求头，解析线程并发调用时不互相覆盖 Referer
+    request_headers = dict(headers)
     if Referer_url:
-        headers['Referer'] = Referer_url
+        request_headers['Referer'] = Referer_url
 
     if max_retries<1:
         max_retries = 1
 
+    # 优先使用未过期的页面缓存，过期时带条件请求头重新验证
+    cached, validators = page_cache.lookup(url)
+    if cached is not None:
+        return cached
+
     for i in range(max_retries):
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            if rate_limiter:
+                rate_limiter.wait(url)
+            response = requests.get(url, headers={**request_headers, **validators}, timeout=10)
+            if response.status_code == 304:
+                cached = page_cache.revalidated(url)
+                if cached is not None:
+                    return cached
+                # 缓存内容已丢失：去掉条件请求头，立即重新完整请求
+                validators = {}
+                if rate_limiter:
+                    rate_limiter.wait(url)
+                response = requests.get(url, headers=request_headers, timeout=10)
             if response.status_code == 200:
                 break
             elif response.status_code == 404:
@@ -346,8 +329,9 @@ def get_html(url, Referer_url=None, max_retries=5):
             if i == (max_retries -1):
                raise     # other exceptions raised after max_retries attempts
 
-    html = response.content
-    soup = BeautifulSoup(html.decode('utf-8', errors='ignore'), 'html.parser')
-    html = soup.prettify()
+    # 直接返回解码后的文本，由调用方按需解析
+    html = response.content.decode('utf-8', errors='ignore')
+    if response.status_code == 200:
+        page_cache.put_response(url, response, html)
     return html
 
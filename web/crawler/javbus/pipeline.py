@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+#-*-coding:utf-8-*-
+"""
+JavBus 影片详情页流水线 - 抓取、解析、写库三个阶段并行
+
+抓取阶段：由 WebDriver 池中的若干浏览器并发访问详情页，
+所有请求先经过按域名的全局限速器，保证相邻两次请求的间隔不小于配置的礼貌延时；
+解析阶段：独立线程池执行 pageparser.parser_content，其中的磁力链接 AJAX 请求同样经过限速器；
+写库阶段：单个后台线程把解析结果交给批量写入器，失败的 URL 记入重试表。
+已提交但尚未进入写库阶段的影片数量有上限，超过时 submit 阻塞，列表页遍历随之放慢。
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import app_logger
+import pageparser
+from page_cache import page_cache
+
+# 添加父目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import db_manager
+from image_download_queue import image_download_queue
+
+
+class HostRateLimiter:
+    """按域名的全局限速器：同一域名相邻两次请求至少间隔 min_interval 秒"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        # 域名 -> 下一次允许请求的时间
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """预约该域名的下一个请求时间片，未到时间则休眠等待"""
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class DriverPool:
+    """WebDriver 池：按需创建浏览器，最多 size 个，每个浏览器同一时间只被一个线程使用"""
+
+    def __init__(self, factory, size=1, rate_limiter=None, initial=None):
+        self.factory = factory
+        self.size = max(1, size)
+        self.rate_limiter = rate_limiter
+        self._idle = queue.Queue()
+        self._created = []
+        self._lock = threading.Lock()
+        # 复用已有的控制器（不由本池关闭）
+        self._borrowed = initial
+        if initial is not None:
+            self._idle.put(initial)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            total = len(self._created) + (1 if self._borrowed is not None else 0)
+            if total < self.size:
+                controller = self.factory()
+                self._created.append(controller)
+                return controller
+        return self._idle.get()
+
+    @contextmanager
+    def driver(self):
+        """借出一个控制器，用完自动归还"""
+        controller = self._acquire()
+        try:
+            yield controller
+        finally:
+            self._idle.put(controller)
+
+    def get_page_content(self, url):
+        """经过限速后用池中的浏览器获取页面内容；缓存命中时不占用浏览器也不计入限速"""
+        cached = page_cache.get(url)
+        if cached:
+            return cached
+        with self.driver() as controller:
+            if self.rate_limiter:
+                self.rate_limiter.wait(url)
+            # 缓存已在借出浏览器前检查过，这里不再重复读取
+            return controller.get_page_content(url, use_cache=False)
+
+    def close(self):
+        """关闭本池创建的浏览器"""
+        with self._lock:
+            created, self._created = self._created, []
+        for controller in created:
+            controller.close_driver()
+
+
+class DetailPipeline:
+    """影片详情页流水线：submit 提交影片，close 等待全部完成并刷新写入"""
+
+    def __init__(self, driver_pool, parse_workers=2, writer=None, max_pending=20):
+        self.driver_pool = driver_pool
+        self.writer = writer or db_manager.jav_movie_bulk_writer()
+        self.fetch_executor = ThreadPoolExecutor(max_workers=driver_pool.size, thread_name_prefix='javbus-fetch')
+        self.parse_executor = ThreadPoolExecutor(max_workers=max(1, parse_workers), thread_name_prefix='javbus-parse')
+        # 线程池的任务队列没有上限，用信号量限制处于抓取/解析阶段的影片数量
+        self._pending = threading.BoundedSemaphore(max(1, max_pending))
+        self.persist_queue = queue.Queue(maxsize=max(1, max_pending))
+        self.persist_thread = threading.Thread(target=self._persist_loop, name='javbus-persist', daemon=True)
+        self.persist_thread.start()
+        # 已提交的影片编号（小写），避免同一次任务重复抓取
+        self.submitted_codes = set()
+        self.saved_count = 0
+        self.failed_count = 0
+
+    def is_submitted(self, code):
+        """判断影片是否已在本次流水线中提交"""
+        return bool(code) and code.lower() in self.submitted_codes
+
+    def submit(self, movie):
+        """提交一部影片（需包含 url 和 code），处理中的影片达到上限时阻塞等待"""
+        self.submitted_codes.add(movie['code'].lower())
+        self._pending.acquire()
+        try:
+            self.fetch_executor.submit(self._fetch, movie)
+        except Exception:
+            self._pending.release()
+            raise
+
+    def _fetch(self, movie):
+        """抓取阶段：获取详情页后交给解析线程池"""
+        try:
+            movie_html = self.driver_pool.get_page_content(movie['url'])
+        except Exception as e:
+            app_logger.error(f"✗ 获取影片页面时出错 {movie['url']}: {e}")
+            self._finish(movie, ('retry', movie, 'process_error', str(e)))
+            return
+        if not movie_html:
+            app_logger.error(f"✗ 无法获取影片页面: {movie['url']}")
+            self._finish(movie, ('retry', movie, 'fetch_error', '无法获取影片页面'))
+            return
+        self.parse_executor.submit(self._parse, movie, movie_html)
+
+    def _finish(self, movie, item):
+        """影片离开抓取/解析阶段：交给写库线程（队列满时阻塞）并释放一个处理名额"""
+        try:
+            self.persist_queue.put(item)
+        finally:
+            self._pending.release()
+
+    def _parse(self, movie, movie_html):
+        """解析阶段：解析影片详情后交给写库线程"""
+        try:
+            movie_detail = pageparser.parser_content(movie_html, rate_limiter=self.driver_pool.rate_limiter)
+        except Exception as e:
+            app_logger.error(f"✗ 处理影片时出错 {movie['url']}: {e}")
+            self._finish(movie, ('retry', movie, 'process_error', str(e)))
+            return
+        if movie_detail:
+            self._finish(movie, ('save', movie, movie_detail, None))
+        else:
+            app_logger.error(f"✗ 无法解析影片详情: {movie['url']}")
+            self._finish(movie, ('retry', movie, 'parse_error', '无法解析影片详情'))
+
+    def _persist_loop(self):
+        """写库阶段：批量写入器只在本线程中使用"""
+        while True:
+            item = self.persist_queue.get()
+            if item is None:
+                break
+            kind, movie, payload, error_message = item
+            try:
+                if kind == 'save':
+                    self.writer.add(payload)
+                    self.saved_count += 1
+                else:
+                    db_manager.add_retry_url(movie['url'], payload, error_message, movie['code'])
+                    self.failed_count += 1
+            except Exception as e:
+                app_logger.error(f"✗ 写入影片数据时出错 {movie['url']}: {e}")
+        self.writer.flush(final=True)
+
+    def close(self):
+        """等待抓取、解析、写库依次完成"""
+        self.fetch_executor.shutdown(wait=True)
+        self.parse_executor.shutdown(wait=True)
+        self.persist_queue.put(None)
+        self.persist_thread.join()
+        # 封面由守护线程下载，爬虫子进程结束时不会执行 atexit，在这里等待排队的封面下载完成
+        image_download_queue.finish()
+        app_logger.info(f"详情页流水线完成: 保存 {self.saved_count} 部，失败 {self.failed_count} 部")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -1,16 +1,23 @@
 import requests
 from bs4 import BeautifulSoup
 import json
+import os
+import sys
 import time
 from urllib.parse import urljoin, urlparse
 import re
 
+# 添加当前目录到路径以导入页面缓存模块，web 目录用于导入连接池模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from page_cache import page_cache
+from http_session import ProcessLocalSession
+
 class JavBusCrawler:
     def __init__(self, base_url="https://www.javbus.com"):
         self.base_url = base_url
-        self.session = requests.Session()
-        # 设置请求头，模拟浏览器访问
-        self.session.headers.update({
+        # 多线程 worker 中共用连接池，fork 后的子进程自动重建；设置请求头，模拟浏览器访问
+        self.session = ProcessLocalSession(headers={
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
@@ -19,6 +26,25 @@ class JavBusCrawler:
             'Upgrade-Insecure-Requests': '1'
         })
     
+    def fetch_page(self, url, timeout=30):
+        """
+        获取页面文本：优先使用未过期的页面缓存，缓存过期时带 ETag/Last-Modified 条件请求重新验证
+        """
+        cached, validators = page_cache.lookup(url)
+        if cached is not None:
+            return cached
+        response = self.session.get(url, timeout=timeout, headers=validators)
+        if response.status_code == 304:
+            html_content = page_cache.revalidated(url)
+            if html_content is not None:
+                return html_content
+            # 缓存内容丢失，重新完整请求
+            response = self.session.get(url, timeout=timeout)
+        response.raise_for_status()
+        response.encoding = 'utf-8'
+        page_cache.put_response(url, response, response.text)
+        return response.text
+    
     def parse_pagination(self, html_content):
         """
         解析分页信息，返回下一页链接
@@ -161,14 +187,12 @@ class JavBusCrawler:
                     print(f"正在爬取第 {page_count + 1} 页: {current_url} (尝试 {retry_count + 1}/{max_retries})")
                     
                     # 增加更长的超时时间和重试间隔
-                    response = self.session.get(current_url, timeout=30)
-                    response.raise_for_status()
-                    response.encoding = 'utf-8'
+                    html_content = self.fetch_page(current_url, timeout=30)
                     if title == '':
-                        title = response.text.split('<title>')[1].split('</title>')[0]
+                        title = html_content.split('<title>')[1].split('</title>')[0]
                     # 解析当前页面
-                    movie_items = self.parse_movie_items(response.text)
-                    pagination_info = self.parse_pagination(response.text)
+                    movie_items = self.parse_movie_items(html_content)
+                    pagination_info = self.parse_pagination(html_content)
                     
                     # 添加页面信息到每个电影项目
                     for movie in movie_items:
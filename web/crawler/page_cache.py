@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫页面缓存模块 - 按内容寻址的磁盘缓存，所有抓取入口共用
+
+目录结构：
+  objects/<sha256 前两位>/<sha256>.gz   页面内容（gzip 压缩，相同内容只存一份）
+  urls/<url 哈希前两位>/<url 哈希>.json 每个 URL 的索引：内容哈希、抓取时间、ETag、Last-Modified
+
+不同类型的 URL 使用不同 TTL（详情页内容基本不变，列表页很快过期）。
+普通 HTTP 抓取在缓存过期后带 If-None-Match / If-Modified-Since 重新验证，
+收到 304 时直接复用缓存内容；Selenium 抓取无法发条件请求，只按 TTL 判断。
+离线模式下忽略 TTL，便于解析器修改后用缓存重新处理而不访问网络。
+超过 TTL 的索引和不再被引用的内容由 prune 清理：爬取开始时按 PAGE_CACHE_PRUNE_INTERVAL 自动执行，
+也可以手动运行 python page_cache.py prune [--dry-run]。
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+# 添加 web 目录和项目根目录到路径
+WEB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(WEB_DIR)
+sys.path.append(os.path.dirname(WEB_DIR))
+import app_logger
+from config import config as app_config
+
+# URL 类型规则，按顺序匹配，都不匹配时为 other
+URL_CLASSES = (
+    ('magnet', re.compile(r'/ajax/uncledatoolsbyajax\.php')),
+    ('detail', re.compile(r'^https?://[^/]*javbus[^/]*/(?:(?:en|ja|ko)/)?\w+-[\w-]+/?$')),
+    ('detail', re.compile(r'mod=viewthread|/thread-\d+-')),
+    ('list', re.compile(r'^https?://[^/]*javbus[^/]*(?:/|$)')),
+    ('list', re.compile(r'mod=forumdisplay|/forum-\d+-')),
+)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class PageCache:
+    """按内容寻址的页面磁盘缓存"""
+
+    def __init__(self, root, ttls, enabled=True, offline=False, prune_interval=86400):
+        self.root = root
+        self.ttls = ttls
+        self.enabled = enabled
+        self.offline = offline
+        self.prune_interval = prune_interval
+
+    def classify(self, url):
+        """返回 URL 类型：detail / magnet / list / other"""
+        for url_class, pattern in URL_CLASSES:
+            if pattern.search(url):
+                return url_class
+        return 'other'
+
+    def _ttl(self, url_class):
+        return self.ttls.get(url_class, 0)
+
+    def _index_path(self, url):
+        digest = _sha256(url.encode('utf-8'))
+        return os.path.join(self.root, 'urls', digest[:2], f'{digest}.json')
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], f'{digest}.gz')
+
+    def _write_atomic(self, path, data):
+        """先写临时文件再改名，并发读取方不会看到写了一半的文件"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _read_entry(self, url):
+        try:
+            with open(self._index_path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_text(self, entry):
+        try:
+            with open(self._object_path(entry['sha256']), 'rb') as f:
+                return gzip.decompress(f.read()).decode('utf-8')
+        except (OSError, ValueError, KeyError) as e:
+            app_logger.warning(f"读取页面缓存失败 {entry.get('url')}: {e}")
+            return None
+
+    def lookup(self, url):
+        """查询缓存：返回 (未过期的页面内容或 None, 重新验证用的条件请求头)"""
+        if not self.enabled:
+            return None, {}
+        url_class = self.classify(url)
+        ttl = self._ttl(url_class)
+        if ttl <= 0 and not self.offline:
+            return None, {}
+        entry = self._read_entry(url)
+        if not entry:
+            return None, {}
+        if self.offline or time.time() - entry.get('fetched_at', 0) < ttl:
+            text = self._read_text(entry)
+            if text is not None:
+                return text, {}
+        validators = {}
+        if entry.get('etag'):
+            validators['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            validators['If-Modified-Since'] = entry['last_modified']
+        return None, validators
+
+    def get(self, url):
+        """返回未过期的缓存页面内容，没有时返回 None"""
+        return self.lookup(url)[0]
+
+    def put(self, url, text, etag=None, last_modified=None):
+        """写入页面内容（该类型 TTL 为 0 时不缓存）"""
+        if not self.enabled or not text or self._ttl(self.classify(url)) <= 0:
+            return
+        try:
+            data = text.encode('utf-8')
+            digest = _sha256(data)
+            object_path = self._object_path(digest)
+            if not os.path.exists(object_path):
+                self._write_atomic(object_path, gzip.compress(data, compresslevel=6))
+            entry = {
+                'url': url,
+                'url_class': self.classify(url),
+                'sha256': digest,
+                'fetched_at': time.time(),
+                'etag': etag,
+                'last_modified': last_modified,
+            }
+            self._write_atomic(self._index_path(url), json.dumps(entry).encode('utf-8'))
+        except OSError as e:
+            app_logger.warning(f"写入页面缓存失败 {url}: {e}")
+
+    def put_response(self, url, response, text):
+        """按 HTTP 响应写入缓存，同时记录 ETag / Last-Modified"""
+        self.put(url, text, etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'))
+
+    def revalidated(self, url):
+        """服务器返回 304：刷新抓取时间并返回缓存内容"""
+        entry = self._read_entry(url)
+        if not entry:
+            return None
+        text = self._read_text(entry)
+        if text is None:
+            return None
+        entry['fetched_at'] = time.time()
+        try:
+            self._write_atomic(self._index_path(url), json.dumps(entry).encode('utf-8'))
+        except OSError as e:
+            app_logger.warning(f"更新页面缓存失败 {url}: {e}")
+        return text
+
+    def prune(self, dry_run=False):
+        """删除超过所属类型 TTL 的 URL 索引以及不再被任何索引引用的内容，返回 (删除索引数, 删除内容数)"""
+        now = time.time()
+        referenced = set()
+        removed_entries = 0
+        for directory, _, files in os.walk(os.path.join(self.root, 'urls')):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                if filename.endswith('.tmp') and now - self._mtime(path) < 3600:
+                    # 可能是正在写入的临时文件
+                    continue
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        entry = json.load(f)
+                except (OSError, ValueError):
+                    entry = None
+                if entry and now - entry.get('fetched_at', 0) < self._ttl(entry.get('url_class', 'other')):
+                    referenced.add(entry.get('sha256'))
+                    continue
+                removed_entries += 1
+                if not dry_run:
+                    self._remove(path)
+
+        removed_objects = 0
+        for directory, _, files in os.walk(os.path.join(self.root, 'objects')):
+            for filename in files:
+                if filename.endswith('.gz') and filename[:-3] in referenced:
+                    continue
+                if filename.endswith('.tmp') and now - self._mtime(os.path.join(directory, filename)) < 3600:
+                    # 可能是正在写入的临时文件
+                    continue
+                removed_objects += 1
+                if not dry_run:
+                    self._remove(os.path.join(directory, filename))
+        return removed_entries, removed_objects
+
+    def prune_if_due(self):
+        """距上次清理超过 prune_interval 秒时执行 prune（离线模式下保留全部缓存）"""
+        if not self.enabled or self.offline or self.prune_interval <= 0:
+            return
+        marker_path = os.path.join(self.root, 'last_prune')
+        if time.time() - self._mtime(marker_path) < self.prune_interval:
+            return
+        try:
+            removed_entries, removed_objects = self.prune()
+            self._write_atomic(marker_path, str(time.time()).encode('utf-8'))
+            app_logger.info(f"页面缓存清理完成: 删除 {removed_entries} 条索引，{removed_objects} 个内容文件")
+        except OSError as e:
+            app_logger.warning(f"清理页面缓存失败: {e}")
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+page_cache_config = app_config.get_page_cache_config()
+_page_cache_root = page_cache_config['root']
+if not os.path.isabs(_page_cache_root):
+    # 相对路径以项目根目录为基准，不受启动目录影响
+    _page_cache_root = os.path.join(os.path.dirname(WEB_DIR), _page_cache_root)
+page_cache = PageCache(
+    _page_cache_root,
+    page_cache_config['ttls'],
+    enabled=page_cache_config['enabled'],
+    offline=page_cache_config['offline'],
+    prune_interval=page_cache_config['prune_interval'],
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="爬虫页面缓存维护")
+    parser.add_argument("command", choices=['prune'], help="prune: 删除过期索引和不再引用的内容")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不删除")
+    args = parser.parse_args()
+
+    removed_entries, removed_objects = page_cache.prune(dry_run=args.dry_run)
+    action = "可删除" if args.dry_run else "已删除"
+    print(f"✅ {page_cache.root}: {action} {removed_entries} 条索引，{removed_objects} 个内容文件")
+
+
+if __name__ == "__main__":
+    main()
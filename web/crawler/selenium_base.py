@@ -12,6 +12,7 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, WebDriverException
 from pymongo import MongoClient
+from page_cache import page_cache
 
 class BaseSeleniumController:
     """基础 Selenium 控制器类"""
@@ -85,7 +86,10 @@ class BaseSeleniumController:
             raise
     
     def get_page_content(self, url, max_retries=None):
-        """获取页面内容"""
+        """获取页面内容（优先读取未过期的页面缓存）"""
+        cached = page_cache.get(url)
+        if cached:
+            return cached
         if max_retries is None:
             max_retries = self.max_retries
             
@@ -105,6 +109,7 @@ class BaseSeleniumController:
                 
                 if html_content and len(html_content) > 100:
                     logging.info(f"成功获取页面内容，长度: {len(html_content)}")
+                    page_cache.put(url, html_content)
                     return html_content
                 else:
                     logging.warning(f"页面内容过短或为空: {len(html_content) if html_content else 0}")
@@ -26,6 +26,7 @@ import app_logger
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 from selenium_base import BaseSeleniumController
+from page_cache import page_cache
 
 class ForumSeleniumCrawler(BaseSeleniumController):
     """专门用于论坛爬虫的 Selenium 控制器"""
@@ -48,7 +49,10 @@ class ForumSeleniumCrawler(BaseSeleniumController):
 
  
     def get_page_content(self, url, max_retries=3):
-        """使用Selenium获取页面内容，支持重试机制"""
+        """使用Selenium获取页面内容，支持重试机制（优先读取未过期的页面缓存）"""
+        cached = page_cache.get(url)
+        if cached:
+            return cached
         if not self.driver:
             app_logger.error("WebDriver未初始化")
             return None
@@ -89,6 +93,9 @@ class ForumSeleniumCrawler(BaseSeleniumController):
                     page_source = self.driver.page_source 
                     app_logger.info("已获取年龄确认后的新页面数据")
                 
+                # 验证页面不写入缓存
+                if '验证您是否是真人' not in page_source and 'security check' not in page_source.lower():
+                    page_cache.put(url, page_source)
                 return page_source
                 
             except TimeoutException:
@@ -143,18 +150,21 @@ class ForumSeleniumCrawler(BaseSeleniumController):
             app_logger.debug(f"模拟人类行为失败: {e}")
         return False
     
+    def parse_thread_links(self, html_content):
+        """从列表页HTML中解析详情页相对链接，返回 [(link, tid)]，不查询数据库"""
+        # 使用正则表达式匹配 em 分类标签后的标题链接
+        pattern1 = r'<em>\[.*?\]</em>\s*<a href="(forum\.php\?mod=viewthread&amp;tid=(\d+)[^"]*)"[^>]*class="s xst"[^>]*>'
+        matches = re.findall(pattern1, html_content)
+        return [(link.replace('&amp;', '&'), tid) for link, tid in matches]
+
     def extract_thread_links_from_html(self, html_content):
 
         """从HTML内容中提取详情页链接"""
         thread_links = []
-        # 使用正则表达式匹配 thread-数字-1-1.html 格式的链接
-        pattern1 = r'<em>\[.*?\]</em>\s*<a href="(forum\.php\?mod=viewthread&amp;tid=(\d+)[^"]*)"[^>]*class="s xst"[^>]*>'
-        matches = re.findall(pattern1, html_content)
-        print(f"最精确匹配（em后的标题链接）: 找到 {len(matches)} 个链接")
         processed_links = []
-        for match in matches:
-            link = match[0].replace('&amp;', '&')
-            tid = self.extract_tid_id(link)
+        links = self.parse_thread_links(html_content)
+        print(f"最精确匹配（em后的标题链接）: 找到 {len(links)} 个链接")
+        for link, tid in links:
             if db_manager.is_sehuatang_detail_craled(tid):
                app_logger.info(f"跳过已存在的记录: tid={tid}")
                continue  # 跳过已存在的记录 
@@ -288,6 +298,7 @@ class ForumSeleniumCrawler(BaseSeleniumController):
     def update_sehuatang(self, pageNumbers=50):
         headless = True
         crawler = ForumSeleniumCrawler(delay=3, headless=headless)  # 设置3秒延时
+        page_cache.prune_if_due()
         
         try: 
             for pageNumber in range(0, pageNumbers + 1):
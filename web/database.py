@@ -4,19 +4,292 @@
 数据库模块 - MongoDB连接和操作
 """
 
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, UpdateMany
+from pymongo.errors import BulkWriteError
 from datetime import datetime, timedelta
 from bson import ObjectId
 import sys
 import os
 import atexit
 import ast
+import base64
+import json
+import sqlite3
+import time
 import app_logger
+from movie_code import normalize_movie_code, extract_movie_code
+from library_index import library_index
+from ttl_cache import TTLCache
+from text_search import build_search_text, build_text_query
 
 # 添加父目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import config as app_config
 
+# 影片列表允许的排序字段
+MOVIE_SORT_FIELDS = ('release_date', 'title', 'code')
+# 超过该页码后列表页改用游标(keyset)翻页，避免深分页的 skip 扫描
+KEYSET_PAGE_THRESHOLD = 5
+
+
+def _unique_string_index(field):
+    """唯一索引选项：只约束非空字符串，缺失或空值的历史数据不参与唯一性检查"""
+    return {'unique': True, 'partialFilterExpression': {field: {'$gt': ''}}}
+
+
+# 索引注册表：集合名 -> [(索引键, 索引选项)]，启动时由 ensure_indexes 幂等创建
+INDEX_REGISTRY = {
+    'thread_details': [
+        ([('tid', 1)], {}),
+        # 标准化电影编号，供 find_magnet_link 精确查询
+        ([('movie_code_norm', 1)], {}),
+        # 增量对账时按抓取时间筛选
+        ([('crawl_time', 1)], {}),
+    ],
+    'add_movie': [
+        ([('type', 1), ('series_name', 1)], {}),
+    ],
+    'found_movies': [
+        ([('series_name', 1), ('found_at', -1)], {}),
+        ([('movie_code', 1)], {}),
+    ],
+    'retry_urls': [
+        ([('url', 1)], _unique_string_index('url')),
+    ],
+    'processed_actresses': [
+        ([('actress_code', 1)], {}),
+    ],
+    'javbus_data': [
+        ([('code', 1)], {}),
+        # 列表页 keyset 翻页使用的 (排序字段, _id) 复合索引
+        ([('release_date', -1), ('_id', -1)], {}),
+        ([('series', 1), ('release_date', -1), ('_id', -1)], {}),
+        ([('studio', 1), ('release_date', -1), ('_id', -1)], {}),
+        # 演员/类别为数组字段，多键索引支持等值筛选并按发布日期排序
+        ([('actresses', 1), ('release_date', -1), ('_id', -1)], {}),
+        ([('genres', 1), ('release_date', -1), ('_id', -1)], {}),
+        # 关键字搜索使用的全文索引（search_text 已预先分词，不做语言词干处理）
+        ([('search_text', 'text')], {'default_language': 'none'}),
+        # 小写 URL/编号唯一索引，存在性检查只需一次索引查询
+        ([('url_norm', 1)], _unique_string_index('url_norm')),
+        ([('code_norm', 1)], _unique_string_index('code_norm')),
+        # 与色花堂记录相同规则的标准化编号，用于磁力对账
+        ([('movie_code_norm', 1)], {}),
+    ],
+    'actresses_data': [
+        ([('code', 1)], {}),
+        ([('name', 1)], {}),
+        ([('cup_size', 1)], {}),
+    ],
+    'users': [
+        ([('username', 1)], {}),
+    ],
+    'sessions': [
+        ([('session_id', 1)], {}),
+        ([('expires_at', 1)], {}),
+    ],
+    'genres_data': [
+        ([('code', 1)], {}),
+        ([('name', 1)], {}),
+    ],
+    'actress_favorites': [
+        ([('user_id', 1), ('actress_code', 1)], {}),
+        ([('actress_code', 1)], {}),
+    ],
+    'series_favorites': [
+        ([('user_id', 1), ('series_name', 1)], {}),
+        ([('user_id', 1), ('created_at', -1), ('_id', -1)], {}),
+    ],
+    'studio_favorites': [
+        ([('user_id', 1), ('studio_name', 1)], {}),
+        ([('user_id', 1), ('created_at', -1), ('_id', -1)], {}),
+    ],
+    'crawler_config': [
+        ([('crawler_type', 1)], {}),
+    ],
+    'yun115_files': [
+        ([('movie_code', 1), ('file_id', 1)], {}),
+    ],
+    'yun115_download_tasks': [
+        ([('task_hash', 1)], {}),
+        ([('created_at', -1)], {}),
+        ([('movie_code', 1), ('created_at', -1)], {}),
+    ],
+    'failed_images': [
+        ([('image_url', 1)], {}),
+        ([('created_at', 1)], {}),
+    ],
+    'audio_tasks': [
+        ([('created_at', -1)], {}),
+    ],
+    'subtitles': [
+        ([('task_id', 1)], {}),
+    ],
+}
+
+
+# 启动时自动执行的一次性数据迁移：名称（与 db_migrate.py 子命令一致）-> DatabaseManager 方法名，按顺序执行。
+# 迁移方法成功时返回更新数量、失败时返回 None；成功后记录到 sync_state，之后启动不再执行
+SCHEMA_MIGRATIONS = {
+    # 旧数据中演员/类别/磁力链接仍是换行字符串的影片转换为数组，否则按数组等值匹配的查询会漏掉这些影片
+    'movie-arrays': 'migrate_movie_arrays',
+    # 补齐 url_norm/code_norm：存在性检查和 upsert 只按这两个字段匹配，缺失时会重复抓取、插入重复文档，
+    # 唯一索引也无法建立（迁移在 ensure_indexes 之前执行）
+    'jav-norm-fields': 'backfill_jav_norm_fields',
+    # 关键字搜索只查 search_text 全文索引，缺少该字段的历史影片搜不到
+    'search-text': 'backfill_search_text',
+}
+
+
+def index_name(keys):
+    """按 MongoDB 默认规则生成索引名，如 [('code', 1)] -> code_1"""
+    return '_'.join(f'{field}_{direction}' for field, direction in keys)
+
+
+def encode_page_cursor(sort_field, movie, direction):
+    """把排序字段值和 _id 编码为不透明的翻页游标"""
+    payload = {
+        'f': sort_field,
+        'v': movie.get(sort_field),
+        'id': str(movie['_id']),
+        'd': direction
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, ensure_ascii=False).encode('utf-8')).decode('ascii')
+
+
+def decode_page_cursor(cursor):
+    """解析翻页游标，返回 (排序字段, 排序值, _id, 方向)，无效时返回 None"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return payload['f'], payload['v'], ObjectId(payload['id']), payload['d']
+    except Exception:
+        return None
+
+
+def to_string_list(value):
+    """演员/类别字段转换为字符串数组，兼容旧数据的换行分隔字符串"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split('\n')
+    return [item.strip() for item in value if item and item.strip()]
+
+
+def to_magnet_list(value):
+    """磁力链接字段转换为子文档数组，兼容旧数据中每行一个字典 repr 的字符串"""
+    if not value:
+        return []
+    if not isinstance(value, str):
+        return [dict(item) for item in value if item]
+    
+    magnets = []
+    for line in value.strip().split('\n'):
+        line = line.strip()
+        if line:
+            try:
+                # 使用 ast.literal_eval 安全解析
+                magnets.append(ast.literal_eval(line))
+            except (ValueError, SyntaxError) as e:
+                app_logger.info(f"解析行失败: {line}, 错误: {e}")
+    return magnets
+
+
+def jav_upsert_filter(document):
+    """影片 upsert 条件：有编号时按 code_norm 匹配，避免同一编号换了 URL 时违反 code_norm 唯一索引"""
+    if document['code_norm']:
+        return {'code_norm': document['code_norm']}
+    return {'url_norm': document['url_norm']}
+
+
+def jellyfin_movie_code(movie_name):
+    """从 Jellyfin 影片名称中截取第二个"-"前面的字符串作为电影编码
+    
+    例如："BF-519-完全主観 ボクのお义姉さんは波多野结衣" -> "BF-519"，无法截取时返回 None
+    """
+    parts = (movie_name or '').split('-')
+    if len(parts) >= 2:
+        return parts[0] + '-' + parts[1]
+    return None
+
+
+class JavMovieBulkWriter:
+    """JavBus 影片批量写入器：缓存待写入的影片，按数量或时间间隔合并为一次 bulk_write"""
+    
+    def __init__(self, manager, batch_size=50, flush_interval=30):
+        self.manager = manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.documents = []
+        # 已缓存但尚未写入的 code_norm，避免同一批次内重复抓取
+        self.pending_codes = set()
+        self.last_flush_time = time.time()
+    
+    def add(self, dict_jav):
+        """加入一部影片，达到批量大小或超过刷新间隔时自动写入"""
+        document = self.manager.build_jav_document(dict_jav)
+        self.documents.append(document)
+        self.pending_codes.add(document['code_norm'])
+        if len(self.documents) >= self.batch_size or time.time() - self.last_flush_time >= self.flush_interval:
+            self.flush()
+    
+    def is_pending(self, code):
+        """判断影片是否已在待写入缓存中"""
+        return (code or '').lower() in self.pending_codes
+    
+    def flush(self, final=False):
+        """把缓存的影片批量写入 MongoDB，返回写入(插入+更新)数量
+        
+        批量写入失败的影片逐条重写，仍然失败的留在缓存中等下次 flush；
+        final=True（爬取结束）时不再保留，记录到重试表以便下次重新抓取。
+        """
+        self.last_flush_time = time.time()
+        if not self.documents:
+            return 0
+        documents, self.documents = self.documents, []
+        operations = [
+            UpdateOne(jav_upsert_filter(document), {'$set': document}, upsert=True)
+            for document in documents
+        ]
+        failed = []
+        try:
+            result = self.manager.javbus_data_collection.bulk_write(operations, ordered=False)
+            written = result.upserted_count + result.modified_count
+        except BulkWriteError as e:
+            details = e.details
+            written = details.get('nUpserted', 0) + details.get('nModified', 0)
+            # ordered=False 时其余操作已执行，只需重写 writeErrors 中列出的影片
+            failed = [documents[error['index']] for error in details.get('writeErrors', [])]
+            app_logger.error(f"批量写入影片部分失败: {len(failed)} 条错误，改为逐条写入")
+        except Exception as e:
+            written = 0
+            failed = documents
+            app_logger.error(f"批量写入影片失败: {e}，改为逐条写入")
+        
+        retained = [document for document in failed if not self.manager.upsert_jav_document(document)]
+        written += len(failed) - len(retained)
+        if retained:
+            if final:
+                for document in retained:
+                    self.manager.add_retry_url(document['url'], 'persist_error', '影片写入 MongoDB 失败', document['code'])
+                app_logger.error(f"{len(retained)} 部影片写入失败，已记录到重试表")
+            else:
+                self.documents = retained + self.documents
+                app_logger.error(f"{len(retained)} 部影片写入失败，保留到下次批量写入")
+        self.pending_codes = {document['code_norm'] for document in self.documents}
+        
+        if written:
+            # 影片数据变化后列表总数缓存失效
+            self.manager.movie_count_cache.clear()
+        app_logger.info(f"批量写入影片 {len(documents)} 部，新增/更新 {written} 部")
+        return written
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush(final=True)
+
+
 class DatabaseManager:
     def __init__(self):
         self.mongo_client = None
@@ -45,59 +318,32 @@ class DatabaseManager:
         self.yun115_files_collection = None
         # 115云下载任务集合
         self.yun115_download_tasks_collection = None
+        # 同步任务状态集合（高水位标记、进度）
+        self.sync_state_collection = None
+        # 创建失败的索引：'集合.索引名' -> 错误信息
+        self.index_failures = {}
+        # 影片列表总数缓存，key 为标准化后的查询条件
+        listing_config = app_config.get_listing_config()
+        self.count_mode = listing_config['count_mode']
+        self.count_cap = listing_config['count_cap']
+        self.movie_count_cache = TTLCache(listing_config['count_cache_ttl'])
+        # 已验证会话缓存，以及 last_accessed 写入节流（记录最近一次写入的会话）
+        session_config = app_config.get_session_config()
+        self.session_cache = TTLCache(session_config['cache_ttl'], maxsize=4096)
+        self.session_touch_cache = TTLCache(session_config['touch_interval'], maxsize=4096)
         
     def init_mongodb(self):
         """初始化MongoDB连接"""
         try:
-            mongo_config = app_config.get_mongo_config()
-            self.mongo_client = MongoClient(mongo_config['uri'], serverSelectionTimeoutMS=5000)
+            self._connect()
             # 测试连接
             self.mongo_client.admin.command('ping')
-            # 连接到sehuatang_backup数据库
-            self.mongo_db = self.mongo_client['sehuatang_crawler']
-            self.mongo_collection = self.mongo_db['thread_details']
-            self.add_movie_collection = self.mongo_db['add_movie']
-            self.found_movies_collection = self.mongo_db['found_movies']
-            self.retry_collection = self.mongo_db['retry_urls']
-            self.processed_actresses_collection = self.mongo_db['processed_actresses']
             
-            # JavBus 爬虫相关集合
-            self.javbus_data_collection = self.mongo_db['javbus_data']
-            self.actresses_data_collection = self.mongo_db['actresses_data']
+            # 执行尚未完成的数据迁移（已完成的只查一次 sync_state 中的记录，不扫描集合）
+            self.run_schema_migrations()
             
-            # 用户认证相关集合
-            self.users_collection = self.mongo_db['users']
-            self.sessions_collection = self.mongo_db['sessions']
-            
-            # 类别数据集合
-            self.genres_collection = self.mongo_db['genres_data']
-            
-            # 演员收藏集合
-            self.actress_favorites_collection = self.mongo_db['actress_favorites']
-            
-            # 系列收藏集合
-            self.series_favorites_collection = self.mongo_db['series_favorites']
-            
-            # 厂商收藏集合
-            self.studio_favorites_collection = self.mongo_db['studio_favorites']
-            
-            # 爬虫配置集合
-            self.crawler_config_collection = self.mongo_db['crawler_config']
-            
-            # 115文件信息集合
-            self.yun115_files_collection = self.mongo_db['yun115_files']
-            
-            # 115云下载任务集合
-            self.yun115_download_tasks_collection = self.mongo_db['yun115_download_tasks']
-            
-            # 失败图片集合
-            self.failed_images_collection = self.mongo_db['failed_images']
-            
-            # 音频处理任务集合
-            self.audio_tasks_collection = self.mongo_db['audio_tasks']
-            
-            # 字幕文件集合
-            self.subtitles_collection = self.mongo_db['subtitles']
+            # 按索引注册表创建索引（已存在的索引不会重复创建）
+            self.ensure_indexes()
             
             # 创建默认管理员用户（如果不存在）
             self._create_default_admin()
@@ -108,6 +354,70 @@ class DatabaseManager:
             app_logger.error(f"MongoDB连接失败: {e}")
             return False
 
+    def _connect(self):
+        """创建 MongoClient 并绑定各集合。MongoClient 自带线程安全的连接池，同一进程内的线程共用"""
+        mongo_config = app_config.get_mongo_config()
+        self.mongo_client = MongoClient(mongo_config['uri'], serverSelectionTimeoutMS=5000,
+                                        maxPoolSize=mongo_config['max_pool_size'])
+        # 连接到sehuatang_backup数据库
+        self.mongo_db = self.mongo_client['sehuatang_crawler']
+        self.mongo_collection = self.mongo_db['thread_details']
+        self.add_movie_collection = self.mongo_db['add_movie']
+        self.found_movies_collection = self.mongo_db['found_movies']
+        self.retry_collection = self.mongo_db['retry_urls']
+        self.processed_actresses_collection = self.mongo_db['processed_actresses']
+        
+        # JavBus 爬虫相关集合
+        self.javbus_data_collection = self.mongo_db['javbus_data']
+        self.actresses_data_collection = self.mongo_db['actresses_data']
+        
+        # 用户认证相关集合
+        self.users_collection = self.mongo_db['users']
+        self.sessions_collection = self.mongo_db['sessions']
+        
+        # 类别数据集合
+        self.genres_collection = self.mongo_db['genres_data']
+        
+        # 演员收藏集合
+        self.actress_favorites_collection = self.mongo_db['actress_favorites']
+        
+        # 系列收藏集合
+        self.series_favorites_collection = self.mongo_db['series_favorites']
+        
+        # 厂商收藏集合
+        self.studio_favorites_collection = self.mongo_db['studio_favorites']
+        
+        # 爬虫配置集合
+        self.crawler_config_collection = self.mongo_db['crawler_config']
+        
+        # 115文件信息集合
+        self.yun115_files_collection = self.mongo_db['yun115_files']
+        
+        # 115云下载任务集合
+        self.yun115_download_tasks_collection = self.mongo_db['yun115_download_tasks']
+        
+        # 失败图片集合
+        self.failed_images_collection = self.mongo_db['failed_images']
+        
+        # 音频处理任务集合
+        self.audio_tasks_collection = self.mongo_db['audio_tasks']
+        
+        # 字幕文件集合
+        self.subtitles_collection = self.mongo_db['subtitles']
+        
+        # 同步任务状态集合
+        self.sync_state_collection = self.mongo_db['sync_state']
+
+    def reconnect_after_fork(self):
+        """fork 出的子进程（gunicorn worker、爬虫子进程）不沿用父进程的 MongoClient，重新创建连接池"""
+        if self.mongo_client is None:
+            return
+        try:
+            # 不关闭父进程的客户端：关闭会结束父进程仍在使用的会话
+            self._connect()
+        except Exception as e:
+            app_logger.error(f"子进程重建MongoDB连接失败: {e}")
+
     def get_subscriptions(self):
         """获取所有订阅"""
         if self.add_movie_collection is None:
@@ -180,17 +490,21 @@ class DatabaseManager:
         }).sort('found_at', -1))
     
     def find_magnet_link(self, movie_code):
-        """查找磁力链接"""
+        """查找磁力链接（按标准化电影编号走索引精确查询）"""
         if self.mongo_collection is None:
             return None
+        
+        movie_code_norm = normalize_movie_code(movie_code)
+        if not movie_code_norm:
+            return None
             
-        magnet_doc = self.mongo_collection.find_one({
-            '$or': [
-                {'title': {'$regex': movie_code, '$options': 'i'}},
-                {'movie_code': movie_code}
-            ],
-            'magnet_link': {'$exists': True, '$ne': ''}
-        })
+        magnet_doc = self.mongo_collection.find_one(
+            {
+                'movie_code_norm': movie_code_norm,
+                'magnet_link': {'$exists': True, '$ne': ''}
+            },
+            {'magnet_link': 1}
+        )
         
         return magnet_doc.get('magnet_link') if magnet_doc else None
     
@@ -218,34 +532,94 @@ class DatabaseManager:
     
     # ==================== JavBus 爬虫相关方法 ====================
     
+    def ensure_indexes(self, collection_names=None):
+        """按 INDEX_REGISTRY 幂等创建索引，单个索引失败（如历史数据重复）只记录错误不中断启动"""
+        created = []
+        for collection_name, specs in INDEX_REGISTRY.items():
+            if collection_names and collection_name not in collection_names:
+                continue
+            collection = self.mongo_db[collection_name]
+            for keys, options in specs:
+                name = f"{collection_name}.{index_name(keys)}"
+                try:
+                    created.append(collection.create_index(keys, **options))
+                    self.index_failures.pop(name, None)
+                except Exception as e:
+                    # 保留失败原因，index-report 中列出，避免唯一索引缺失只留下一行日志
+                    self.index_failures[name] = str(e)
+                    hint = "，请先清理重复数据后运行 python db_migrate.py index-report 确认" if options.get('unique') else ""
+                    app_logger.error(f"❌ 创建索引 {name} 失败: {e}{hint}")
+        return created
+    
+    def get_index_report(self):
+        """对比索引注册表和实际索引，列出缺失、未注册以及启动以来未被使用的索引"""
+        report = {}
+        try:
+            for collection_name in sorted(set(self.mongo_db.list_collection_names()) | set(INDEX_REGISTRY)):
+                collection = self.mongo_db[collection_name]
+                expected = {index_name(keys) for keys, _ in INDEX_REGISTRY.get(collection_name, [])}
+                existing = set(collection.index_information()) - {'_id_'}
+                usage = {
+                    stat['name']: stat['accesses']['ops']
+                    for stat in collection.aggregate([{'$indexStats': {}}])
+                }
+                report[collection_name] = {
+                    'missing': sorted(expected - existing),
+                    'unregistered': sorted(existing - expected),
+                    'unused': sorted(name for name in existing if usage.get(name, 0) == 0),
+                    'failed': {
+                        name.split('.', 1)[1]: error for name, error in self.index_failures.items()
+                        if name.split('.', 1)[0] == collection_name
+                    }
+                }
+            return report
+        except Exception as e:
+            app_logger.error(f"生成索引报告失败: {e}")
+            return report
+    
+    def build_jav_document(self, dict_jav):
+        """把爬虫解析结果转换为 javbus_data 文档"""
+        document = {
+            'url': dict_jav.get('URL', ''),
+            'code': dict_jav.get('識別碼', ''),
+            'title': dict_jav.get('標題', ''),
+            'cover': dict_jav.get('封面', ''), 
+            'release_date': dict_jav.get('發行日期', ''),
+            'duration': dict_jav.get('長度', ''),
+            'director': dict_jav.get('導演', ''),
+            'studio': dict_jav.get('製作商', ''),
+            'publisher': dict_jav.get('發行商', ''),
+            'series': dict_jav.get('系列', ''),
+            'actresses': to_string_list(dict_jav.get('演員')),
+            'genres': to_string_list(dict_jav.get('類別')),
+            'magnet_links': to_magnet_list(dict_jav.get('磁力链接')),
+            'uncensored': dict_jav.get('無碼', 0),
+            'is_single': dict_jav.get('is_single', False),
+            'is_subtitle': dict_jav.get('is_subtitle', False),
+        }
+        # 小写的 URL/编号，用于唯一索引和存在性检查
+        document['url_norm'] = document['url'].lower()
+        document['code_norm'] = document['code'].lower()
+        document['movie_code_norm'] = normalize_movie_code(document['code'])
+        document['search_text'] = build_search_text(document)
+        return document
+    
+    def jav_movie_bulk_writer(self, batch_size=50, flush_interval=30):
+        """创建 JavBus 影片批量写入器"""
+        return JavMovieBulkWriter(self, batch_size, flush_interval)
+    
     def write_jav_movie(self, dict_jav):
         """写入JAV电影数据到 MongoDB"""
+        if self.javbus_data_collection is None:
+            app_logger.info("Error writing data to MongoDB: MongoDB未初始化")
+            return False
+        return self.upsert_jav_document(self.build_jav_document(dict_jav))
+    
+    def upsert_jav_document(self, document):
+        """按编号（无编号时按 URL）upsert 一部影片文档，成功返回 True"""
         try:
-            if self.javbus_data_collection is None:
-                raise Exception('MongoDB未初始化')
-            # 准备文档数据
-            document = {
-                'url': dict_jav.get('URL', ''),
-                'code': dict_jav.get('識別碼', ''),
-                'title': dict_jav.get('標題', ''),
-                'cover': dict_jav.get('封面', ''), 
-                'release_date': dict_jav.get('發行日期', ''),
-                'duration': dict_jav.get('長度', ''),
-                'director': dict_jav.get('導演', ''),
-                'studio': dict_jav.get('製作商', ''),
-                'publisher': dict_jav.get('發行商', ''),
-                'series': dict_jav.get('系列', ''),
-                'actresses': dict_jav.get('演員', ''),
-                'genres': dict_jav.get('類別', ''),
-                'magnet_links': dict_jav.get('磁力链接', ''),
-                'uncensored': dict_jav.get('無碼', 0),
-                'is_single': dict_jav.get('is_single', False),
-                'is_subtitle': dict_jav.get('is_subtitle', False),
-            }
-            
-            # 使用 upsert 操作，如果 URL 已存在则更新，否则插入
             result = self.javbus_data_collection.update_one(
-                {'url': document['url']},
+                jav_upsert_filter(document),
                 {'$set': document},
                 upsert=True
             )
@@ -254,6 +628,9 @@ class DatabaseManager:
                 app_logger.info(f"Inserted new document with URL: {document['url']}")
             elif result.modified_count > 0:
                 app_logger.info(f"Updated existing document with URL: {document['url']}")
+            if result.upserted_id or result.modified_count > 0:
+                # 影片数据变化后列表总数缓存失效
+                self.movie_count_cache.clear()
                 
             return True
             
@@ -269,8 +646,8 @@ class DatabaseManager:
             
             # 更新磁力链接
             result = self.javbus_data_collection.update_one(
-                {'url': {'$regex': f'^{url}$', '$options': 'i'}},  # 不区分大小写匹配
-                {'$set': {'magnet_links': dict_jav.get('磁力链接', '')}}
+                {'url_norm': url.lower()},  # 不区分大小写匹配
+                {'$set': {'magnet_links': to_magnet_list(dict_jav.get('磁力链接'))}}
             )
             
             if result.modified_count > 0:
@@ -292,7 +669,7 @@ class DatabaseManager:
             
             # 不区分大小写查询
             result = self.javbus_data_collection.find_one(
-                {'url': {'$regex': f'^{url}$', '$options': 'i'}},
+                {'url_norm': url.lower()},
                 {'_id': 1}  # 只返回 _id 字段以提高性能
             )
             
@@ -310,35 +687,15 @@ class DatabaseManager:
             
             # 不区分大小写查询
             result = self.javbus_data_collection.find_one(
-                {'code': {'$regex': f'^{code}$', '$options': 'i'}}
-            ) 
+                {'code_norm': code.lower()},
+                {'_id': 1}
+            )
             return result is not None
                 
         except Exception as e:
             app_logger.info(f"Error checking movie crawled status: {e}")
             return False
     
-    def read_magnets_from_table(self, url):
-        """从数据库中读取指定 URL 的磁力链接"""
-        try:
-            if self.javbus_data_collection is None:
-                return None
-            
-            # 不区分大小写查询
-            result = self.javbus_data_collection.find_one(
-                {'URL': {'$regex': f'^{url}$', '$options': 'i'}},
-                {'磁力链接': 1, '_id': 0}  # 只返回磁力链接字段
-            )
-            
-            if result and result.get('磁力链接'):
-                return [(result['磁力链接'],)]  # 返回与原 SQLite 版本兼容的格式
-            else:
-                return None
-                
-        except Exception as e:
-            app_logger.info(f"Error reading magnets from MongoDB: {e}")
-            return None
-    
     def write_actress_data(self, actress_info, local_image_path=None):
         """写入演员数据到 MongoDB"""
         try:
@@ -464,22 +821,23 @@ class DatabaseManager:
     def add_retry_url(self, url, error_type, error_message,code):
         """添加失败URL到重试表"""
         try:
-            # 检查URL是否已存在
-            existing_url = self.retry_collection.find_one({'url': url})
-            if existing_url:
+            # 单次 upsert：已存在的URL保持不变，不存在时插入
+            result = self.retry_collection.update_one(
+                {'url': url},
+                {'$setOnInsert': {
+                    'url': url,
+                    'error_type': error_type,
+                    'error_message': error_message,
+                    'retry_count': 0,
+                    'last_retry_time': None,
+                    'created_at': datetime.now(),
+                    'status': 'pending',
+                    'code':code
+                }},
+                upsert=True
+            )
+            if result.upserted_id is None:
                 app_logger.info(f"重试URL已存在，跳过添加: {url}")
-                return True
-                
-            self.retry_collection.insert_one({
-                'url': url,
-                'error_type': error_type,
-                'error_message': error_message,
-                'retry_count': 0,
-                'last_retry_time': None,
-                'created_at': datetime.now(),
-                'status': 'pending',
-                'code':code
-            })
             return True
         except Exception as e:
             app_logger.error("添加重试URL失败: {url}, 错误: {e}")
@@ -523,7 +881,7 @@ class DatabaseManager:
             app_logger.error("更新重试状态失败: {url}, 错误: {e}")
             return False
             
-    def get_all_movies(self, page=1, per_page=20, search_keyword=None, is_single=None, is_subtitle=None, is_sehuatang_magnet=None, sort_by='release_date'):
+    def get_all_movies(self, page=1, per_page=20, search_keyword=None, is_single=None, is_subtitle=None, is_sehuatang_magnet=None, sort_by='release_date', cursor=None):
         """获取所有影片(分页)，支持关键字搜索和筛选"""
         try:
             if self.javbus_data_collection is None:
@@ -532,19 +890,10 @@ class DatabaseManager:
             # 构建查询条件列表
             query_conditions = []
             
-            # 如果有搜索关键字，添加搜索条件
-            if search_keyword and search_keyword.strip():
-                search_regex = {'$regex': search_keyword.strip(), '$options': 'i'}
-                # 在 title、code、actresses 或 genres 字段中搜索关键字
-                search_query = {
-                    '$or': [
-                        {'title': search_regex},
-                        {'code': search_regex},
-                        {'actresses': search_regex},
-                        {'genres': search_regex}
-                    ]
-                }
-                query_conditions.append(search_query)
+            # 如果有搜索关键字，通过全文索引在 title、code、actresses、genres 中搜索
+            text_query = build_text_query(search_keyword)
+            if text_query:
+                query_conditions.append(text_query)
             
             # 添加is_single筛选条件
             if is_single is not None:
@@ -562,10 +911,6 @@ class DatabaseManager:
             else:
                 final_query = {}
             
-            # 设置排序方式 - 添加二级排序确保稳定性
-            sort_field = sort_by if sort_by in ['release_date', 'title', 'code'] else 'release_date'
-            sort_order = -1  # 降序排列
-            
             # 添加is_sehuatang_magnet筛选条件
             if is_sehuatang_magnet is not None and is_sehuatang_magnet:
                 query_conditions.append({'is_sehua_magnet': is_sehuatang_magnet})
@@ -576,28 +921,32 @@ class DatabaseManager:
             else:
                 final_query = {}
             
-            # 设置排序方式 - 添加二级排序确保稳定性
-            sort_field = sort_by if sort_by in ['release_date', 'title', 'code'] else 'release_date'
-            sort_order = -1  # 降序排列
-            
-            # 使用复合排序：主排序字段 + _id 作为二级排序确保稳定性
-            movies = list(self.javbus_data_collection.find(
-                final_query
-            ).sort([
-                (sort_field, sort_order),
-                ('_id', 1)  # 添加 _id 作为二级排序字段确保稳定性
-            ]).skip((page-1)*per_page).limit(per_page))
+            if text_query and sort_by == 'relevance':
+                # 按全文搜索相关度排序
+                movies = list(self.javbus_data_collection.find(
+                    final_query,
+                    {'score': {'$meta': 'textScore'}}
+                ).sort([
+                    ('score', {'$meta': 'textScore'}),
+                    ('_id', -1)
+                ]).skip((page-1)*per_page).limit(per_page))
+            else:
+                # 设置排序方式 - 添加二级排序确保稳定性
+                sort_field = sort_by if sort_by in MOVIE_SORT_FIELDS else 'release_date'
+                
+                # 使用复合排序：主排序字段 + _id 作为二级排序确保稳定性
+                movies = self._find_movies_page(final_query, sort_field, page, per_page, cursor)
             
             # 转换 ObjectId 为字符串以支持 JSON 序列化
             self.deal_with_movies(movies)
 
-            total = self.javbus_data_collection.count_documents(final_query)
+            total = self._count_movies(final_query)
             return movies, total
         except Exception as e:
             app_logger.error(f"获取所有影片错误: {e}")
             return None, 0
     
-    def get_series_movies(self, series_name, page=1, per_page=20, search_keyword=None, is_single=None, is_subtitle=None):
+    def get_series_movies(self, series_name, page=1, per_page=20, search_keyword=None, is_single=None, is_subtitle=None, cursor=None):
         """获取指定系列的所有影片(分页)，按发布日期最新排序，支持关键字搜索和筛选"""
         try:
             if self.javbus_data_collection is None:
@@ -635,24 +984,22 @@ class DatabaseManager:
             else:
                 final_query = base_query
             
-            movies = list(self.javbus_data_collection.find(
-                final_query
-            ).sort([('release_date', -1), ('_id', -1)]).skip((page-1)*per_page).limit(per_page))
+            movies = self._find_movies_page(final_query, 'release_date', page, per_page, cursor)
             self.deal_with_movies(movies)
-            total = self.javbus_data_collection.count_documents(final_query)
+            total = self._count_movies(final_query)
             return movies, total
         except Exception as e:
             app_logger.info(f"获取系列影片错误: {e}")
             return None, 0
     
-    def get_actress_movies(self, actress_name, page=1, per_page=20, search_keyword=None, is_single=None, is_subtitle=None, is_sehuatang_magnet=None):
+    def get_actress_movies(self, actress_name, page=1, per_page=20, search_keyword=None, is_single=None, is_subtitle=None, is_sehuatang_magnet=None, cursor=None):
         """获取指定演员的所有影片(分页)，按发布日期最新排序，支持关键字搜索和筛选"""
         try:
             if self.javbus_data_collection is None:
                 return None, 0
             
-            # 基础查询条件：包含该演员
-            base_query = {'actresses': {'$regex': actress_name, '$options': 'i'}}
+            # 基础查询条件：包含该演员（数组等值匹配，走多键索引）
+            base_query = {'actresses': actress_name}
             
             # 构建查询条件列表
             query_conditions = [base_query]
@@ -687,17 +1034,15 @@ class DatabaseManager:
             else:
                 final_query = base_query
                 
-            movies = list(self.javbus_data_collection.find(
-                final_query
-            ).sort([('release_date', -1), ('_id', -1)]).skip((page-1)*per_page).limit(per_page))
+            movies = self._find_movies_page(final_query, 'release_date', page, per_page, cursor)
             self.deal_with_movies(movies)
-            total = self.javbus_data_collection.count_documents(final_query)
+            total = self._count_movies(final_query)
             return movies, total
         except Exception as e:
             app_logger.info(f"获取演员影片错误: {e}")
             return None, 0
     
-    def get_studio_movies(self, studio_name, page=1, per_page=20, search_keyword=None, is_single=None, is_subtitle=None):
+    def get_studio_movies(self, studio_name, page=1, per_page=20, search_keyword=None, is_single=None, is_subtitle=None, cursor=None):
         """获取指定制作商的所有影片(分页)，按发布日期最新排序，支持关键字搜索和筛选"""
         try:
             if self.javbus_data_collection is None:
@@ -735,57 +1080,221 @@ class DatabaseManager:
             else:
                 final_query = base_query
                 
-            movies = list(self.javbus_data_collection.find(
-                final_query
-            ).sort([('release_date', -1), ('_id', -1)]).skip((page-1)*per_page).limit(per_page))
+            movies = self._find_movies_page(final_query, 'release_date', page, per_page, cursor)
             self.deal_with_movies(movies)
-            total = self.javbus_data_collection.count_documents(final_query)
+            total = self._count_movies(final_query)
             return movies, total
         except Exception as e:
             app_logger.error(f"获取制作商影片错误: {e}")
             return None, 0
     
+    def _find_movies_page(self, final_query, sort_field, page, per_page, cursor=None):
+        """按 (排序字段, _id) 降序分页查询影片：有游标时走 keyset 翻页，否则按页码 skip"""
+        decoded = decode_page_cursor(cursor) if cursor else None
+        if decoded and decoded[0] == sort_field:
+            _, value, last_id, direction = decoded
+            seek_query = self._build_seek_query(sort_field, value, last_id, direction)
+            query = {'$and': [final_query, seek_query]} if final_query else seek_query
+            # 向前翻页时反向排序取数，再翻转回降序
+            sort_order = 1 if direction == 'prev' else -1
+            movies = list(self.javbus_data_collection.find(query).sort([
+                (sort_field, sort_order),
+                ('_id', sort_order)
+            ]).limit(per_page))
+            if direction == 'prev':
+                movies.reverse()
+            return movies
+        
+        return list(self.javbus_data_collection.find(final_query).sort([
+            (sort_field, -1),
+            ('_id', -1)
+        ]).skip((page-1)*per_page).limit(per_page))
+    
+    def _build_seek_query(self, sort_field, value, last_id, direction):
+        """构建 keyset 翻页条件（降序排列中缺失/空值排在最后）"""
+        if direction == 'prev':
+            if value is None:
+                return {'$or': [
+                    {sort_field: None, '_id': {'$gt': last_id}},
+                    {sort_field: {'$ne': None}}
+                ]}
+            return {'$or': [
+                {sort_field: {'$gt': value}},
+                {sort_field: value, '_id': {'$gt': last_id}}
+            ]}
+        
+        if value is None:
+            return {sort_field: None, '_id': {'$lt': last_id}}
+        return {'$or': [
+            {sort_field: {'$lt': value}},
+            {sort_field: value, '_id': {'$lt': last_id}},
+            {sort_field: None}
+        ]}
+    
+    def _count_movies(self, final_query):
+        """统计列表总数：按标准化查询条件缓存，estimated 模式下使用估算/限量计数"""
+        if self.count_mode == 'estimated' and not final_query:
+            return self.javbus_data_collection.estimated_document_count()
+        
+        cache_key = json.dumps(final_query, sort_keys=True, ensure_ascii=False, default=str)
+        total = self.movie_count_cache.get(cache_key)
+        if total is not None:
+            return total
+        
+        if self.count_mode == 'estimated':
+            # 只统计到上限，分页导航最多显示到上限对应的页数
+            total = self.javbus_data_collection.count_documents(final_query, limit=self.count_cap)
+        else:
+            total = self.javbus_data_collection.count_documents(final_query)
+        self.movie_count_cache.set(cache_key, total)
+        return total
+    
+    def make_page_cursors(self, movies, sort_by='release_date'):
+        """根据当前页首尾影片生成上一页/下一页游标"""
+        sort_field = sort_by if sort_by in MOVIE_SORT_FIELDS else 'release_date'
+        cursors = {'prev': None, 'next': None, 'threshold': KEYSET_PAGE_THRESHOLD}
+        if movies:
+            cursors['prev'] = encode_page_cursor(sort_field, movies[0], 'prev')
+            cursors['next'] = encode_page_cursor(sort_field, movies[-1], 'next')
+        return cursors
+    
     def parse_actress_to_array(self,movie):
-        """解析数据库里的演员信息，将字符串转换为数组"""
+        """解析数据库里的演员信息（数组，兼容旧数据的换行字符串）"""
         if movie == None:
             return None
         else:
-            actresses = movie['actresses']
+            actresses = movie.get('actresses')
             if actresses == None:
                 return None
             else:
-                return  actresses.split('\n')
+                return to_string_list(actresses)
+
+    def parse_genres_to_array(self,movie):
+        """解析数据库里的类别信息（数组，兼容旧数据的换行字符串）"""
+        if movie == None:
+            return None
+        return to_string_list(movie.get('genres'))
 
     def parser_magnet_links_to_array(self,movie):
-        """解析数据库里的磁力信息，将字符串转换为数组"""
+        """解析数据库里的磁力信息（子文档数组，兼容旧数据的字典 repr 字符串）"""
         if movie == None:
             return None
         else:
-            magnet_links = movie['magnet_links']
+            magnet_links = movie.get('magnet_links')
             if magnet_links == None:
                 return None
             else:
-                return self.parse_string_to_array(magnet_links)
+                return to_magnet_list(magnet_links)
 
         
     def parse_string_to_array(self,data_string):
         """将字符串解析为数组"""
-        if not data_string:
-            return []
+        return to_magnet_list(data_string)
+    
+    def backfill_jav_norm_fields(self, batch_size=1000):
+        """为 JavBus 影片补充 url_norm/code_norm/movie_code_norm 字段（全集合扫描，首次启动时执行一次）"""
+        if self.javbus_data_collection is None:
+            app_logger.error("MongoDB集合未初始化")
+            return 0
         
-        data_list = []
-        lines = data_string.strip().split('\n')
+        updated_count = 0
+        operations = []
+        try:
+            cursor = self.javbus_data_collection.find(
+                {'$or': [
+                    {'url_norm': {'$exists': False}},
+                    {'code_norm': {'$exists': False}},
+                    {'movie_code_norm': {'$exists': False}}
+                ]},
+                {'url': 1, 'code': 1}
+            ).batch_size(batch_size)
+            
+            for movie in cursor:
+                operations.append(UpdateOne(
+                    {'_id': movie['_id']},
+                    {'$set': {
+                        'url_norm': (movie.get('url') or '').lower(),
+                        'code_norm': (movie.get('code') or '').lower(),
+                        'movie_code_norm': normalize_movie_code(movie.get('code'))
+                    }}
+                ))
+                if len(operations) >= batch_size:
+                    updated_count += self.javbus_data_collection.bulk_write(operations, ordered=False).modified_count
+                    operations = []
+                    app_logger.info(f"已补充 {updated_count} 条影片的 url_norm/code_norm")
+            
+            if operations:
+                updated_count += self.javbus_data_collection.bulk_write(operations, ordered=False).modified_count
+            
+            app_logger.info(f"url_norm/code_norm 补充完成，共更新 {updated_count} 条影片")
+            return updated_count
+        except Exception as e:
+            app_logger.error(f"补充 url_norm/code_norm 失败（已更新 {updated_count} 条）: {e}")
+            return None
+    
+    def run_schema_migrations(self):
+        """按 SCHEMA_MIGRATIONS 顺序执行尚未完成的数据迁移"""
+        state = self.get_sync_state('schema_migrations') or {}
+        applied = set(state.get('applied') or [])
+        for name, method_name in SCHEMA_MIGRATIONS.items():
+            if name in applied:
+                continue
+            app_logger.info(f"执行数据迁移: {name}")
+            if getattr(self, method_name)() is None:
+                app_logger.error(f"数据迁移 {name} 失败，下次启动时重试，也可运行 python db_migrate.py {name}")
+                continue
+            self.mark_schema_migration(name)
+    
+    def mark_schema_migration(self, name):
+        """记录数据迁移已完成"""
+        self.sync_state_collection.update_one(
+            {'_id': 'schema_migrations'},
+            {'$addToSet': {'applied': name}, '$set': {'updated_at': datetime.now()}},
+            upsert=True
+        )
+    
+    def migrate_movie_arrays(self, batch_size=1000):
+        """把 JavBus 影片的演员/类别/磁力链接从换行字符串迁移为数组（一次性迁移）"""
+        if self.javbus_data_collection is None:
+            app_logger.error("MongoDB集合未初始化")
+            return 0
         
-        for line in lines:
-            line = line.strip()
-            if line:
-                try:
-                    # 使用 ast.literal_eval 安全解析
-                    data = ast.literal_eval(line)
-                    data_list.append(data)
-                except (ValueError, SyntaxError) as e:
-                    app_logger.info(f"解析行失败: {line}, 错误: {e}")
-        return data_list
+        updated_count = 0
+        operations = []
+        try:
+            # 按字段整体类型判断（$type 查询操作符会匹配数组元素，这里用 $expr）
+            cursor = self.javbus_data_collection.find(
+                {'$expr': {'$or': [
+                    {'$eq': [{'$type': '$actresses'}, 'string']},
+                    {'$eq': [{'$type': '$genres'}, 'string']},
+                    {'$eq': [{'$type': '$magnet_links'}, 'string']}
+                ]}},
+                {'actresses': 1, 'genres': 1, 'magnet_links': 1}
+            ).batch_size(batch_size)
+            
+            for movie in cursor:
+                operations.append(UpdateOne(
+                    {'_id': movie['_id']},
+                    {'$set': {
+                        'actresses': to_string_list(movie.get('actresses')),
+                        'genres': to_string_list(movie.get('genres')),
+                        'magnet_links': to_magnet_list(movie.get('magnet_links'))
+                    }}
+                ))
+                if len(operations) >= batch_size:
+                    updated_count += self.javbus_data_collection.bulk_write(operations, ordered=False).modified_count
+                    operations = []
+                    app_logger.info(f"已迁移 {updated_count} 条影片的数组字段")
+            
+            if operations:
+                updated_count += self.javbus_data_collection.bulk_write(operations, ordered=False).modified_count
+            
+            self.movie_count_cache.clear()
+            app_logger.info(f"数组字段迁移完成，共更新 {updated_count} 条影片")
+            return updated_count
+        except Exception as e:
+            app_logger.error(f"迁移数组字段失败（已更新 {updated_count} 条）: {e}")
+            return None
 
     def record_failed_image_download(self, image_url, error_message, movie_code=None):
         """记录下载失败的图片地址"""
@@ -793,9 +1302,6 @@ class DatabaseManager:
             # 创建失败图片记录集合（如果不存在）
             if not hasattr(self, 'failed_images_collection'):
                 self.failed_images_collection = self.mongo_db['failed_images']
-                # 创建索引
-                self.failed_images_collection.create_index("image_url")
-                self.failed_images_collection.create_index("created_at")
             
             # 检查是否已经记录过这个失败的图片
             existing_record = self.failed_images_collection.find_one({"image_url": image_url})
@@ -871,6 +1377,10 @@ class DatabaseManager:
         try:
             # 添加时间戳
             data['crawl_time'] = datetime.now()  
+            # 写入时提取一次标准化电影编号，避免查询时正则扫描
+            data['movie_code_norm'] = normalize_movie_code(
+                data.get('movie_code') or extract_movie_code(data.get('title'))
+            )
             # 检查是否已存在
             db_manager.markMovieHasSehuatangMagnet(data['title'])
             existing = self.mongo_collection.find_one({'tid': data['tid']})
@@ -892,6 +1402,77 @@ class DatabaseManager:
             app_logger.error(f"保存到MongoDB失败: {e}")
             return False
             
+    def backfill_movie_code_norm(self, batch_size=1000):
+        """为历史色花堂记录补充 movie_code_norm 字段（一次性迁移）"""
+        if self.mongo_collection is None:
+            app_logger.error("MongoDB集合未初始化")
+            return 0
+        
+        updated_count = 0
+        operations = []
+        try:
+            cursor = self.mongo_collection.find(
+                {'movie_code_norm': {'$exists': False}},
+                {'title': 1, 'movie_code': 1}
+            ).batch_size(batch_size)
+            
+            for record in cursor:
+                movie_code_norm = normalize_movie_code(
+                    record.get('movie_code') or extract_movie_code(record.get('title'))
+                )
+                operations.append(UpdateOne(
+                    {'_id': record['_id']},
+                    {'$set': {'movie_code_norm': movie_code_norm}}
+                ))
+                if len(operations) >= batch_size:
+                    updated_count += self.mongo_collection.bulk_write(operations, ordered=False).modified_count
+                    operations = []
+                    app_logger.info(f"已补充 {updated_count} 条记录的 movie_code_norm")
+            
+            if operations:
+                updated_count += self.mongo_collection.bulk_write(operations, ordered=False).modified_count
+            
+            app_logger.info(f"movie_code_norm 补充完成，共更新 {updated_count} 条记录")
+            return updated_count
+        except Exception as e:
+            app_logger.error(f"补充 movie_code_norm 失败: {e}")
+            return updated_count
+    
+    def backfill_search_text(self, batch_size=1000, rebuild=False):
+        """为 JavBus 影片补充全文搜索 search_text 字段，rebuild 为 True 时全部重建"""
+        if self.javbus_data_collection is None:
+            app_logger.error("MongoDB集合未初始化")
+            return 0
+        
+        updated_count = 0
+        operations = []
+        try:
+            query = {} if rebuild else {'search_text': {'$exists': False}}
+            cursor = self.javbus_data_collection.find(
+                query,
+                {'title': 1, 'code': 1, 'actresses': 1, 'genres': 1}
+            ).batch_size(batch_size)
+            
+            for movie in cursor:
+                operations.append(UpdateOne(
+                    {'_id': movie['_id']},
+                    {'$set': {'search_text': build_search_text(movie)}}
+                ))
+                if len(operations) >= batch_size:
+                    updated_count += self.javbus_data_collection.bulk_write(operations, ordered=False).modified_count
+                    operations = []
+                    app_logger.info(f"已补充 {updated_count} 条影片的 search_text")
+            
+            if operations:
+                updated_count += self.javbus_data_collection.bulk_write(operations, ordered=False).modified_count
+            
+            self.movie_count_cache.clear()
+            app_logger.info(f"search_text 补充完成，共更新 {updated_count} 条影片")
+            return updated_count
+        except Exception as e:
+            app_logger.error(f"补充 search_text 失败（已更新 {updated_count} 条）: {e}")
+            return None
+            
     def is_actress_processed(self, actress_code):
         """检查演员是否已经处理过"""
         if self.processed_actresses_collection is None:
@@ -1091,25 +1672,35 @@ class DatabaseManager:
             return None
     
     def get_user_session(self, session_id):
-        """获取用户会话信息"""
+        """获取用户会话信息（优先读取进程内缓存，last_accessed 按间隔节流写入）"""
         try:
-            session = self.sessions_collection.find_one({
-                'session_id': session_id,
-                'expires_at': {'$gt': datetime.now()}
-            })
-            
-            if session:
-                # 更新最后访问时间
-                self.sessions_collection.update_one(
-                    {'session_id': session_id},
-                    {'$set': {'last_accessed': datetime.now()}}
-                )
-                return {
+            now = datetime.now()
+            cached = self.session_cache.get(session_id)
+            if cached and cached[1] > now:
+                user_info = dict(cached[0])
+            else:
+                session = self.sessions_collection.find_one({
+                    'session_id': session_id,
+                    'expires_at': {'$gt': now}
+                })
+                if not session:
+                    self.session_cache.delete(session_id)
+                    return None
+                user_info = {
                     'user_id': session['user_id'],
                     'username': session['username'],
                     'role': session['role']
                 }
-            return None
+                self.session_cache.set(session_id, (dict(user_info), session['expires_at']))
+            
+            # 更新最后访问时间（每个会话在节流间隔内只写一次）
+            if self.session_touch_cache.get(session_id) is None:
+                self.session_touch_cache.set(session_id, True)
+                self.sessions_collection.update_one(
+                    {'session_id': session_id},
+                    {'$set': {'last_accessed': now}}
+                )
+            return user_info
             
         except Exception as e:
             app_logger.error(f"获取用户会话失败: {e}")
@@ -1118,6 +1709,8 @@ class DatabaseManager:
     def delete_user_session(self, session_id):
         """删除用户会话（退出登录）"""
         try:
+            self.session_cache.delete(session_id)
+            self.session_touch_cache.delete(session_id)
             result = self.sessions_collection.delete_one({'session_id': session_id})
             return result.deleted_count > 0
             
@@ -1139,6 +1732,168 @@ class DatabaseManager:
             app_logger.error(f"清理过期会话失败: {e}")
             return 0
 
+    # ==================== Jellyfin 同步相关方法 ====================
+    
+    def get_sync_state(self, name):
+        """获取同步任务状态"""
+        try:
+            return self.sync_state_collection.find_one({'_id': name})
+        except Exception as e:
+            app_logger.error(f"获取同步状态失败: {name}, 错误: {e}")
+            return None
+    
+    def _begin_sync(self, name):
+        """标记同步任务开始，同一任务正在运行（1小时内）时返回 None"""
+        now = datetime.now()
+        try:
+            return self.sync_state_collection.find_one_and_update(
+                {
+                    '_id': name,
+                    '$or': [
+                        {'status': {'$ne': 'running'}},
+                        {'started_at': {'$lt': now - timedelta(hours=1)}}
+                    ]
+                },
+                {'$set': {
+                    'status': 'running',
+                    'started_at': now,
+                    'finished_at': None,
+                    'processed': 0,
+                    'modified': 0,
+                    'error': None
+                }},
+                upsert=True,
+                return_document=True
+            )
+        except Exception as e:
+            # 文档存在但状态为 running 时 upsert 触发主键冲突
+            app_logger.info(f"同步任务 {name} 正在运行，跳过: {e}")
+            return None
+    
+    def sync_jellyfin_library(self, full=False):
+        """
+        增量同步 Jellyfin library.db 中的电影到 javbus_data（写入 presentation_key）
+        
+        查询 DateModified 不早于上次高水位标记的记录（同一时间戳的记录可能跨批次或在上次同步后才写入，
+        所以用 >= 并按 guid 跳过已处理过的记录），按批 bulk_write，full 为 True 时全量同步。
+        增量同步后再把本地影片库中尚未关联的影片与 library.db 重新匹配一次，
+        覆盖 Jellyfin 先入库、影片后被爬取的情况。
+        """
+        sync_config = app_config.get_jellyfin_sync_config()
+        batch_size = sync_config['batch_size']
+        state = self._begin_sync('jellyfin')
+        if state is None:
+            return None
+        
+        high_water_mark = '' if full else (state.get('high_water_mark') or '')
+        # 时间戳等于高水位标记、已经处理过的记录 guid
+        high_water_ids = set() if full else set(state.get('high_water_ids') or [])
+        processed = modified = 0
+        start_time = time.time()
+        conn = None
+        try:
+            conn = sqlite3.connect(f"file:{sync_config['library_db']}?mode=ro", uri=True)
+            cursor = conn.execute(
+                "SELECT hex(guid), Name, PresentationUniqueKey, DateModified FROM TypedBaseItems "
+                "WHERE type = 'MediaBrowser.Controller.Entities.Movies.Movie' AND TopParentId = ? "
+                "AND DateModified >= ? ORDER BY DateModified",
+                (sync_config['top_parent_id'], high_water_mark)
+            )
+            app_logger.info(f"开始同步Jellyfin数据，高水位标记: {high_water_mark or '无（全量）'}")
+            
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                
+                operations = []
+                for item_id, movie_name, presentation_key, date_modified in rows:
+                    if date_modified == high_water_mark and item_id in high_water_ids:
+                        continue
+                    if date_modified != high_water_mark:
+                        high_water_mark = date_modified
+                        high_water_ids = set()
+                    high_water_ids.add(item_id)
+                    code = jellyfin_movie_code(movie_name)
+                    if code:
+                        operations.append(UpdateOne(
+                            {'code': code},
+                            {'$set': {'presentation_key': presentation_key}}
+                        ))
+                    else:
+                        app_logger.warning(f"无法从 '{movie_name}' 中提取电影编码")
+                
+                if operations:
+                    modified += self.javbus_data_collection.bulk_write(operations, ordered=False).modified_count
+                processed += len(rows)
+                
+                # 每批结束后保存进度和高水位标记，中断后可从此处继续
+                rate = processed / max(time.time() - start_time, 0.001)
+                self.sync_state_collection.update_one({'_id': 'jellyfin'}, {'$set': {
+                    'high_water_mark': high_water_mark,
+                    'high_water_ids': sorted(high_water_ids),
+                    'processed': processed,
+                    'modified': modified,
+                    'rate': round(rate, 1)
+                }})
+                app_logger.info(f"Jellyfin同步进度: 已处理 {processed} 部，更新 {modified} 部，{rate:.0f} 部/秒")
+            
+            relinked = self._relink_jellyfin_library(conn, sync_config['top_parent_id'])
+            modified += relinked
+            
+            elapsed = time.time() - start_time
+            self.sync_state_collection.update_one({'_id': 'jellyfin'}, {'$set': {
+                'status': 'done',
+                'finished_at': datetime.now(),
+                'modified': modified,
+                'relinked': relinked,
+                'elapsed': round(elapsed, 2)
+            }})
+            app_logger.info(f"Jellyfin同步完成，共处理 {processed} 部，更新 {modified} 部（重新关联 {relinked} 部），耗时 {elapsed:.1f} 秒")
+            return {'processed': processed, 'modified': modified, 'relinked': relinked, 'elapsed': elapsed}
+        except Exception as e:
+            app_logger.error(f"Jellyfin同步过程中出错: {e}")
+            self.sync_state_collection.update_one({'_id': 'jellyfin'}, {'$set': {
+                'status': 'failed',
+                'finished_at': datetime.now(),
+                'error': str(e)
+            }})
+            return None
+        finally:
+            if conn is not None:
+                conn.close()
+    
+    def _relink_jellyfin_library(self, conn, top_parent_id):
+        """为本地影片库中存在、但还没有 presentation_key 的影片重新查找 Jellyfin 记录，返回更新数量"""
+        library_codes = library_index.all_codes()
+        if not library_codes:
+            return 0
+        unlinked = {
+            movie['code']
+            for movie in self.javbus_data_collection.find(
+                {'movie_code_norm': {'$in': list(library_codes)}, 'presentation_key': {'$exists': False}},
+                {'code': 1}
+            )
+            if movie.get('code')
+        }
+        if not unlinked:
+            return 0
+        
+        operations = []
+        cursor = conn.execute(
+            "SELECT Name, PresentationUniqueKey FROM TypedBaseItems "
+            "WHERE type = 'MediaBrowser.Controller.Entities.Movies.Movie' AND TopParentId = ?",
+            (top_parent_id,)
+        )
+        for movie_name, presentation_key in cursor:
+            code = jellyfin_movie_code(movie_name)
+            if code in unlinked:
+                unlinked.discard(code)
+                operations.append(UpdateOne({'code': code}, {'$set': {'presentation_key': presentation_key}}))
+        if not operations:
+            return 0
+        return self.javbus_data_collection.bulk_write(operations, ordered=False).modified_count
+    
     def get_backup_records(self):
         """获取备份记录"""
         if self.mongo_db is None:
@@ -1249,7 +2004,7 @@ class DatabaseManager:
             app_logger.error(f"获取类别信息失败: {e}")
             return None
     
-    def search_movies_by_genres(self, names=None, page=1, per_page=20, search_keyword=None, is_single=None, is_subtitle=None, is_sehuatang_magnet=None, sort_by='release_date'):
+    def search_movies_by_genres(self, names=None, page=1, per_page=20, search_keyword=None, is_single=None, is_subtitle=None, is_sehuatang_magnet=None, sort_by='release_date', cursor=None):
         """根据分类代码搜索影片，支持多选分类、关键字、单体、字幕筛选"""
         try:
             if self.javbus_data_collection is None:
@@ -1261,12 +2016,7 @@ class DatabaseManager:
             # 如果指定了分类代码，添加分类筛选条件
             if genre_names and len(genre_names) > 0:
                 # 支持多选分类，影片必须包含所有指定分类（AND操作）
-                genre_query = {
-                    '$and': [
-                        {'genres': {'$regex': name, '$options': 'i'}} for name in genre_names
-                    ]
-                }
-                query_conditions.append(genre_query)
+                query_conditions.append({'genres': {'$all': list(genre_names)}})
             
             # 如果有搜索关键字，添加搜索条件
             if search_keyword and search_keyword.strip():
@@ -1298,13 +2048,10 @@ class DatabaseManager:
                 final_query = {}
             
             # 设置排序方式
-            sort_field = sort_by if sort_by in ['release_date', 'title', 'code'] else 'release_date'
-            sort_order = -1  # 降序排列
-            movies = list(self.javbus_data_collection.find(
-                final_query
-            ).sort([(sort_field, sort_order), ('_id', sort_order)]).skip((page-1)*per_page).limit(per_page))
+            sort_field = sort_by if sort_by in MOVIE_SORT_FIELDS else 'release_date'
+            movies = self._find_movies_page(final_query, sort_field, page, per_page, cursor)
             self.deal_with_movies(movies)
-            total = self.javbus_data_collection.count_documents(final_query)
+            total = self._count_movies(final_query)
             return movies, total
             
         except Exception as e:
@@ -1928,78 +2675,88 @@ class DatabaseManager:
             app_logger.error(f"更新爬虫最后运行时间失败: {e}")
             return False
     
-    def dealwithallMovei(self):
+    def dealwithallMovei(self, incremental=False, batch_size=1000):
         """遍历mongo_collection，查找包含javbus_data_collection中电影code的记录，
-        并更新对应电影的is_sehua_magnet字段为True"""
+        并更新对应电影的is_sehua_magnet字段为True
+
+        流式遍历色花堂记录，按批收集标准化编号后用 UpdateMany + $in 批量更新；
+        incremental 为 True 时只处理抓取时间不早于上次高水位标记的帖子，
+        同一时间戳的帖子按 _id 跳过已处理过的"""
         try:
             if self.mongo_collection is None or self.javbus_data_collection is None:
                 app_logger.error("MongoDB集合未初始化")
                 return False
-                
-            # 获取所有sehuatang记录
-            sehuatang_records = list(self.mongo_collection.find(
-                {}, 
-                {"title": 1, "movie_code": 1}
-            ))
-            
-            app_logger.info(f"找到{len(sehuatang_records)}条色花堂记录")
-            
-            # 获取所有javbus电影记录
-            javbus_movies = list(self.javbus_data_collection.find(
-                {}, 
-                {"code": 1, "title": 1}
-            ))
-            
-            app_logger.info(f"找到{len(javbus_movies)}条JavBus电影记录")
-            
-            # 创建电影代码到ID的映射，便于快速查找
-            movie_code_to_id = {}
-            for movie in javbus_movies:
-                code = movie.get("code", "").upper()
-                if code:
-                    movie_code_to_id[code] = movie["_id"]
-                    # 处理没有连字符的情况
-                    movie_code_to_id[code.replace("-", "")] = movie["_id"]
-            
-            # 遍历sehuatang记录，更新javbus电影的is_sehua_magnet字段
+            
+            state = self.get_sync_state('sehuatang_magnet') or {}
+            high_water_mark = state.get('high_water_mark')
+            high_water_ids = set(state.get('high_water_ids') or [])
+            query = {}
+            if incremental and high_water_mark:
+                query = {'crawl_time': {'$gte': high_water_mark}}
+            
+            cursor = self.mongo_collection.find(
+                query,
+                {'movie_code_norm': 1, 'movie_code': 1, 'title': 1, 'crawl_time': 1}
+            ).sort('crawl_time', 1).batch_size(batch_size)
+            
+            record_count = 0
             update_count = 0
-            for record in sehuatang_records:
-                title = record.get("title", "")
-                movie_code = record.get("movie_code", "")
-                
-                # 尝试从title中提取电影代码
-                if not movie_code and title:
-                    # 简单的正则匹配，可以根据实际情况调整
-                    import re
-                    match = re.search(r'[A-Za-z]+-\d+|[A-Za-z]+\d+', title)
-                    if match:
-                        movie_code = match.group(0).upper()
-                app_logger.info(movie_code)
-                if movie_code:
-                    # 标准化电影代码
-                    movie_code = movie_code.upper()
-                    movie_code_no_dash = movie_code.replace("-", "")
-                    
-                    # 查找匹配的电影ID
-                    movie_id = movie_code_to_id.get(movie_code) or movie_code_to_id.get(movie_code_no_dash)
-                    
-                    if movie_id:
-                        # 更新电影记录
-                        app_logger.info(movie_id)
-                        result = self.javbus_data_collection.update_one(
-                            {"_id": movie_id},
-                            {"$set": {"is_sehua_magnet": True}}
-                        )
-                        
-                        if result.modified_count > 0:
-                            update_count += 1
-            
-            app_logger.info(f"成功更新{update_count}部电影的is_sehua_magnet字段")
+            pending_codes = set()
+            operations = []
+            for record in cursor:
+                crawl_time = record.get('crawl_time')
+                if incremental and crawl_time == high_water_mark and record['_id'] in high_water_ids:
+                    continue
+                if crawl_time is not None:
+                    if crawl_time != high_water_mark:
+                        high_water_mark = crawl_time
+                        high_water_ids = set()
+                    high_water_ids.add(record['_id'])
+                record_count += 1
+                movie_code_norm = record.get('movie_code_norm') or normalize_movie_code(
+                    record.get('movie_code') or extract_movie_code(record.get('title'))
+                )
+                if movie_code_norm:
+                    pending_codes.add(movie_code_norm)
+                if len(pending_codes) >= batch_size:
+                    operations.append(self._sehua_magnet_update(pending_codes))
+                    pending_codes = set()
+                if len(operations) >= 10:
+                    update_count += self.javbus_data_collection.bulk_write(operations, ordered=False).modified_count
+                    operations = []
+            
+            if pending_codes:
+                operations.append(self._sehua_magnet_update(pending_codes))
+            if operations:
+                update_count += self.javbus_data_collection.bulk_write(operations, ordered=False).modified_count
+            
+            self.sync_state_collection.update_one(
+                {'_id': 'sehuatang_magnet'},
+                {'$set': {
+                    'last_run': datetime.now(),
+                    'high_water_mark': high_water_mark,
+                    'high_water_ids': list(high_water_ids),
+                    'processed': record_count,
+                    'modified': update_count
+                }},
+                upsert=True
+            )
+            if update_count:
+                self.movie_count_cache.clear()
+            
+            app_logger.info(f"处理{record_count}条色花堂记录，成功更新{update_count}部电影的is_sehua_magnet字段")
             return True
             
         except Exception as e:
             app_logger.error(f"处理电影数据时出错: {e}")
             return False
+    
+    def _sehua_magnet_update(self, movie_codes_norm):
+        """构建把一批标准化编号对应影片标记为有色花堂磁力的批量更新操作"""
+        return UpdateMany(
+            {'movie_code_norm': {'$in': list(movie_codes_norm)}, 'is_sehua_magnet': {'$ne': True}},
+            {'$set': {'is_sehua_magnet': True}}
+        )
 
     def toggle_crawler_status(self, crawler_type, is_enabled):
         """切换爬虫启用状态"""
@@ -2533,14 +3290,42 @@ class DatabaseManager:
         except Exception as e:
             app_logger.error(f"获取115云下载任务失败: {e}")
             return None
+    def find_magnet_links(self, movie_codes):
+        """批量查找磁力链接，一次 $in 查询返回 {标准化电影编号: 磁力链接}"""
+        if self.mongo_collection is None:
+            return {}
+        
+        codes_norm = {normalize_movie_code(code) for code in movie_codes if code}
+        codes_norm.discard('')
+        if not codes_norm:
+            return {}
+        
+        magnet_links = {}
+        magnet_docs = self.mongo_collection.find(
+            {
+                'movie_code_norm': {'$in': list(codes_norm)},
+                'magnet_link': {'$exists': True, '$ne': ''}
+            },
+            {'_id': 0, 'movie_code_norm': 1, 'magnet_link': 1}
+        )
+        for magnet_doc in magnet_docs:
+            magnet_links.setdefault(magnet_doc['movie_code_norm'], magnet_doc['magnet_link'])
+        return magnet_links
+
     def deal_with_movies(self,movies):
+        """批量补充列表页影片的 is_exist/is_subtitle/is_sehuatang_magnet 标记"""
+        # 整页影片只查询一次磁力链接和本地影片库索引
+        codes = [movie.get('code') for movie in movies]
+        magnet_links = self.find_magnet_links(codes)
+        existing_codes = library_index.existing_codes(codes)
         # 转换 ObjectId 为字符串以支持 JSON 序列化
-            for movie in movies:
-                if '_id' in movie:
-                    movie['_id'] = str(movie['_id'])
-                    movie['is_exist'] = self.isMovieExist(movie)
-                    movie['is_subtitle'] = self.has_subttile(movie)
-                    movie['is_sehuatang_magnet'] = db_manager.find_magnet_link(movie['code']) != None
+        for movie in movies:
+            if '_id' in movie:
+                movie['_id'] = str(movie['_id'])
+                has_magnet = normalize_movie_code(movie.get('code')) in magnet_links
+                movie['is_exist'] = movie.get('code') in existing_codes
+                movie['is_subtitle'] = movie.get('is_subtitle', False) or has_magnet
+                movie['is_sehuatang_magnet'] = has_magnet
     
     def has_subttile(self,movie):
         is_subtitle = movie['is_subtitle']
@@ -2552,11 +3337,8 @@ class DatabaseManager:
         return is_subtitle
 
     def isMovieExist(self,movie):
-        code = movie.get('code', '')  # 使用get方法替代函数调用语法
-        actress = self.parse_actress_to_array(movie)
-        folder = ",".join(map(str, actress))
-        path = os.path.join('/data',folder,code)
-        return os.path.exists(path)
+        """判断影片是否已在本地影片库中（与列表页 deal_with_movies 使用同一个按编号的内存索引）"""
+        return library_index.has_code(movie.get('code', ''))
 
     def markMovieHasSehuatangMagnet(self,title):
         titleArray =  title.split(' ')
@@ -2578,12 +3360,16 @@ class DatabaseManager:
                     movie['sehuatang_url'] = magnet_link
             parse_actress_to_array = db_manager.parse_actress_to_array(movie)
             movie['actresses'] = parse_actress_to_array
+            movie['genres'] = db_manager.parse_genres_to_array(movie)
             return movie
 
 
 # 创建全局数据库管理器实例
 db_manager = DatabaseManager()
 
+# gunicorn 预加载应用后 fork 出的 worker、multiprocessing 启动的爬虫进程都在子进程中重建连接
+os.register_at_fork(after_in_child=db_manager.reconnect_after_fork)
+
 # 在程序退出时自动关闭连接
 def cleanup_db_connection():
     db_manager.close_connection()
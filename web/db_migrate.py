@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移脚本 - 一次性数据补充/结构迁移
+
+database.SCHEMA_MIGRATIONS 中登记的迁移在首次启动时自动执行并记录到 sync_state，
+之后启动不再执行；需要重新执行时手动运行对应子命令。
+
+使用方法：
+python db_migrate.py movie-code-norm
+python db_migrate.py search-text [--rebuild]
+python db_migrate.py movie-arrays
+python db_migrate.py jav-norm-fields
+python db_migrate.py index-report
+python db_migrate.py sehua-magnet [--incremental]
+"""
+
+import argparse
+import sys
+
+from database import SCHEMA_MIGRATIONS, db_manager
+
+
+def migrate_movie_code_norm(args):
+    """为色花堂记录补充 movie_code_norm 字段"""
+    return db_manager.backfill_movie_code_norm(batch_size=args.batch_size)
+
+
+def migrate_search_text(args):
+    """为 JavBus 影片补充全文搜索 search_text 字段"""
+    return db_manager.backfill_search_text(batch_size=args.batch_size, rebuild=args.rebuild)
+
+
+def migrate_movie_arrays(args):
+    """把 JavBus 影片的演员/类别/磁力链接迁移为数组"""
+    return db_manager.migrate_movie_arrays(batch_size=args.batch_size)
+
+
+def migrate_jav_norm_fields(args):
+    """为 JavBus 影片补充 url_norm/code_norm 字段并重建唯一索引"""
+    updated_count = db_manager.backfill_jav_norm_fields(batch_size=args.batch_size)
+    if updated_count is not None:
+        db_manager.ensure_indexes(['javbus_data'])
+    return updated_count
+
+
+def report_indexes(args):
+    """输出索引报告：缺失、未注册、启动以来未被使用以及创建失败的索引"""
+    report = db_manager.get_index_report()
+    for collection_name, info in report.items():
+        if not any(info.values()):
+            continue
+        print(f"📚 {collection_name}")
+        for label, key in (('缺失', 'missing'), ('未注册', 'unregistered'), ('未使用', 'unused')):
+            if info[key]:
+                print(f"   {label}: {', '.join(info[key])}")
+        for name, error in info['failed'].items():
+            print(f"   创建失败: {name} ({error})")
+    return f"共检查 {len(report)} 个集合"
+
+
+def reconcile_sehua_magnet(args):
+    """根据色花堂记录标记 JavBus 影片的 is_sehua_magnet 字段"""
+    return db_manager.dealwithallMovei(incremental=args.incremental, batch_size=args.batch_size)
+
+
+MIGRATIONS = {
+    'movie-code-norm': migrate_movie_code_norm,
+    'search-text': migrate_search_text,
+    'movie-arrays': migrate_movie_arrays,
+    'jav-norm-fields': migrate_jav_norm_fields,
+    'index-report': report_indexes,
+    'sehua-magnet': reconcile_sehua_magnet,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="执行数据库迁移任务")
+    parser.add_argument("migration", choices=sorted(MIGRATIONS.keys()), help="要执行的迁移任务")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批写入的文档数量")
+    parser.add_argument("--rebuild", action="store_true", help="重建全部文档（而不只是补充缺失字段）")
+    parser.add_argument("--incremental", action="store_true", help="只处理上次运行之后抓取的记录")
+    args = parser.parse_args()
+
+    if not db_manager.init_mongodb():
+        print("❌ MongoDB连接失败")
+        sys.exit(1)
+
+    result = MIGRATIONS[args.migration](args)
+    if result is None:
+        print(f"❌ 迁移 {args.migration} 失败，详见日志")
+        sys.exit(1)
+    if args.migration in SCHEMA_MIGRATIONS:
+        # 手动执行成功后启动时不再重复执行
+        db_manager.mark_schema_migration(args.migration)
+    print(f"✅ 迁移 {args.migration} 完成: {result}")
+
+
+if __name__ == "__main__":
+    main()
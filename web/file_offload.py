@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件发送卸载模块 - 让 gunicorn worker 只负责校验和定位文件，字节拷贝交给内核或前端代理
+
+发送模式（FILE_OFFLOAD_MODE）：
+  flask      默认，由 Flask/Werkzeug 发送，本地直接运行时使用
+  sendfile   由 gunicorn 通过 os.sendfile 零拷贝发送，Range 请求也只发送对应区间
+  x-accel    只返回 X-Accel-Redirect 头，由 nginx 的 internal location 发送（配置示例见 etc/nginx/sehuatang.conf）
+  x-sendfile 只返回 X-Sendfile 头（文件绝对路径），由 Apache mod_xsendfile / lighttpd 发送
+x-accel / x-sendfile 模式下 Range、条件请求和预压缩文件由前端代理处理。
+"""
+
+import mimetypes
+import os
+import sys
+from urllib.parse import quote
+
+from flask import abort, current_app, request, send_from_directory
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+
+# 添加父目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import config as app_config
+
+MODES = ('flask', 'sendfile', 'x-accel', 'x-sendfile')
+
+
+def _iter_range(file, length, chunk_size=65536):
+    """非 gunicorn 环境下按长度读取区间内容"""
+    try:
+        while length > 0:
+            data = file.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+class FileOffload:
+    """按配置的模式发送静态目录中的文件"""
+
+    def __init__(self, mode='flask', accel_prefix='/_protected_static'):
+        if mode not in MODES:
+            print(f"未知的文件发送模式 {mode}，使用 flask")
+            mode = 'flask'
+        self.mode = mode
+        self.accel_prefix = accel_prefix.rstrip('/')
+
+    @property
+    def proxy_handles_encoding(self):
+        """x-accel 模式下预压缩文件由 nginx 的 gzip_static 选择"""
+        return self.mode == 'x-accel'
+
+    def resolve(self, directory, filename):
+        """把请求的文件名解析为目录内的绝对路径，越界或不存在时返回 404"""
+        path = safe_join(directory, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        return path
+
+    def send(self, directory, filename, mimetype=None, etag=None, content_encoding=None):
+        """发送 directory 下的 filename；etag 为空时按修改时间和大小生成"""
+        if self.mode in ('flask', 'x-sendfile'):
+            # x-sendfile 模式下 app.py 开启了 USE_X_SENDFILE，Flask 只返回 X-Sendfile 头
+            response = send_from_directory(directory, filename, mimetype=mimetype, etag=etag or True)
+        elif self.mode == 'x-accel':
+            response = self._accel_response(directory, filename, mimetype)
+        else:
+            response = self._sendfile_response(self.resolve(directory, filename), mimetype, etag)
+        if content_encoding and response.status_code != 304:
+            response.content_encoding = content_encoding
+        return response
+
+    def _accel_response(self, directory, filename, mimetype):
+        path = self.resolve(directory, filename)
+        rel_path = os.path.relpath(path, directory).replace(os.sep, '/')
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = quote(f"{self.accel_prefix}/{rel_path}")
+        if not mimetype:
+            # 让 nginx 按扩展名设置 Content-Type
+            del response.headers['Content-Type']
+        return response
+
+    @staticmethod
+    def _if_range_matches(etag, mtime):
+        """没有 If-Range，或 If-Range 的 ETag/日期与当前文件一致时才按 Range 返回，否则返回完整文件"""
+        if_range = request.if_range
+        if if_range.etag is None and if_range.date is None:
+            return True
+        if if_range.etag is not None:
+            return if_range.etag == etag
+        return int(if_range.date.timestamp()) == mtime
+
+    def _sendfile_response(self, path, mimetype, etag):
+        """gunicorn 的 sendfile 从文件当前位置发送 Content-Length 字节，定位到区间起点即可零拷贝发送 Range"""
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = etag or f"{int(stat.st_mtime)}-{size}"
+        mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        response = current_app.response_class(mimetype=mimetype, direct_passthrough=True)
+        response.set_etag(etag)
+        response.last_modified = int(stat.st_mtime)
+        response.accept_ranges = 'bytes'
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = request.if_modified_since is not None and request.if_modified_since.timestamp() >= int(stat.st_mtime)
+        if not_modified:
+            response.status_code = 304
+            return response
+
+        start, length = 0, size
+        if request.range and self._if_range_matches(etag, int(stat.st_mtime)):
+            byte_range = request.range.range_for_length(size)
+            if byte_range is None:
+                response.status_code = 416
+                response.headers['Content-Range'] = f"bytes */{size}"
+                return response
+            start, stop = byte_range
+            length = stop - start
+            response.status_code = 206
+            response.content_range = f"bytes {start}-{stop - 1}/{size}"
+
+        response.content_length = length
+        if request.method == 'HEAD':
+            return response
+        file = open(path, 'rb')
+        file.seek(start)
+        if start + length == size or request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+            # gunicorn 按 Content-Length 截断，区间不到文件末尾也可以直接交给 file_wrapper
+            response.response = wrap_file(request.environ, file)
+        else:
+            response.response = _iter_range(file, length)
+        return response
+
+
+file_offload_config = app_config.get_file_offload_config()
+file_offload = FileOffload(
+    mode=file_offload_config['mode'],
+    accel_prefix=file_offload_config['accel_prefix'],
+)
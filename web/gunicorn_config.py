@@ -1,3 +1,5 @@
+import os
+
  
 # 日志格式
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(L)s'
@@ -10,14 +12,27 @@ backup_count = 5
 bind = "0.0.0.0:5000"
 
 # Worker数量
-workers = 4
-worker_class = "sync"
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+# gthread：每个 worker 用线程池处理请求，图片代理、搜索、115 播放地址等慢速上游请求只占一个线程；
+# 设为 sync 可恢复原来的单线程 worker
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+# 每个 worker 的线程数（仅 gthread 有效），MONGO_MAX_POOL_SIZE 应不小于该值
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+# 请求超时秒数，搜索会实时抓取 JavBus 页面
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+# gthread 下保持连接复用
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# 文件响应使用 os.sendfile 零拷贝发送（FILE_OFFLOAD_MODE=sendfile 时 Range 请求也走这里）
+sendfile = True
 
 # 静态文件缓存配置
 max_requests = 1000
 max_requests_jitter = 50
 
 # 启用预加载应用
+# MongoDB 连接（database.py 注册的 fork 钩子）和 requests 连接池（http_session.py）在 worker 中各自重建，
+# 后台下载线程、影片库监视线程按进程号在 worker 中首次使用时启动
 preload_app = True
 
 # 设置静态文件缓存
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 连接池模块 - 每个进程一个 requests.Session
+
+gunicorn 以 preload 方式启动时，应用在主进程中创建的 Session 会被 fork 到各个 worker，
+多个进程共用同一批套接字会导致响应串读。这里按进程号惰性创建 Session，
+fork 后的子进程第一次使用时自动建立自己的连接池；同一进程内的多个线程共用一个连接池。
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ProcessLocalSession:
+    """按进程创建、线程间共享的 requests.Session"""
+
+    def __init__(self, pool_connections=4, pool_maxsize=16, headers=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.headers = dict(headers or {})
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _create(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(self.headers)
+        return session
+
+    @property
+    def session(self):
+        """返回当前进程的 Session，fork 后首次访问时重新创建"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # 不关闭父进程的 Session：关闭会影响父进程仍在使用的连接
+                    self._session = self._create()
+                    self._pid = os.getpid()
+        return self._session
+
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.session.post(url, **kwargs)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片后台下载队列模块 - 封面下载与页面解析解耦
+
+解析影片详情时只把封面地址放入队列，由固定数量的后台线程下载：
+同一 URL 在排队/下载期间只会入队一次，失败按退避时间重试，
+最终失败才写入 failed_images，之后可通过“重试失败图片”接口补下。
+下载线程是守护线程：爬取结束时等待队列排空，进程退出时仍未下载的图片写入 failed_images。
+"""
+
+import atexit
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+import app_logger
+from cover_thumbnails import COVER_SUFFIX, generate_derivatives
+from database import db_manager
+from http_session import ProcessLocalSession
+
+# 添加父目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import config as app_config
+
+
+class ImageDownloadQueue:
+    """有界线程池的图片下载队列"""
+
+    # 吞吐量统计窗口（秒）
+    THROUGHPUT_WINDOW = 60
+
+    def __init__(self, workers=4, max_retries=3, queue_size=1000, timeout=30, shutdown_timeout=60):
+        self.workers = max(1, workers)
+        self.max_retries = max(1, max_retries)
+        self.timeout = timeout
+        self.shutdown_timeout = shutdown_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        # 排队中或下载中的 URL，用于去重
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._worker_pid = None
+        self._session = ProcessLocalSession(pool_maxsize=self.workers)
+        self._completed_times = deque()
+        self._stats = {'enqueued': 0, 'deduplicated': 0, 'completed': 0, 'skipped': 0,
+                       'retried': 0, 'failed': 0, 'rejected': 0, 'in_flight': 0}
+
+    def start(self):
+        """启动下载线程（fork 后的子进程会自动重新启动线程）"""
+        if self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker_pid == os.getpid():
+                return
+            for index in range(self.workers):
+                worker = threading.Thread(target=self._work, name=f'image-download-{index}', daemon=True)
+                worker.start()
+            self._worker_pid = os.getpid()
+
+    def submit(self, image_url, save_path, filename, movie_code=None, headers=None):
+        """把图片加入下载队列，立即返回；已在队列中的 URL 或已存在的文件不会重复下载"""
+        file_path = os.path.join(save_path, filename)
+        if os.path.exists(file_path):
+            with self._lock:
+                self._stats['skipped'] += 1
+            return False
+        with self._lock:
+            if image_url in self._pending:
+                self._stats['deduplicated'] += 1
+                return False
+            self._pending.add(image_url)
+        self.start()
+        try:
+            self._queue.put_nowait((image_url, file_path, movie_code, headers or {}))
+        except queue.Full:
+            with self._lock:
+                self._pending.discard(image_url)
+                self._stats['rejected'] += 1
+            app_logger.warning(f"图片下载队列已满，记录为失败稍后重试: {image_url}")
+            db_manager.record_failed_image_download(image_url, '图片下载队列已满', movie_code)
+            return False
+        with self._lock:
+            self._stats['enqueued'] += 1
+        return True
+
+    def _work(self):
+        """后台线程：逐个下载队列中的图片"""
+        while True:
+            task = self._queue.get()
+            with self._lock:
+                self._stats['in_flight'] += 1
+            try:
+                self._download(*task)
+            except Exception as e:
+                app_logger.error(f"图片下载线程出错: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(task[0])
+                    self._stats['in_flight'] -= 1
+                self._queue.task_done()
+
+    def _download(self, image_url, file_path, movie_code, headers):
+        """下载单张图片，失败按 2、4、8... 秒退避重试，最终失败写入 failed_images"""
+        error = None
+        for attempt in range(self.max_retries):
+            if attempt > 0:
+                with self._lock:
+                    self._stats['retried'] += 1
+                time.sleep(2 ** attempt)
+            try:
+                response = self._session.get(image_url, headers=headers, timeout=self.timeout)
+                response.raise_for_status()
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                # 先写临时文件再改名，避免读到下载到一半的图片
+                temp_path = f"{file_path}.part"
+                with open(temp_path, 'wb') as f:
+                    f.write(response.content)
+                os.replace(temp_path, file_path)
+                if file_path.endswith(COVER_SUFFIX):
+                    # 列表页使用的缩略图和 WebP 版本随封面一起生成
+                    generate_derivatives(file_path)
+                with self._lock:
+                    self._stats['completed'] += 1
+                    self._completed_times.append(time.time())
+                app_logger.info(f"图片已保存: {file_path}")
+                return True
+            except Exception as e:
+                error = e
+                app_logger.warning(f"下载图片失败 {image_url} (尝试{attempt + 1}/{self.max_retries}): {e}")
+
+        with self._lock:
+            self._stats['failed'] += 1
+        db_manager.record_failed_image_download(image_url, str(error), movie_code)
+        return False
+
+    def join(self):
+        """等待队列中的图片全部处理完毕"""
+        self._queue.join()
+
+    def drain(self, timeout=None):
+        """等待队列中的图片处理完毕，最多等待 timeout 秒，返回是否已全部处理"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def finish(self):
+        """爬取结束或进程退出前调用：最多等待 shutdown_timeout 秒，仍在排队的图片写入 failed_images 以便之后补下"""
+        if self._worker_pid != os.getpid():
+            return
+        if self.drain(self.shutdown_timeout):
+            return
+        abandoned = 0
+        while True:
+            try:
+                image_url, _, movie_code, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            db_manager.record_failed_image_download(image_url, '进程退出时尚未下载', movie_code)
+            self._queue.task_done()
+            abandoned += 1
+        if abandoned:
+            app_logger.warning(f"进程退出，{abandoned} 张排队中的图片已记录为失败，稍后可重试")
+
+    def stats(self):
+        """返回队列指标：深度、下载中数量、各类计数和最近一分钟吞吐量（张/秒）"""
+        now = time.time()
+        with self._lock:
+            while self._completed_times and self._completed_times[0] < now - self.THROUGHPUT_WINDOW:
+                self._completed_times.popleft()
+            stats = dict(self._stats)
+            stats['depth'] = self._queue.qsize()
+            stats['throughput'] = round(len(self._completed_times) / self.THROUGHPUT_WINDOW, 3)
+        stats['workers'] = self.workers
+        return stats
+
+
+image_download_config = app_config.get_image_download_config()
+image_download_queue = ImageDownloadQueue(
+    workers=image_download_config['workers'],
+    max_retries=image_download_config['max_retries'],
+    queue_size=image_download_config['queue_size'],
+    timeout=image_download_config['timeout'],
+    shutdown_timeout=image_download_config['shutdown_timeout'],
+)
+# 在数据库连接关闭之前执行（atexit 按注册的相反顺序调用）
+atexit.register(image_download_queue.finish)
@@ -1,60 +1,299 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-图片代理模块
+图片代理模块 - 带磁盘缓存的远程图片代理
+
+缓存目录结构：
+  objects/<sha256 前两位>/<sha256>   图片内容（按内容寻址，相同图片只存一份）
+  urls/<url 哈希前两位>/<url 哈希>.json 每个图片地址对应的内容哈希和 Content-Type
+  locks/<url 哈希>.lock               同一地址并发请求的合并锁（跨 worker 进程有效）
+
+命中缓存时直接从磁盘返回，ETag 为内容哈希，支持 If-None-Match 返回 304；
+缓存总大小超过上限时按最近访问时间淘汰（LRU），同时清理指向已删除内容的索引和空闲的锁文件。
 """
 
-import requests
+import fcntl
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
 from urllib.parse import urlparse
-from flask import Response, jsonify
+
+import requests
+from flask import jsonify, send_file
+
+import app_logger
+from http_session import ProcessLocalSession
+
+# 添加父目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import config as app_config
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET',
+    'Access-Control-Allow-Headers': 'Content-Type'
+}
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ImageProxyCache:
+    """按内容寻址、按总大小 LRU 淘汰的图片磁盘缓存"""
+
+    # 每写入多少次重新扫描一次缓存总大小（其它 worker 也会写入）
+    RESCAN_EVERY = 200
+
+    def __init__(self, root, max_bytes, max_image_bytes, timeout=10):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_image_bytes = max_image_bytes
+        self.timeout = timeout
+        self._size_lock = threading.Lock()
+        self._total_size = None
+        self._writes_since_scan = 0
+        # 所有上游请求共用的连接池（每个 worker 进程各自一个）
+        self.session = ProcessLocalSession(pool_connections=8, pool_maxsize=16)
+
+    def _url_key(self, image_url):
+        return _sha256(image_url.encode('utf-8'))
+
+    def _index_path(self, url_key):
+        return os.path.join(self.root, 'urls', url_key[:2], f'{url_key}.json')
+
+    def object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest)
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def lookup(self, image_url):
+        """返回缓存条目 {'sha256', 'content_type', 'size'}，未缓存或文件已被淘汰时返回 None"""
+        try:
+            with open(self._index_path(self._url_key(image_url)), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        object_path = self.object_path(entry.get('sha256', ''))
+        try:
+            # 用 mtime 记录最近访问时间，供 LRU 淘汰使用
+            os.utime(object_path)
+        except OSError:
+            return None
+        return entry
+
+    def fetch(self, image_url):
+        """获取图片：命中缓存直接返回；否则加锁后只由一个请求访问上游，其余请求等待后读取缓存"""
+        entry = self.lookup(image_url)
+        if entry:
+            return entry
+
+        url_key = self._url_key(image_url)
+        lock_path = os.path.join(self.root, 'locks', f'{url_key}.lock')
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # 等锁期间其它请求可能已经下载完成
+                entry = self.lookup(image_url)
+                if entry:
+                    return entry
+                return self._download(image_url, url_key)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def open_image(self, image_url):
+        """返回 (缓存条目, 已打开的图片文件)；查到条目后文件恰好被淘汰时重新下载一次"""
+        entry = self.fetch(image_url)
+        try:
+            return entry, open(self.object_path(entry['sha256']), 'rb')
+        except FileNotFoundError:
+            # 文件已被删除，lookup 会当作未命中并重新下载
+            entry = self.fetch(image_url)
+            return entry, open(self.object_path(entry['sha256']), 'rb')
+
+    def _download(self, image_url, url_key):
+        """从上游下载图片并写入缓存"""
+        parsed_url = urlparse(image_url)
+        headers = {
+            'User-Agent': USER_AGENT,
+            'Referer': f"{parsed_url.scheme}://{parsed_url.netloc}/",
+            'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+        }
+        response = self.session.get(image_url, headers=headers, timeout=self.timeout, stream=True)
+        try:
+            response.raise_for_status()
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=65536):
+                size += len(chunk)
+                if size > self.max_image_bytes:
+                    raise ValueError(f'图片超过 {self.max_image_bytes // (1024 * 1024)}MB 上限')
+                chunks.append(chunk)
+        finally:
+            response.close()
+
+        data = b''.join(chunks)
+        digest = _sha256(data)
+        object_path = self.object_path(digest)
+        if not os.path.exists(object_path):
+            self._write_atomic(object_path, data)
+            self._add_size(len(data))
+        entry = {
+            'url': image_url,
+            'sha256': digest,
+            'content_type': response.headers.get('Content-Type', 'image/jpeg'),
+            'size': len(data),
+            'fetched_at': time.time(),
+        }
+        self._write_atomic(self._index_path(url_key), json.dumps(entry).encode('utf-8'))
+        return entry
+
+    def _scan_objects(self):
+        """列出缓存中的全部图片文件：[(mtime, size, path)]"""
+        objects = []
+        objects_dir = os.path.join(self.root, 'objects')
+        for dir_path, _, file_names in os.walk(objects_dir):
+            for file_name in file_names:
+                if file_name.endswith('.tmp'):
+                    continue
+                path = os.path.join(dir_path, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                objects.append((stat.st_mtime, stat.st_size, path))
+        return objects
+
+    def _add_size(self, size):
+        with self._size_lock:
+            self._writes_since_scan += 1
+            if self._total_size is None or self._writes_since_scan >= self.RESCAN_EVERY:
+                self._total_size = sum(item[1] for item in self._scan_objects())
+                self._writes_since_scan = 0
+            else:
+                self._total_size += size
+            if self._total_size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """按最近访问时间从旧到新删除，直到总大小降到上限的 90%"""
+        objects = sorted(self._scan_objects())
+        total = sum(item[1] for item in objects)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in objects:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                continue
+        self._total_size = total
+        orphan_indexes = self._prune_indexes()
+        orphan_locks = self._prune_locks()
+        app_logger.info(f"图片缓存淘汰 {removed} 个文件，当前 {total / 1024 / 1024:.1f}MB，"
+                        f"清理 {orphan_indexes} 个失效索引、{orphan_locks} 个锁文件")
+
+    def _prune_indexes(self):
+        """删除内容文件已不存在的 URL 索引"""
+        removed = 0
+        for dir_path, _, file_names in os.walk(os.path.join(self.root, 'urls')):
+            for file_name in file_names:
+                if not file_name.endswith('.json'):
+                    continue
+                path = os.path.join(dir_path, file_name)
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        digest = json.load(f).get('sha256', '')
+                except (OSError, ValueError):
+                    digest = ''
+                if digest and os.path.exists(self.object_path(digest)):
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    continue
+        return removed
+
+    def _prune_locks(self):
+        """删除当前没有请求持有的锁文件（持有中的锁非阻塞加锁失败，保留）"""
+        removed = 0
+        locks_dir = os.path.join(self.root, 'locks')
+        try:
+            file_names = os.listdir(locks_dir)
+        except OSError:
+            return 0
+        for file_name in file_names:
+            path = os.path.join(locks_dir, file_name)
+            try:
+                with open(path, 'a') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+image_proxy_config = app_config.get_image_proxy_config()
+_image_cache_root = image_proxy_config['cache_dir']
+if not os.path.isabs(_image_cache_root):
+    # 相对路径以项目根目录为基准
+    _image_cache_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), _image_cache_root)
+image_cache = ImageProxyCache(
+    _image_cache_root,
+    max_bytes=image_proxy_config['max_cache_mb'] * 1024 * 1024,
+    max_image_bytes=image_proxy_config['max_image_mb'] * 1024 * 1024,
+    timeout=image_proxy_config['timeout'],
+)
+
 
 def proxy_image(image_url):
-    """图片代理函数 - 解决跨域图片显示问题"""
+    """图片代理函数 - 解决跨域图片显示问题，图片缓存在本地磁盘"""
     if not image_url:
         return jsonify({'error': '缺少图片URL参数'}), 400
-    
+
     try:
         # 验证URL格式
         parsed_url = urlparse(image_url)
         if not parsed_url.scheme or not parsed_url.netloc:
             return jsonify({'error': '无效的图片URL'}), 400
-        
-        # 设置请求头，模拟浏览器访问
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Referer': f"{parsed_url.scheme}://{parsed_url.netloc}/",
-            'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Cache-Control': 'no-cache'
-        }
-        
-        # 请求图片
-        response = requests.get(image_url, headers=headers, timeout=10, stream=True)
-        response.raise_for_status()
-        
-        # 获取内容类型
-        content_type = response.headers.get('Content-Type', 'image/jpeg')
-        
-        # 返回图片数据
-        def generate():
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    yield chunk
-        
-        return Response(
-            generate(),
-            content_type=content_type,
-            headers={
-                'Cache-Control': 'public, max-age=3600',  # 缓存1小时
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            }
+
+        # 先打开文件再发送，之后即使被其它请求淘汰也不影响本次响应
+        entry, image_file = image_cache.open_image(image_url)
+
+        # ETag 为内容哈希，浏览器带 If-None-Match 时返回 304
+        response = send_file(
+            image_file,
+            mimetype=entry['content_type'],
+            etag=entry['sha256'],
+            max_age=image_proxy_config['max_age'],
         )
-        
+        if response.status_code == 200:
+            # 传入文件对象时 send_file 不设置 Content-Length
+            response.content_length = os.fstat(image_file.fileno()).st_size
+        response.cache_control.public = True
+        response.headers.update(CORS_HEADERS)
+        return response
+
     except requests.exceptions.RequestException as e:
-        print(f"图片代理请求失败: {e}")
+        app_logger.error(f"图片代理请求失败: {e}")
         return jsonify({'error': f'图片加载失败: {str(e)}'}), 500
     except Exception as e:
-        print(f"图片代理出错: {e}")
-        return jsonify({'error': f'服务器错误: {str(e)}'}), 500
\ No newline at end of file
+        app_logger.error(f"图片代理出错: {e}")
+        return jsonify({'error': f'服务器错误: {str(e)}'}), 500
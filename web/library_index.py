@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地影片库索引模块 - /data/<演员>/<编号> 目录的进程内存索引
+
+启动时扫描一次影片库根目录，之后由后台线程定期增量重扫：
+只有修改时间(mtime)发生变化的演员目录才会重新列出子目录，
+避免在 NFS 上对每部影片都做一次 stat。
+"""
+
+import os
+import sys
+import threading
+import time
+
+import app_logger
+from movie_code import normalize_movie_code
+
+# 添加父目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import config as app_config
+
+
+class LibraryIndex:
+    """本地影片库目录索引"""
+
+    def __init__(self, root, rescan_interval=300):
+        self.root = root
+        self.rescan_interval = rescan_interval
+        # 演员目录名 -> (mtime, 编号目录名集合)
+        self._folders = {}
+        # 标准化编号集合，列表页批量判断和详情页单个判断共用
+        self._codes = frozenset()
+        self._scan_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._watcher_pid = None
+        self._last_scan_time = None
+
+    def start(self):
+        """首次扫描并启动后台重扫线程（fork 后的子进程会自动重新启动线程）"""
+        if self._watcher_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            if self._last_scan_time is None:
+                self.rescan()
+            watcher = threading.Thread(target=self._watch, daemon=True)
+            watcher.start()
+            self._watcher_pid = os.getpid()
+            app_logger.info(f"本地影片库索引已启动: {self.root}，共 {len(self._codes)} 部影片")
+
+    def _watch(self):
+        """后台线程：定期增量重扫"""
+        while True:
+            time.sleep(self.rescan_interval)
+            try:
+                self.rescan()
+            except Exception as e:
+                app_logger.error(f"重扫本地影片库失败: {e}")
+
+    def rescan(self):
+        """增量重扫影片库：只重新列出 mtime 变化过的演员目录"""
+        with self._scan_lock:
+            folders = {}
+            try:
+                entries = list(os.scandir(self.root))
+            except FileNotFoundError:
+                entries = []
+
+            for entry in entries:
+                try:
+                    if not entry.is_dir():
+                        continue
+                    mtime = entry.stat().st_mtime
+                    cached = self._folders.get(entry.name)
+                    if cached and cached[0] == mtime:
+                        folders[entry.name] = cached
+                        continue
+                    codes = frozenset(child.name for child in os.scandir(entry.path) if child.is_dir())
+                    folders[entry.name] = (mtime, codes)
+                except OSError as e:
+                    app_logger.warning(f"读取影片目录失败 {entry.path}: {e}")
+
+            # 整体替换，读取方无需加锁
+            self._codes = frozenset(
+                normalize_movie_code(code) for _, codes in folders.values() for code in codes
+            )
+            self._folders = folders
+            self._last_scan_time = time.time()
+
+    def has_code(self, code):
+        """判断电影编号是否在本地影片库中存在（不区分所在演员目录）"""
+        self.start()
+        return bool(code) and normalize_movie_code(code) in self._codes
+
+    def all_codes(self):
+        """返回本地影片库全部标准化编号"""
+        self.start()
+        return self._codes
+
+    def existing_codes(self, codes):
+        """批量判断哪些电影编号在本地影片库中存在，返回存在的编号集合"""
+        return {code for code in codes if self.has_code(code)}
+
+
+library_config = app_config.get_library_config()
+library_index = LibraryIndex(library_config['root'], library_config['rescan_interval'])
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发压测脚本 - 对比 gunicorn worker 模型切换前后的并发吞吐量
+
+按固定并发数持续请求若干路径，报告每个路径的请求数/秒、延迟 p50/p95/p99 和错误数。
+典型用法是混合一个慢速上游接口（图片代理、搜索）和普通页面：
+sync worker 下慢请求会占满 worker，普通页面的延迟随之升高；gthread 下只占用单个线程。
+
+使用方法：
+python load_test.py --username admin --password xxx --path /movies --path "/proxy-image?url=..." --json sync.json
+GUNICORN_WORKER_CLASS=sync 与默认 gthread 各跑一次后：
+python load_test.py --compare sync.json gthread.json
+"""
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from percentiles import percentile
+
+DEFAULT_PATHS = ['/movies', '/actresses', '/static/js/video.min.js']
+
+
+def login(base_url, username, password):
+    """登录并返回会话 Cookie"""
+    response = requests.post(f"{base_url}/api/login", json={'username': username, 'password': password}, timeout=10)
+    response.raise_for_status()
+    result = response.json()
+    if not result.get('success'):
+        raise RuntimeError(f"登录失败: {result.get('error')}")
+    return response.cookies.get_dict()
+
+
+def run_load(base_url, paths, concurrency, duration, cookies=None, timeout=60):
+    """concurrency 个线程在 duration 秒内轮流请求 paths，返回每个路径的 [(耗时, 是否成功)]"""
+    samples = {path: [] for path in paths}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        session = requests.Session()
+        session.cookies.update(cookies or {})
+        # 不同线程从不同路径开始，保证各路径的请求交错进行
+        position = index
+        while time.monotonic() < deadline:
+            path = paths[position % len(paths)]
+            position += 1
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + path, timeout=timeout)
+                response.content
+                ok = response.status_code < 400
+            except requests.exceptions.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[path].append((elapsed, ok))
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    return samples, time.monotonic() - start
+
+
+def summarize(samples, wall_time):
+    """汇总每个路径和全部请求的指标"""
+    results = {}
+    all_samples = []
+    for path, path_samples in samples.items():
+        all_samples.extend(path_samples)
+        results[path] = _summarize_samples(path_samples, wall_time)
+    results['_total'] = _summarize_samples(all_samples, wall_time)
+    return results
+
+
+def _summarize_samples(path_samples, wall_time):
+    timings = sorted(elapsed for elapsed, _ in path_samples)
+    return {
+        'requests': len(path_samples),
+        'errors': sum(1 for _, ok in path_samples if not ok),
+        'req_per_sec': round(len(path_samples) / wall_time, 1) if wall_time else 0.0,
+        'p50_ms': round(percentile(timings, 50) * 1000, 1),
+        'p95_ms': round(percentile(timings, 95) * 1000, 1),
+        'p99_ms': round(percentile(timings, 99) * 1000, 1),
+    }
+
+
+def print_results(results):
+    print(f"{'路径':<50}{'请求数':>8}{'错误':>6}{'请求/秒':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for path, result in results.items():
+        print(f"{path[:50]:<52}{result['requests']:>8}{result['errors']:>6}{result['req_per_sec']:>10}"
+              f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}")
+
+
+def compare(before_path, after_path):
+    """对比两次压测结果：请求/秒 和 p95 的变化倍数"""
+    with open(before_path, 'r', encoding='utf-8') as f:
+        before = json.load(f)['results']
+    with open(after_path, 'r', encoding='utf-8') as f:
+        after = json.load(f)['results']
+    print(f"{'路径':<50}{'请求/秒 前→后':>22}{'p95(ms) 前→后':>24}")
+    for path in before:
+        if path not in after:
+            continue
+        b, a = before[path], after[path]
+        ratio = f"x{a['req_per_sec'] / b['req_per_sec']:.1f}" if b['req_per_sec'] else '-'
+        print(f"{path[:50]:<52}{b['req_per_sec']:>8} → {a['req_per_sec']:<8}{ratio:>6}"
+              f"{b['p95_ms']:>10} → {a['p95_ms']:<10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Web 应用并发压测")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000", help="应用地址")
+    parser.add_argument("--path", action="append", dest="paths", help="压测路径，可重复指定")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发请求数")
+    parser.add_argument("--duration", type=int, default=30, help="持续秒数")
+    parser.add_argument("--timeout", type=int, default=60, help="单个请求超时秒数")
+    parser.add_argument("--username", help="登录用户名（压测需要登录的页面时使用）")
+    parser.add_argument("--password", help="登录密码")
+    parser.add_argument("--json", dest="json_path", help="把结果写入 JSON 文件，便于前后对比")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="对比两次压测的 JSON 结果")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    base_url = args.base_url.rstrip('/')
+    paths = args.paths or DEFAULT_PATHS
+    cookies = login(base_url, args.username, args.password) if args.username else None
+
+    print(f"压测 {base_url}: 并发 {args.concurrency}，持续 {args.duration} 秒，{len(paths)} 个路径")
+    samples, wall_time = run_load(base_url, paths, args.concurrency, args.duration, cookies, args.timeout)
+    results = summarize(samples, wall_time)
+    print_results(results)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'base_url': base_url, 'concurrency': args.concurrency, 'duration': args.duration,
+                       'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已写入 {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+电影编号工具模块 - 编号提取与标准化
+"""
+
+import re
+
+# 匹配形如 SSIS-123、SSIS123、FC2-PPV-1234567、259LUXU-1234（数字前缀）、010120-001（无码纯数字）的电影编号，
+# 编号必须从一个词的开头开始
+MOVIE_CODE_PATTERN = re.compile(
+    r'(?<![A-Za-z0-9])(?:\d{6}[-_]\d{2,3}(?!\d)|\d*[A-Za-z][A-Za-z0-9]*(?:[-_][A-Za-z0-9]+)*?[-_]?\d+)'
+)
+# 标题中常见的格式/画质标记，形式上像编号但不是编号（MP4、H264、X265、1080P60、1920X1080 等）
+_NON_CODE_PATTERN = re.compile(r'MP[34]|MKV\d*|H26[45]|X26[45]|AC3|AAC\d*|DTS\d*|\d{3,4}[PK]\d*|\d+X\d+|\d+FPS\d*')
+# 标准化时需要去掉的分隔符
+_CODE_SEPARATOR_PATTERN = re.compile(r'[-_\s]')
+
+
+def normalize_movie_code(code):
+    """标准化电影编号：转大写并去掉连字符/下划线，如 ssis-123 -> SSIS123"""
+    if not code:
+        return ''
+    return _CODE_SEPARATOR_PATTERN.sub('', str(code)).upper()
+
+
+def extract_movie_code(title):
+    """从标题中提取电影编号（色花堂帖子标题一般以编号开头）"""
+    if not title:
+        return ''
+    for match in MOVIE_CODE_PATTERN.finditer(title):
+        if not _NON_CODE_PATTERN.fullmatch(normalize_movie_code(match.group(0))):
+            return match.group(0)
+    return ''
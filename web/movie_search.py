@@ -86,6 +86,16 @@ def process_movie_search_results(movies, jellyfin_checker):
     """处理电影搜索结果"""
     processed_movies = []
     
+    # 批量从Jellyfin本地影片库镜像查询，镜像不可用时再逐个调用搜索接口
+    jellyfin_matches = None
+    if jellyfin_checker:
+        try:
+            jellyfin_matches = jellyfin_checker.find_many(
+                [movie.get('movie_code') for movie in movies if movie.get('movie_code')]
+            )
+        except Exception as e:
+            print(f"Jellyfin影片库镜像不可用，改为逐个查询: {e}")
+    
     for movie in movies:
         movie_code = movie.get('movie_code', '')
         title = movie.get('title', '')
@@ -103,7 +113,10 @@ def process_movie_search_results(movies, jellyfin_checker):
         jellyfin_exists = False
         jellyfin_details = None
         
-        if movie_code and jellyfin_checker:
+        if movie_code and jellyfin_matches is not None:
+            jellyfin_details = jellyfin_matches.get(movie_code) or None
+            jellyfin_exists = bool(jellyfin_details)
+        elif movie_code and jellyfin_checker:
             try:
                 # 先用movie_code搜索
                 jellyfin_result = jellyfin_checker.check_movie_exists(movie_code)
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+百分位数工具 - 基准测试和压测脚本共用
+"""
+
+
+def percentile(sorted_values, percent):
+    """最近秩法求百分位数，sorted_values 需已升序排列，为空时返回 0.0"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
@@ -15,7 +15,9 @@ import os
 import sys
 from datetime import datetime, timedelta
 import multiprocessing
-from flask import send_file
+from flask import send_file, make_response
+from static_version import version_manager
+from file_offload import file_offload
 
 def register_routes(app, jellyfin_checker, crawler):
     """注册所有路由"""
@@ -691,6 +693,7 @@ def register_routes(app, jellyfin_checker, crawler):
         is_single_param = request.args.get('is_single', None)
         is_subtitle_param = request.args.get('is_subtitle', None)
         is_sehuatang_magnet_param = request.args.get('is_sehuatang_magnet', None)
+        cursor = request.args.get('cursor') or None
         per_page = 20
         
         # 处理筛选参数
@@ -716,7 +719,8 @@ def register_routes(app, jellyfin_checker, crawler):
         actress = db_manager.actresses_data_collection.find_one({'code': code})
         # 获取该演员的所有影片(分页)，支持搜索和筛选
         movies, total = db_manager.get_actress_movies(
-            actress['name'], page, per_page, search_keyword, is_single, is_subtitle, is_sehuatang_magnet
+            actress['name'], page, per_page, search_keyword, is_single, is_subtitle, is_sehuatang_magnet,
+            cursor=cursor
         )
         if not movies:
             movies = []
@@ -727,6 +731,7 @@ def register_routes(app, jellyfin_checker, crawler):
                              page=page,
                              per_page=per_page,
                              total=total,
+                             cursors=db_manager.make_page_cursors(movies),
                              search_keyword=search_keyword,
                              is_single_filter=is_single_param,
                              is_subtitle_filter=is_subtitle_param,
@@ -945,6 +950,23 @@ def register_routes(app, jellyfin_checker, crawler):
                 'error': f'启动失败: {str(e)}'
             })
 
+    @app.route('/api/image-download-queue/status', methods=['GET'])
+    @api_login_required
+    def image_download_queue_status():
+        """获取封面图片下载队列指标API"""
+        try:
+            from image_download_queue import image_download_queue
+            return jsonify({
+                'success': True,
+                'stats': image_download_queue.stats()
+            })
+        except Exception as e:
+            app_logger.error(f"获取图片下载队列状态错误: {e}")
+            return jsonify({
+                'success': False,
+                'error': f'获取失败: {str(e)}'
+            })
+
     @app.route('/api/backup-images', methods=['POST'])
     @api_login_required
     def backup_images():
@@ -1103,6 +1125,7 @@ def register_routes(app, jellyfin_checker, crawler):
         try:
             # 获取查询参数
             page = int(request.args.get('page', 1))
+            cursor = request.args.get('cursor') or None
             per_page = 20
             search_keyword = request.args.get('search', '').strip()
             is_single_filter = request.args.get('is_single', '')
@@ -1128,7 +1151,8 @@ def register_routes(app, jellyfin_checker, crawler):
                 per_page=per_page,
                 search_keyword=search_keyword if search_keyword else None,
                 is_single=is_single,
-                is_subtitle=is_subtitle
+                is_subtitle=is_subtitle,
+                cursor=cursor
             )
             
             if movies is None:
@@ -1140,6 +1164,7 @@ def register_routes(app, jellyfin_checker, crawler):
                                 page=page,
                                 per_page=per_page,
                                 total=total,
+                                cursors=db_manager.make_page_cursors(movies),
                                 series_name=series_name,
                                 search_keyword=search_keyword,
                                 is_single_filter=is_single_filter,
@@ -1156,6 +1181,7 @@ def register_routes(app, jellyfin_checker, crawler):
         try:
             # 获取查询参数
             page = int(request.args.get('page', 1))
+            cursor = request.args.get('cursor') or None
             per_page = 20
             search_keyword = request.args.get('search', '').strip()
             is_single_filter = request.args.get('is_single', '')
@@ -1190,7 +1216,8 @@ def register_routes(app, jellyfin_checker, crawler):
                 is_single=is_single,
                 is_subtitle=is_subtitle,
                 is_sehuatang_magnet=is_sehuatang_magnet,
-                sort_by=sort_by
+                sort_by=sort_by,
+                cursor=cursor
             )
             
             if movies is None:
@@ -1202,6 +1229,7 @@ def register_routes(app, jellyfin_checker, crawler):
                                 page=page,
                                 per_page=per_page,
                                 total=total,
+                                cursors=db_manager.make_page_cursors(movies, sort_by),
                                 search_keyword=search_keyword,
                                 is_single_filter=is_single_filter,
                                 is_subtitle_filter=is_subtitle_filter,
@@ -1219,6 +1247,7 @@ def register_routes(app, jellyfin_checker, crawler):
         try:
             # 获取查询参数
             page = int(request.args.get('page', 1))
+            cursor = request.args.get('cursor') or None
             per_page = 20
             search_keyword = request.args.get('search', '').strip()
             is_single_filter = request.args.get('is_single', '')
@@ -1244,7 +1273,8 @@ def register_routes(app, jellyfin_checker, crawler):
                 per_page=per_page,
                 search_keyword=search_keyword if search_keyword else None,
                 is_single=is_single,
-                is_subtitle=is_subtitle
+                is_subtitle=is_subtitle,
+                cursor=cursor
             )
             
             if movies is None:
@@ -1256,6 +1286,7 @@ def register_routes(app, jellyfin_checker, crawler):
                                 page=page,
                                 per_page=per_page,
                                 total=total,
+                                cursors=db_manager.make_page_cursors(movies),
                                 studio_name=studio_name,
                                 search_keyword=search_keyword,
                                 is_single_filter=is_single_filter,
@@ -1287,6 +1318,7 @@ def register_routes(app, jellyfin_checker, crawler):
         try:
             # 获取查询参数
             page = int(request.args.get('page', 1))
+            cursor = request.args.get('cursor') or None
             per_page = 20
             genre_names = request.args.getlist('genres')  # 支持多个分类
             print(genre_names)
@@ -1324,7 +1356,8 @@ def register_routes(app, jellyfin_checker, crawler):
                 is_single=is_single,
                 is_subtitle=is_subtitle,
                 is_sehuatang_magnet=is_sehuatang_magnet,
-                sort_by=sort_by
+                sort_by=sort_by,
+                cursor=cursor
             )
             
             if movies is None:
@@ -1348,6 +1381,7 @@ def register_routes(app, jellyfin_checker, crawler):
             return render_template('genres_search_results.html',
                                 movies=movies,
                                 pagination=pagination,
+                                cursors=db_manager.make_page_cursors(movies, sort_by),
                                 genre_names=genre_names,
                                 search_keyword=search_keyword,
                                 is_single_filter=is_single_filter,
@@ -2712,10 +2746,25 @@ def register_routes(app, jellyfin_checker, crawler):
             })
     
     # 自定义静态文件处理，添加缓存头
-    @app.route('/static/<path:filename>')
     def static_files(filename):
-        """自定义静态文件处理，添加缓存控制头"""
-        response = make_response(send_from_directory(app.static_folder, filename))
+        """自定义静态文件处理：按清单返回预压缩版本，ETag 为构建时的内容哈希，添加缓存控制头；
+        封面、头像、JS/CSS 的字节传输按配置交给 sendfile 或前端代理"""
+        entry = version_manager.get_entry(filename)
+        if entry and not file_offload.proxy_handles_encoding:
+            encoding, suffix = version_manager.select_encoding(entry, request.accept_encodings)
+            # 不同编码是不同的表示，ETag 需要区分
+            etag = f"{entry['hash']}-{encoding}" if encoding else entry['hash']
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+            else:
+                response = file_offload.send(app.static_folder, filename + suffix, mimetype=entry['content_type'],
+                                             etag=etag, content_encoding=encoding)
+            response.vary.add('Accept-Encoding')
+        else:
+            # 不在清单中的文件（如封面、演员头像）按修改时间和大小生成 ETag；
+            # 文件实际由 FILE_OFFLOAD_MODE 指定的方式发送
+            response = file_offload.send(app.static_folder, filename)
         
         # 根据文件类型设置不同的缓存策略
         if filename.endswith(('.css', '.js')):
@@ -2735,11 +2784,11 @@ def register_routes(app, jellyfin_checker, crawler):
             response.headers['Cache-Control'] = 'public, max-age=86400'
             response.headers['Expires'] = (datetime.now() + timedelta(days=1)).strftime('%a, %d %b %Y %H:%M:%S GMT')
         
-        # 添加ETag支持
-        response.headers['ETag'] = f'"{hash(filename + str(os.path.getmtime(os.path.join(app.static_folder, filename))))}"'
-        print(f"ETag: {response.headers['ETag']}")
         return response
 
+    # Flask 创建应用时已注册同路径的 static 端点，直接替换其视图函数，url_for('static') 保持不变
+    app.view_functions['static'] = static_files
+
     @app.route('/player')
     @login_required
     def player():
@@ -2762,71 +2811,13 @@ def register_routes(app, jellyfin_checker, crawler):
     def sync_jellfin():
         """同步Jellfin数据API"""
         try:
+            # full=true 时忽略高水位标记，全量同步
+            data = request.get_json(silent=True) or {}
+            full = str(data.get('full', request.args.get('full', ''))).lower() == 'true'
+            
             # 在后台线程中执行同步操作
             def run_sync():
-                try:
-                    app_logger.info("开始同步Jellyfin数据")
-                    
-                    import sqlite3
-                    import re
-                    
-                    # 连接Jellyfin SQLite数据库
-                    jellyfin_db_path = '/server/backup_sehuatang/JellfinData/library.db'
-                    conn = sqlite3.connect(jellyfin_db_path)
-                    cursor = conn.cursor()
-                    
-                    # 查询所有电影记录
-                    cursor.execute("SELECT * FROM TypedBaseItems WHERE type = 'MediaBrowser.Controller.Entities.Movies.Movie' AND TopParentId = '5824037d54700c4dcff7f1255022573b'")
-                    movies = cursor.fetchall()
-                    
-                    # 获取列名
-                    column_names = [description[0] for description in cursor.description]
-                    name_index = column_names.index('Name')
-                    presentation_key_index = column_names.index('PresentationUniqueKey')
-                    
-                    total_movies = len(movies)
-                    updated_count = 0
-                    
-                    app_logger.info(f"从Jellyfin数据库中找到 {total_movies} 部电影")
-                    
-                    # 遍历所有电影记录
-                    for movie in movies:
-                        try:
-                            movie_name = movie[name_index]
-                            presentation_key = movie[presentation_key_index]
-                            
-                            # 从PresentationUniqueKey中提取电影编码
-                            # 例如："BF-519-完全主観 ボクのお义姉さんは波多野结衣" -> "BF-519"
-                            # 修改为截取第二个"-"前面的字符串
-                            parts = movie_name.split('-')
-                            if len(parts) >= 2:
-                                movie_code = parts[0] + '-' + parts[1]
-                                
-                                # 更新MongoDB中的记录
-                                result = db_manager.javbus_data_collection.update_one(
-                                    {'code': movie_code},
-                                    {'$set': {'presentation_key': presentation_key}}
-                                )
-                                
-                                if result.modified_count > 0:
-                                    updated_count += 1
-                                    app_logger.info(f"已更新电影 {movie_code}: {movie_name}")
-                                elif result.matched_count > 0:
-                                    app_logger.info(f"电影 {movie_code} 已存在，无需更新")
-                                else:
-                                    app_logger.info(f"未找到电影 {movie_code} 的记录")
-                            else:
-                                app_logger.warning(f"无法从 '{presentation_key}' 中提取电影编码")
-                        except Exception as e:
-                            app_logger.error(f"处理电影记录时出错: {e}")
-                    
-                    # 关闭数据库连接
-                    conn.close()
-                    
-                    app_logger.info(f"Jellyfin同步完成，共更新 {updated_count}/{total_movies} 部电影")
-                    
-                except Exception as e:
-                    app_logger.error(f"Jellyfin同步过程中出错: {e}")
+                db_manager.sync_jellyfin_library(full=full)
             
             # 启动后台线程
             import threading
@@ -2836,7 +2827,7 @@ def register_routes(app, jellyfin_checker, crawler):
             
             return jsonify({
                 'success': True,
-                'message': 'Jellyfin同步任务已开始执行，请查看控制台日志了解进度'
+                'message': 'Jellyfin同步任务已开始执行，可通过 /api/sync-jellfin/status 查看进度'
             })
             
         except Exception as e:
@@ -2844,4 +2835,22 @@ def register_routes(app, jellyfin_checker, crawler):
             return jsonify({
                 'success': False,
                 'error': f'启动失败: {str(e)}'
+            })
+    
+    @app.route('/api/sync-jellfin/status', methods=['GET'])
+    @api_login_required
+    def sync_jellfin_status():
+        """获取Jellfin同步进度API"""
+        try:
+            state = db_manager.get_sync_state('jellyfin') or {}
+            state.pop('_id', None)
+            return jsonify({
+                'success': True,
+                'state': state
+            })
+        except Exception as e:
+            app_logger.error(f"获取Jellyfin同步状态错误: {e}")
+            return jsonify({
+                'success': False,
+                'error': f'获取失败: {str(e)}'
             })
\ No newline at end of file
@@ -1,56 +1,174 @@
-import os
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态资源版本清单 - 部署时构建一次，运行时只查内存中的清单
+
+构建时（python static_version.py）遍历 static 目录：
+  - 计算每个文件的内容哈希，写入 static/versions.json
+  - 为 css/js/svg 等文本资源生成预压缩的 .gz 和 .br 文件（未安装 brotli 时只生成 .gz）
+
+运行时：
+  - versioned_url / url_for('static') 从清单取哈希作为 ?v= 参数，不再读文件计算哈希
+  - 静态文件路由按 Accept-Encoding 返回预压缩版本，ETag 为清单中的哈希，支持 304
+文件在构建后被修改（大小或修改时间与清单不一致）时忽略该条目，按普通静态文件返回。
+"""
+
+import gzip
 import hashlib
 import json
+import mimetypes
+import os
+import sys
 from datetime import datetime
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 不进入清单的目录：封面等运行时下载的图片数量大且随时变化
+SKIP_DIRS = {'images', '__pycache__'}
+# 值得预压缩的资源类型
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# 太小的文件压缩收益不明显
+MIN_COMPRESS_SIZE = 1024
+# (Content-Encoding, 预压缩文件后缀)，按优先级排列
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def guess_type(filename):
+    """猜测文件类型，js/hls.js@latest 这类带版本后缀的文件名按 @ 之前的部分判断"""
+    content_type = mimetypes.guess_type(filename.split('@')[0])[0]
+    return content_type or 'application/octet-stream'
+
+
 class StaticVersionManager:
     def __init__(self, static_folder):
         self.static_folder = static_folder
         self.version_file = os.path.join(static_folder, 'versions.json')
         self.versions = self.load_versions()
-    
+
     def load_versions(self):
         """加载版本信息"""
         if os.path.exists(self.version_file):
-            with open(self.version_file, 'r') as f:
-                return json.load(f)
+            try:
+                with open(self.version_file, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"读取静态资源清单失败: {e}")
         return {}
-    
+
     def save_versions(self):
         """保存版本信息"""
-        with open(self.version_file, 'w') as f:
-            json.dump(self.versions, f, indent=2)
-    
+        temp_path = f"{self.version_file}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.versions, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.version_file)
+
     def get_file_hash(self, filepath):
-        """获取文件哈希值"""
+        """获取文件哈希值（仅构建时使用）"""
         with open(filepath, 'rb') as f:
-            return hashlib.md5(f.read()).hexdigest()[:8]
-    
+            return self.content_hash(f.read())
+
+    @staticmethod
+    def content_hash(data):
+        return hashlib.sha256(data).hexdigest()[:16]
+
+    def get_entry(self, filename):
+        """返回文件的清单条目；不在清单中或构建后已被修改时返回 None"""
+        entry = self.versions.get(filename)
+        if not entry:
+            return None
+        try:
+            stat = os.stat(os.path.join(self.static_folder, filename))
+        except OSError:
+            return None
+        if stat.st_size != entry['size'] or int(stat.st_mtime) != entry['mtime']:
+            return None
+        return entry
+
+    def select_encoding(self, entry, accept_encodings):
+        """按客户端的 Accept-Encoding 选择预压缩版本，返回 (Content-Encoding, 文件后缀)，无可用版本时返回 (None, '')"""
+        for encoding, suffix in ENCODINGS:
+            if encoding in entry['encodings'] and accept_encodings[encoding]:
+                return encoding, suffix
+        return None, ''
+
     def get_versioned_url(self, filename):
         """获取带版本号的URL"""
-        filepath = os.path.join(self.static_folder, filename)
-        if os.path.exists(filepath):
-            file_hash = self.get_file_hash(filepath)
-            return f"/static/{filename}?v={file_hash}"
+        entry = self.versions.get(filename)
+        if entry:
+            return f"/static/{filename}?v={entry['hash']}"
         return f"/static/{filename}"
-    
+
+    def _write_compressed(self, filepath, data):
+        """生成 .gz / .br 预压缩文件，返回实际生成的编码列表（压缩后没有变小的不保留）"""
+        compressors = {'gzip': lambda raw: gzip.compress(raw, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressors['br'] = lambda raw: brotli.compress(raw, quality=11)
+        encodings = []
+        for encoding, suffix in ENCODINGS:
+            if encoding not in compressors:
+                continue
+            compressed = compressors[encoding](data)
+            variant_path = filepath + suffix
+            if len(compressed) >= len(data):
+                if os.path.exists(variant_path):
+                    os.remove(variant_path)
+                continue
+            with open(variant_path, 'wb') as f:
+                f.write(compressed)
+            # 与原文件保持相同的修改时间，便于排查是否过期
+            stat = os.stat(filepath)
+            os.utime(variant_path, (stat.st_atime, stat.st_mtime))
+            encodings.append(encoding)
+        return encodings
+
     def update_versions(self):
-        """更新所有文件版本"""
+        """更新所有文件版本并生成预压缩文件"""
+        versions = {}
         for root, dirs, files in os.walk(self.static_folder):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
             for file in files:
-                if file.endswith(('.css', '.js', '.png', '.jpg', '.jpeg', '.gif')):
-                    filepath = os.path.join(root, file)
-                    rel_path = os.path.relpath(filepath, self.static_folder)
-                    self.versions[rel_path] = {
-                        'hash': self.get_file_hash(filepath),
-                        'updated': datetime.now().isoformat()
-                    }
+                if file.endswith(('.gz', '.br', '.tmp')) or file == 'versions.json':
+                    continue
+                filepath = os.path.join(root, file)
+                rel_path = os.path.relpath(filepath, self.static_folder).replace(os.sep, '/')
+                with open(filepath, 'rb') as f:
+                    data = f.read()
+                content_type = guess_type(rel_path)
+                encodings = []
+                if content_type.startswith(COMPRESSIBLE_TYPES) and len(data) >= MIN_COMPRESS_SIZE:
+                    encodings = self._write_compressed(filepath, data)
+                stat = os.stat(filepath)
+                versions[rel_path] = {
+                    'hash': self.content_hash(data),
+                    'size': stat.st_size,
+                    'mtime': int(stat.st_mtime),
+                    'content_type': content_type,
+                    'encodings': encodings,
+                    'updated': datetime.now().isoformat()
+                }
+        self.versions = versions
         self.save_versions()
+        return versions
+
+
+version_manager = StaticVersionManager(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
 
-# 在app.py中使用
-version_manager = StaticVersionManager(app.static_folder)
 
-# 添加模板函数
-@app.template_global()
 def versioned_url(filename):
-    return version_manager.get_versioned_url(filename)
\ No newline at end of file
+    """模板函数：返回带内容哈希的静态文件 URL"""
+    return version_manager.get_versioned_url(filename)
+
+
+def main():
+    versions = version_manager.update_versions()
+    compressed = sum(1 for entry in versions.values() if entry['encodings'])
+    print(f"✅ 静态资源清单已写入 {version_manager.version_file}: {len(versions)} 个文件，{compressed} 个已预压缩")
+    if brotli is None:
+        print("⚠️ 未安装 brotli，只生成了 .gz 文件")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
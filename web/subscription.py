@@ -77,6 +77,15 @@ def check_subscribed_series(jellyfin_checker, jav_crawler):
                 new_movies_count = 0
                 found_movies_count = 0
                 
+                # 批量检查Jellyfin中是否存在（本地影片库镜像）
+                try:
+                    jellyfin_existing = jellyfin_checker.check_many(
+                        [movie.get('movie_code') for movie in movies if movie.get('movie_code')]
+                    )
+                except Exception as e:
+                    print(f"Jellyfin影片库镜像不可用，改为逐个查询: {e}")
+                    jellyfin_existing = None
+                
                 for movie in movies:
                     title = movie.get('title', '')
                     movie_code = movie.get('movie_code', '')
@@ -88,7 +97,10 @@ def check_subscribed_series(jellyfin_checker, jav_crawler):
                         print(f"电影 {title} 电影编码是：({movie_code})")
                     
                     # 检查Jellyfin中是否存在
-                    jellyfin_exists = jellyfin_checker.check_movie_exists(movie_code)['exists']
+                    if jellyfin_existing is not None:
+                        jellyfin_exists = jellyfin_existing.get(movie_code, False)
+                    else:
+                        jellyfin_exists = jellyfin_checker.check_movie_exists(movie_code)['exists']
                     
                     if not jellyfin_exists:
                         found_movies_count += 1
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""测试配置：把 web 和 web/crawler 目录加入导入路径，与应用运行时一致"""
+
+import os
+import sys
+
+WEB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(WEB_DIR, 'crawler'))
+sys.path.insert(0, WEB_DIR)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""sendfile 模式下的 Range / If-Range 处理测试"""
+
+import os
+
+import pytest
+
+flask = pytest.importorskip('flask')
+from werkzeug.http import http_date
+
+from file_offload import FileOffload
+
+CONTENT = b'0123456789abcdefghij'
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / 'app.js').write_bytes(CONTENT)
+    return str(tmp_path)
+
+
+@pytest.fixture
+def send(static_dir):
+    app = flask.Flask(__name__)
+    offload = FileOffload(mode='sendfile')
+
+    def _send(headers):
+        with app.test_request_context('/static/app.js', headers=headers):
+            response = offload.send(static_dir, 'app.js', etag='v1')
+            response.direct_passthrough = False
+            return response.status_code, response.get_data()
+    return _send
+
+
+def test_full_file_without_range(send):
+    assert send({}) == (200, CONTENT)
+
+
+def test_plain_range(send):
+    assert send({'Range': 'bytes=2-5'}) == (206, CONTENT[2:6])
+
+
+def test_if_range_matching_etag(send):
+    assert send({'Range': 'bytes=2-5', 'If-Range': '"v1"'}) == (206, CONTENT[2:6])
+
+
+def test_if_range_stale_etag_returns_full_file(send):
+    assert send({'Range': 'bytes=2-5', 'If-Range': '"v0"'}) == (200, CONTENT)
+
+
+def test_if_range_date(send, static_dir):
+    mtime = int(os.stat(os.path.join(static_dir, 'app.js')).st_mtime)
+    assert send({'Range': 'bytes=2-5', 'If-Range': http_date(mtime)}) == (206, CONTENT[2:6])
+    assert send({'Range': 'bytes=2-5', 'If-Range': http_date(mtime - 60)}) == (200, CONTENT)
+
+
+def test_unsatisfiable_range(send):
+    assert send({'Range': 'bytes=100-200'})[0] == 416
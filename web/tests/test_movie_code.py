@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""电影编号提取与标准化测试"""
+
+import pytest
+
+from movie_code import extract_movie_code, normalize_movie_code
+
+
+@pytest.mark.parametrize('title, expected', [
+    ('SSIS-123 标题', 'SSIS-123'),
+    ('ssis123', 'ssis123'),
+    ('FC2-PPV-1234567 标题', 'FC2-PPV-1234567'),
+    # 格式/画质标记不是编号
+    ('MP4 SSIS-123', 'SSIS-123'),
+    ('[FHD] 1080P IPX-001', 'IPX-001'),
+    ('1920x1080 h264 ABP-123', 'ABP-123'),
+    # 数字前缀编号保留前缀
+    ('259LUXU-1234 标题', '259LUXU-1234'),
+    # 无码纯数字编号
+    ('010120-001 carib', '010120-001'),
+    ('010120_01 10musume', '010120_01'),
+    ('没有编号', ''),
+    ('', ''),
+])
+def test_extract_movie_code(title, expected):
+    assert extract_movie_code(title) == expected
+
+
+def test_normalize_movie_code():
+    assert normalize_movie_code('ssis-123') == 'SSIS123'
+    assert normalize_movie_code('259luxu_1234') == '259LUXU1234'
+    assert normalize_movie_code(None) == ''
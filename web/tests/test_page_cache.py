@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""爬虫页面缓存测试"""
+
+import json
+import os
+
+from page_cache import PageCache
+
+DETAIL_URL = 'https://www.javbus.com/ABC-123'
+LIST_URL = 'https://www.javbus.com/page/2'
+MAGNET_URL = 'https://www.javbus.com/ajax/uncledatoolsbyajax.php?gid=1'
+
+
+def make_cache(root):
+    return PageCache(str(root), {'detail': 3600, 'list': 60, 'magnet': 0, 'other': 0})
+
+
+def age_entry(cache, url, seconds):
+    path = cache._index_path(url)
+    with open(path, 'r', encoding='utf-8') as f:
+        entry = json.load(f)
+    entry['fetched_at'] -= seconds
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+
+
+def count_files(root, kind):
+    return sum(len(files) for _, _, files in os.walk(os.path.join(root, kind)))
+
+
+def test_magnet_pages_are_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put(MAGNET_URL, '<tr>magnet</tr>')
+    assert cache.get(MAGNET_URL) is None
+    assert count_files(tmp_path, 'urls') == 0
+
+
+def test_prune_removes_expired_entries_and_orphan_objects(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put(DETAIL_URL, 'detail page')
+    cache.put(LIST_URL, 'list page')
+    age_entry(cache, LIST_URL, 120)
+
+    assert cache.prune(dry_run=True) == (1, 1)
+    assert count_files(tmp_path, 'urls') == 2
+
+    assert cache.prune() == (1, 1)
+    assert cache.get(DETAIL_URL) == 'detail page'
+    assert cache.lookup(LIST_URL) == (None, {})
+    assert count_files(tmp_path, 'objects') == 1
+
+
+def test_prune_keeps_objects_shared_by_live_entries(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put(DETAIL_URL, 'same content')
+    cache.put(LIST_URL, 'same content')
+    age_entry(cache, LIST_URL, 120)
+
+    assert cache.prune() == (1, 0)
+    assert cache.get(DETAIL_URL) == 'same content'
+
+
+def test_prune_if_due_respects_interval(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.prune_interval = 3600
+    cache.put(LIST_URL, 'list page')
+    age_entry(cache, LIST_URL, 120)
+
+    cache.prune_if_due()
+    assert count_files(tmp_path, 'urls') == 0
+    assert os.path.exists(os.path.join(tmp_path, 'last_prune'))
+
+    cache.put(LIST_URL, 'list page')
+    age_entry(cache, LIST_URL, 120)
+    cache.prune_if_due()
+    assert count_files(tmp_path, 'urls') == 1
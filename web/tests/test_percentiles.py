@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""百分位数工具测试"""
+
+import pytest
+
+from percentiles import percentile
+
+
+def test_empty_values():
+    assert percentile([], 99) == 0.0
+
+
+@pytest.mark.parametrize('percent, expected', [
+    (0, 1),
+    (50, 5),
+    (90, 9),
+    (99, 10),
+    (100, 10),
+])
+def test_nearest_rank(percent, expected):
+    assert percentile(list(range(1, 11)), percent) == expected
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全文搜索分词模块 - 为影片生成 search_text 字段并构建 $text 查询
+
+MongoDB 文本索引按空白和标点切词，无法切分中文/日文标题，
+因此写入时先做分词：英文数字按单词保留，CJK 连续文字切成单字和二元组(bigram)，
+查询时用同样的规则切词，每个词加引号要求全部命中。
+"""
+
+import re
+
+from movie_code import MOVIE_CODE_PATTERN, normalize_movie_code
+
+# CJK 统一汉字、日文假名、半角片假名
+_CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f'
+_TOKEN_PATTERN = re.compile(f'[{_CJK_CHARS}]+|[0-9a-z]+')
+_CJK_PATTERN = re.compile(f'[{_CJK_CHARS}]')
+
+# 参与搜索的影片字段
+SEARCH_FIELDS = ('title', 'code', 'actresses', 'genres')
+
+
+def _field_text(value):
+    """字段值统一转成字符串（演员、类别可能是列表）"""
+    if not value:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return ' '.join(str(item) for item in value)
+    return str(value)
+
+
+def tokenize(text, for_query=False):
+    """分词：英文数字按单词，CJK 文字切成二元组；索引时额外保留单字以支持单字查询"""
+    tokens = []
+    for run in _TOKEN_PATTERN.findall(text.lower()):
+        if not _CJK_PATTERN.match(run):
+            tokens.append(run)
+            continue
+        if len(run) == 1 or not for_query:
+            tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def build_search_text(movie):
+    """生成影片的 search_text 字段内容（去重后的分词结果）"""
+    tokens = []
+    for field in SEARCH_FIELDS:
+        tokens.extend(tokenize(_field_text(movie.get(field))))
+    # 标准化编号，支持 ssis123 / SSIS-123 等写法
+    code_norm = normalize_movie_code(movie.get('code')).lower()
+    if code_norm:
+        tokens.append(code_norm)
+    return ' '.join(dict.fromkeys(tokens))
+
+
+def build_text_query(keyword):
+    """把搜索关键字转换为 $text 查询条件，无有效词时返回 None"""
+    keyword = (keyword or '').strip()
+    if MOVIE_CODE_PATTERN.fullmatch(keyword):
+        # 关键字是编号时按标准化编号整体匹配
+        tokens = [normalize_movie_code(keyword).lower()]
+    else:
+        tokens = tokenize(keyword, for_query=True)
+    if not tokens:
+        return None
+    search = ' '.join(f'"{token}"' for token in dict.fromkeys(tokens))
+    return {'$text': {'$search': search}}
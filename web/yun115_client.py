@@ -12,8 +12,13 @@ from typing import Dict, List, Optional, Any
 from urllib.parse import urlencode
 import logging
 
+from http_session import ProcessLocalSession
+
 logger = logging.getLogger(__name__)
 
+# 所有客户端实例共用的连接池，路由中每次请求新建客户端也不会重复建立连接
+_http = ProcessLocalSession()
+
 class Yun115Client:
     """115开发平台API客户端"""
     
@@ -84,9 +89,9 @@ class Yun115Client:
         
         try:
             if method.upper() == "GET":
-                response = requests.get(url, params=params, timeout=30)
+                response = _http.get(url, params=params, timeout=30)
             else:
-                response = requests.post(url, data=params, timeout=30)
+                response = _http.post(url, data=params, timeout=30)
             
             response.raise_for_status()
             return response.json()